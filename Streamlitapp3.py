@@ -1,10 +1,9 @@
 import os
-import json
 import pandas as pd
 import traceback
 from dotenv import load_dotenv
-from src.mcqgenerator.mcqgen import generate_evaluate_chain
-from src.mcqgenerator.utils import read_file, get_table_data
+from src.mcqgenerator.app_cache import load_chains, load_response_json, render_debug_panel
+from src.mcqgenerator.utils import read_file_cached, get_table_data
 import streamlit as st
 from src.mcqgenerator.logger import logger
 
@@ -239,8 +238,7 @@ st.markdown("""
 # Loading json file
 script_dir = os.path.dirname(os.path.abspath(__file__))
 json_path = os.path.join(script_dir, "response.json")
-with open(json_path, 'r') as f:
-    response_json = json.load(f)
+response_json = load_response_json(json_path)
 
 # Header Section
 st.markdown('<h1>🎓 AI-Powered MCQ Generator</h1>', unsafe_allow_html=True)
@@ -340,10 +338,10 @@ if button and text is not None and mcq_count and subject and tone:
     with st.spinner("🔄 Generating your MCQs... Please wait..."):
         try:
             # Read the file
-            text_content = read_file(text)
+            text_content = read_file_cached(text)
             
             # Generate MCQs
-            result = generate_evaluate_chain.invoke({
+            result = load_chains().generate_evaluate_chain.invoke({
                 "text": text_content,
                 "number": mcq_count,
                 "subject": subject,
@@ -413,4 +411,6 @@ st.markdown("---")
 st.markdown(
     "<p style='text-align: center; color: #6c757d;'>Built with ❤️ using Streamlit, LangChain & Groq</p>",
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+render_debug_panel()
@@ -1,13 +1,13 @@
 import os
-import json
-import traceback
 from dotenv import load_dotenv
 import streamlit as st
 
 # ---- YOUR INTERNAL MODULES ----
-from src.mcqgenerator.mcqgen import generate_evaluate_chain
-from src.mcqgenerator.utils import read_file, get_table_data
-from src.mcqgenerator.logger import logger
+from src.mcqgenerator.app_cache import load_response_json, render_debug_panel
+from src.mcqgenerator.jobs import generate_job, uploaded_copy
+from src.mcqgenerator.mcqgen import get_job_manager, get_review_store
+from src.mcqgenerator.review import score_summary
+from src.mcqgenerator.utils import question_to_row
 
 
 # ==============================
@@ -33,8 +33,7 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 json_path = os.path.join(script_dir, "response.json")
 
 try:
-    with open(json_path, 'r') as f:
-        response_json = json.load(f)
+    response_json = load_response_json(json_path)
 except Exception as e:
     st.error("Could not load response.json")
     st.stop()
@@ -47,8 +46,12 @@ if "quiz_data" not in st.session_state:
     st.session_state.quiz_data = None
 if "review_text" not in st.session_state:
     st.session_state.review_text = None
+if "review_key" not in st.session_state:
+    st.session_state.review_key = None  # ReviewStore key of a review still being (or not yet) written
 if "answers" not in st.session_state:
     st.session_state.answers = {}  # {question_index: selected_option_letter}
+if "celebrated" not in st.session_state:
+    st.session_state.celebrated = set()  # questions that already got balloons
 
 
 # ==============================
@@ -239,6 +242,16 @@ st.markdown('<div class="subtitle">Generate High-Quality MCQs using LangChain +
 # ==============================
 # INPUT SECTION
 # ==============================
+REVIEW_MODE_LABELS = {
+    "background": "Write it while I take the quiz",
+    "lazy": "Only when I open it",
+    "eager": "Before showing the quiz",
+}
+REVIEW_KIND_LABELS = {
+    "essay": "Written analysis",
+    "questions": "Scores per question",
+}
+
 with st.container():
     st.markdown('<div class="glass-card">', unsafe_allow_html=True)
 
@@ -247,10 +260,21 @@ with st.container():
     with col1:
         uploaded_file = st.file_uploader("📄 Upload PDF or TXT", type=["pdf", "txt"])
         subject = st.text_input("📘 Subject", placeholder="e.g. Physiology")
+        topics = st.text_input("🔎 Focus topics (optional)", placeholder="e.g. renal clearance, acid-base balance",
+                               help="Long documents are narrowed to the passages about these topics")
 
     with col2:
         mcq_count = st.slider("🧮 Number of MCQs", 3, 50, 5)
         tone = st.selectbox("🎯 Difficulty Level", ["Easy", "Medium", "Hard"])
+        chunked = st.checkbox("📚 Large document mode", help="Split long documents into chunks and generate them in parallel")
+        condense = st.checkbox("✂️ Condense document",
+                               help="Cut long documents down to their key sentences before generating (no extra model call)")
+        fresh = st.checkbox("🔄 Fresh quiz", help="Skip the question bank and response cache and ask the model again")
+        review_mode = st.selectbox("📊 Review", ["background", "lazy", "eager"],
+                                   format_func=REVIEW_MODE_LABELS.get,
+                                   help="The quiz is ready sooner when the review is not written before it")
+        review_kind = st.selectbox("📋 Review style", ["essay", "questions"], format_func=REVIEW_KIND_LABELS.get,
+                                   help="Per-question scores are written in parallel and reused for unchanged questions")
 
     generate_btn = st.button("🚀 Generate MCQs")
 
@@ -270,166 +294,130 @@ if generate_btn:
         st.warning("Please enter a subject.")
         st.stop()
 
-    with st.spinner("✨ Generating your interactive quiz..."):
-
-        try:
-            text = read_file(uploaded_file)
-
-            result = generate_evaluate_chain.invoke({
-                "text": text,
-                "number": mcq_count,
-                "subject": subject,
-                "tone": tone,
-                "response_json": response_json
-            })
-
-        except Exception as e:
-            logger.error(traceback.format_exc())
-            st.error("Something went wrong while generating MCQs.")
-            st.text(str(e))
-
-        else:
-            if isinstance(result, dict):
-                quiz = result.get("quiz")
-                review = result.get("review")
-
-                if quiz:
-                    try:
-                        table_data = get_table_data(quiz)
-                    except Exception as parse_err:
-                        st.error(f"Error processing quiz data:")
-                        st.code(str(parse_err), language="text")
-                        table_data = None
-
-                    if table_data:
-                        st.session_state.quiz_data = table_data
-                        st.session_state.review_text = review
-                        st.session_state.answers = {}
-                        st.rerun()
-                    else:
-                        st.error("Error processing quiz data.")
-                else:
-                    st.write(result)
-            else:
-                st.write(result)
-
-
-# ==============================
-# QUIZ DISPLAY (TABBED LAYOUT)
-# ==============================
-if st.session_state.quiz_data:
-
-    quiz_data = st.session_state.quiz_data
-    review_text = st.session_state.review_text
-
-    tab_quiz, tab_review = st.tabs(["📝 Quiz", "📊 Review"])
-
-    # ---------------------------
-    # TAB 1: Interactive Quiz
-    # ---------------------------
-    with tab_quiz:
+    inputs = {
+        "number": mcq_count,
+        "subject": subject,
+        "tone": tone,
+        "response_json": response_json,
+        "fresh": fresh,
+        "topics": topics
+    }
+
+    # generation runs on the shared worker pool; this script only polls it
+    job_id = get_job_manager().submit(generate_job, uploaded_copy(uploaded_file), inputs,
+                                      chunked=chunked, condense=condense, review_mode=review_mode,
+                                      review_kind=review_kind)
+    st.session_state.job_id = job_id
+    # the job keeps running if the tab is closed; reopening this URL picks it up again
+    st.query_params["job"] = job_id
+
+if not st.session_state.get("job_id") and "job" in st.query_params:
+    st.session_state.job_id = st.query_params["job"]
+
+
+STAGE_LABELS = {
+    "extract": "📄 Reading document...",
+    "generate": "✨ Generating your interactive quiz...",
+    "parse": "🧩 Checking the questions...",
+    "review": "📊 Reviewing the quiz...",
+}
 
-        # Score tracker at top
-        total = len(quiz_data)
-        answered = len(st.session_state.answers)
-        correct_count = sum(
-            1 for idx, ans in st.session_state.answers.items()
-            if ans.lower() == quiz_data[idx].get("Correct Answer", "").lower()
-        )
 
-        if answered > 0:
+def finish_job():
+    st.session_state.job_id = None
+    if "job" in st.query_params:
+        del st.query_params["job"]
+
+
+@st.fragment(run_every=1.0)
+def job_progress():
+    """Polls the running job; the whole page reruns once the quiz, then the review, is ready."""
+    job = get_job_manager().get(st.session_state.job_id)
+    if job is None:
+        # finished too long ago, or the server restarted
+        finish_job()
+        st.warning("That generation job is no longer available. Please generate again.")
+        return
+
+    if job.status == "failed":
+        finish_job()
+        st.error("Something went wrong while generating MCQs.")
+        st.text(job.error)
+        return
+
+    if job.rows is not None and st.session_state.get("job_loaded") != job.id:
+        # the quiz is playable while the review is still being written
+        st.session_state.job_loaded = job.id
+        st.session_state.quiz_data = job.rows
+        st.session_state.review_text = None
+        st.session_state.review_key = None
+        st.session_state.answers = {}
+        st.session_state.celebrated = set()
+        st.session_state.quiz_page = 1
+        st.rerun()
+
+    if job.done:
+        st.session_state.review_text = job.result.get("review")
+        st.session_state.review_key = job.result.get("review_key")
+        finish_job()
+        st.rerun()
+
+    st.progress(job.progress, text=STAGE_LABELS.get(job.stage, "⏳ Waiting for a free worker..."))
+    if job.summary is not None and job.summary.seconds:
+        st.caption(f"✂️ Condensed {job.summary.input_tokens:,} → {job.summary.output_tokens:,} tokens "
+                   f"({job.summary.ratio:.1f}x) in {job.summary.seconds * 1000:.0f} ms")
+    if job.rows is None:
+        # preview each question the moment it has streamed in
+        for key, question in list(job.questions):
+            row = question_to_row(question)
             st.markdown(f"""
-            <div class="score-card">
-                <div class="score-number">{correct_count} / {answered}</div>
-                <div style="color:#a0a0c0; margin-top:8px; font-size:16px;">
-                    correct so far · {total - answered} remaining
-                </div>
+            <div class="glass-card">
+                <div class="question-header">Question {key} of {job.number}</div>
+                <div class="question-text">{row["MCQ"]}</div>
             </div>
             """, unsafe_allow_html=True)
 
-        for i, row in enumerate(quiz_data):
 
-            question = row.get("MCQ") or row.get("question") or row.get("Question")
-            option_a = row.get("Option A") or ""
-            option_b = row.get("Option B") or ""
-            option_c = row.get("Option C") or ""
-            option_d = row.get("Option D") or ""
-            correct = row.get("Correct Answer", "")
-            hint = row.get("Hint", "")
-            explanation = row.get("Explanation", "")
+if st.session_state.get("job_id"):
+    job_progress()
 
-            st.markdown(f"""
-            <div class="glass-card">
-                <div class="question-header">Question {i + 1} of {total}</div>
-                <div class="question-text">{question}</div>
-            </div>
-            """, unsafe_allow_html=True)
 
-            already_answered = i in st.session_state.answers
-            options = {
-                "a": option_a,
-                "b": option_b,
-                "c": option_c,
-                "d": option_d
-            }
-
-            # Option buttons in 2x2 grid
-            col1, col2 = st.columns(2)
-
-            for j, (letter, text) in enumerate(options.items()):
-                col = col1 if j % 2 == 0 else col2
-                with col:
-                    label = f"{letter.upper()}. {text}"
-                    btn = st.button(
-                        label,
-                        key=f"q{i}_opt_{letter}",
-                        disabled=already_answered,
-                        use_container_width=True
-                    )
-
-                    if btn and not already_answered:
-                        st.session_state.answers[i] = letter
-                        st.rerun()
-
-            # Show result after answering
-            if already_answered:
-                selected = st.session_state.answers[i]
-                is_correct = selected.lower() == correct.lower()
-
-                if is_correct:
-                    st.markdown(f"""
-                    <div class="correct-msg">
-                        ✅ <strong>Correct!</strong> You selected <strong>{selected.upper()}</strong> — well done!
-                    </div>
-                    """, unsafe_allow_html=True)
-                    # Show balloons only on first correct answer render
-                    if f"celebrated_{i}" not in st.session_state:
-                        st.session_state[f"celebrated_{i}"] = True
-                        st.balloons()
-                else:
-                    st.markdown(f"""
-                    <div class="wrong-msg">
-                        ❌ <strong>Incorrect.</strong> You selected <strong>{selected.upper()}</strong>, 
-                        but the correct answer is <strong>{correct.upper()}</strong>.
-                    </div>
-                    """, unsafe_allow_html=True)
-
-                    if explanation:
-                        st.markdown(f"""
-                        <div class="explanation-box">
-                            💡 <strong>Explanation:</strong> {explanation}
-                        </div>
-                        """, unsafe_allow_html=True)
-
-            # Hint expander (always available)
-            if hint:
-                with st.expander("💡 Need a hint?"):
-                    st.info(hint)
-
-            st.markdown("---")
+# ==============================
+# QUIZ RENDERING
+# ==============================
+QUESTIONS_PER_PAGE = 10
+
+
+def record_answer(i, letter):
+    # button callback: runs before the question's fragment reruns
+    st.session_state.answers[i] = letter
+    st.session_state.score_stale = True
+
+
+def render_score(slot, quiz_data):
+    """Running score, plus the final result once every question is answered, in slot."""
+    total = len(quiz_data)
+    answered = len(st.session_state.answers)
+    if answered == 0:
+        slot.empty()
+        return
+    correct_count = sum(
+        1 for idx, ans in st.session_state.answers.items()
+        if ans.lower() == quiz_data[idx].get("Correct Answer", "").lower()
+    )
+
+    with slot.container():
+        st.markdown(f"""
+        <div class="score-card">
+            <div class="score-number">{correct_count} / {answered}</div>
+            <div style="color:#a0a0c0; margin-top:8px; font-size:16px;">
+                correct so far · {total - answered} remaining
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
 
         # Final score when all questions answered
-        if answered == total and total > 0:
+        if answered == total:
             pct = int((correct_count / total) * 100)
             if pct >= 80:
                 emoji = "🏆"
@@ -454,17 +442,180 @@ if st.session_state.quiz_data:
             </div>
             """, unsafe_allow_html=True)
 
+
+@st.fragment
+def question_card(i, row, total, score_slot):
+    """One question; clicking an option reruns only this card and the score card."""
+    question = row.get("MCQ") or row.get("question") or row.get("Question")
+    correct = row.get("Correct Answer", "")
+    hint = row.get("Hint", "")
+    explanation = row.get("Explanation", "")
+
+    st.markdown(f"""
+    <div class="glass-card">
+        <div class="question-header">Question {i + 1} of {total}</div>
+        <div class="question-text">{question}</div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    already_answered = i in st.session_state.answers
+
+    # Option buttons in 2x2 grid
+    col1, col2 = st.columns(2)
+
+    for j, letter in enumerate("abcd"):
+        col = col1 if j % 2 == 0 else col2
+        with col:
+            st.button(
+                f"{letter.upper()}. {row.get(f'Option {letter.upper()}') or ''}",
+                key=f"q{i}_opt_{letter}",
+                disabled=already_answered,
+                use_container_width=True,
+                on_click=record_answer,
+                args=(i, letter)
+            )
+
+    # Show result after answering
+    if already_answered:
+        selected = st.session_state.answers[i]
+        is_correct = selected.lower() == correct.lower()
+
+        if is_correct:
+            st.markdown(f"""
+            <div class="correct-msg">
+                ✅ <strong>Correct!</strong> You selected <strong>{selected.upper()}</strong> — well done!
+            </div>
+            """, unsafe_allow_html=True)
+            # Show balloons only on first correct answer render
+            if i not in st.session_state.celebrated:
+                st.session_state.celebrated.add(i)
+                st.balloons()
+        else:
+            st.markdown(f"""
+            <div class="wrong-msg">
+                ❌ <strong>Incorrect.</strong> You selected <strong>{selected.upper()}</strong>, 
+                but the correct answer is <strong>{correct.upper()}</strong>.
+            </div>
+            """, unsafe_allow_html=True)
+
+            if explanation:
+                st.markdown(f"""
+                <div class="explanation-box">
+                    💡 <strong>Explanation:</strong> {explanation}
+                </div>
+                """, unsafe_allow_html=True)
+
+    # Hint expander (always available)
+    if hint:
+        with st.expander("💡 Need a hint?"):
+            st.info(hint)
+
+    st.markdown("---")
+
+    if st.session_state.pop("score_stale", False):
+        render_score(score_slot, st.session_state.quiz_data)
+
+
+# ==============================
+# REVIEW
+# ==============================
+def render_review(review_text):
+    st.markdown("### 📊 AI Review & Analysis")
+    if isinstance(review_text, dict):
+        render_scores(review_text)
+        return
+    st.markdown(f"""
+    <div class="glass-card">
+        {review_text}
+    </div>
+    """, unsafe_allow_html=True)
+
+
+def render_scores(scores):
+    """A per-question review (review.review_questions): averages, Bloom mix and one row per question."""
+    summary = score_summary(scores)
+    if not summary["questions"]:
+        st.info("No question could be scored.")
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Grammar", f"{summary['grammar']:.1f} / 5")
+    col2.metric("Distractor quality", f"{summary['distractors']:.1f} / 5")
+    col3.metric("Most common Bloom level", max(summary["bloom"], key=summary["bloom"].get, default="—").title())
+    st.dataframe([
+        {"Question": key, "Grammar": value["grammar"], "Bloom level": (value["bloom"] or "").title(),
+         "Distractors": value["distractors"], "Comment": value["comment"]}
+        for key, value in scores.items()
+    ], hide_index=True, use_container_width=True)
+
+
+@st.fragment(run_every=1.0)
+def review_progress(key):
+    """Polls a review being written; the whole page reruns once it is ready."""
+    if get_review_store().status(key) != "running":
+        st.rerun()
+    st.info("📊 The review is being written; carry on with the quiz.")
+
+
+def review_panel(key):
+    """A review that was not written with the quiz: wait for it, or start it on request."""
+    store = get_review_store()
+    status = store.status(key)
+    if status == "done":
+        st.session_state.review_text = store.get(key)
+        st.session_state.review_key = None
+        render_review(st.session_state.review_text)
+    elif status == "running":
+        review_progress(key)
+    elif status == "pending":
+        st.button("📊 Write the review", on_click=store.start, args=(key,))
+    elif status == "failed":
+        st.error("The review could not be written.")
+        st.button("🔁 Try again", on_click=store.start, args=(key,))
+    else:
+        # forgotten by the store (server restart); the quiz stays playable
+        st.session_state.review_key = None
+        st.info("No review available for this quiz.")
+
+
+# ==============================
+# QUIZ DISPLAY (TABBED LAYOUT)
+# ==============================
+if st.session_state.quiz_data:
+
+    quiz_data = st.session_state.quiz_data
+    review_text = st.session_state.review_text
+
+    tab_quiz, tab_review = st.tabs(["📝 Quiz", "📊 Review"])
+
+    # ---------------------------
+    # TAB 1: Interactive Quiz
+    # ---------------------------
+    with tab_quiz:
+
+        total = len(quiz_data)
+        # filled by the main script and redrawn by a question fragment when it is answered
+        score_slot = st.empty()
+        render_score(score_slot, quiz_data)
+
+        pages = -(-total // QUESTIONS_PER_PAGE)
+        if pages > 1:
+            page = st.radio("Page", range(1, pages + 1), key="quiz_page", horizontal=True,
+                            format_func=lambda p: f"{(p - 1) * QUESTIONS_PER_PAGE + 1}–"
+                                                  f"{min(p * QUESTIONS_PER_PAGE, total)}")
+        else:
+            page = 1
+
+        for i in range((page - 1) * QUESTIONS_PER_PAGE, min(page * QUESTIONS_PER_PAGE, total)):
+            question_card(i, quiz_data[i], total, score_slot)
+
     # ---------------------------
     # TAB 2: AI Review
     # ---------------------------
     with tab_review:
         if review_text:
-            st.markdown("### 📊 AI Review & Analysis")
-            st.markdown(f"""
-            <div class="glass-card">
-                {review_text}
-            </div>
-            """, unsafe_allow_html=True)
+            render_review(review_text)
+        elif st.session_state.review_key:
+            review_panel(st.session_state.review_key)
         else:
             st.info("No review available for this quiz.")
 
@@ -477,4 +628,6 @@ st.markdown("""
 <p style='text-align:center; color:#555; font-size:13px;'>
 Built with ❤️ using Streamlit, LangChain & Groq
 </p>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+render_debug_panel()
@@ -0,0 +1,74 @@
+"""Near-duplicate detection benchmark on synthetic question banks.
+
+    python -m benchmarks.bench_dedup [--sizes 1000 10000 50000] [--repeat 3] [--compare REPORT.json]
+
+Builds banks of random questions with 1% planted near-duplicates, times
+dedup.find_duplicates on them and checks that the planted repeats are found, that
+unrelated questions are left alone and that 10k questions take under BUDGET_MS.
+"""
+import argparse
+import random
+import sys
+
+from benchmarks.common import DEFAULT_THRESHOLD, compare, measure, print_results, save_report
+
+# find_duplicates on 10k questions
+BUDGET_MS = 500
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def synthetic_bank(size, seed=0):
+    """size rows in get_table_data shape; every 100th is followed by a reworded copy at the end."""
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(5000)]
+    rows = []
+    for _ in range(size):
+        row = {"MCQ": " ".join(rng.choices(words, k=14)) + "?"}
+        for letter in "ABCD":
+            row[f"Option {letter}"] = " ".join(rng.choices(words, k=3))
+        rows.append(row)
+    planted = [dict(rows[i], MCQ=rows[i]["MCQ"].replace("?", " in this case?")) for i in range(0, size, 100)]
+    return rows + planted
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from src.mcqgenerator.dedup import find_duplicates
+
+    results = {}
+    failures = []
+    for size in args.sizes:
+        rows = synthetic_bank(size)
+        found = []
+        results[f"find_duplicates/{size}"] = measure(lambda: found.append(find_duplicates(rows)), args.repeat)
+        duplicates = found[-1]
+        planted = len(rows) - size
+        caught = sum(1 for i in duplicates if i >= size)
+        false = sum(1 for i in duplicates if i < size)
+        print(f"{size}: {caught}/{planted} planted repeats found, {false} false positives", file=sys.stderr)
+        if caught < planted * 0.95 or false:
+            failures.append(f"{size}: {caught}/{planted} found, {false} false positives")
+        if size == 10000 and results[f"find_duplicates/{size}"]["median_ms"] > BUDGET_MS:
+            failures.append(f"10k questions took over {BUDGET_MS} ms")
+
+    print_results(results)
+    path = save_report("dedup", results, vars(args))
+    print(f"\nReport written to {path}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        failures.append("dedup regressed against the baseline")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
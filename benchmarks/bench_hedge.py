@@ -0,0 +1,103 @@
+"""Hedged requests against local stand-in backends with a latency tail.
+
+    python -m benchmarks.bench_hedge [--calls 200] [--slow-rate 0.05] [--slow-latency 2] [--compare REPORT.json]
+
+The primary fake model takes --latency per call, except for --slow-rate of calls,
+which take --slow-latency. The secondary fake model is always fast. The suite runs
+the same quiz_chain calls without hedging and then with hedging, with and without a
+fixed per-stage deadline, and reports the latency percentiles and how often the
+hedge won. Hedging must cut p99 latency.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import (
+    DEFAULT_THRESHOLD, ROOT, base_text, compare, percentiles, print_results, save_report, use_fake_llm,
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="primary latency per call (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="share of primary calls that are slow")
+    parser.add_argument("--slow-latency", type=float, default=2.0, help="latency of a slow call (s)")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def run(chain, inputs, calls, concurrency):
+    def one(i):
+        started = time.perf_counter()
+        # a distinct document per call keeps the response cache out of it
+        chain.invoke({**inputs, "text": f"{inputs['text']}\n\nDocument {i}."})
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, range(calls)))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    use_fake_llm(latency=args.latency)
+    from src.mcqgenerator import mcqgen
+
+    with open(f"{ROOT}/response.json", "r") as f:
+        response_json = json.load(f)
+    inputs = {"text": base_text(), "number": 5, "subject": "Biology", "tone": "Medium",
+              "response_json": response_json, "fresh": True}
+    primary = f"fake:slow_rate={args.slow_rate},slow_latency={args.slow_latency}"
+
+    configs = {
+        "unhedged": {"MCQGEN_LLM_BACKEND": primary},
+        # p95 deadline, learned from the first calls
+        "hedged/p95": {"MCQGEN_LLM_BACKEND": primary, "MCQGEN_HEDGE_BACKEND": "fake:slow_rate=0",
+                       "MCQGEN_HEDGE_AFTER": str(args.slow_latency / 4)},
+        "hedged/deadline": {"MCQGEN_LLM_BACKEND": primary, "MCQGEN_HEDGE_BACKEND": "fake:slow_rate=0",
+                            "MCQGEN_HEDGE_DEADLINES": f"quiz_chain={args.slow_latency / 4}"},
+    }
+    results = {}
+    hedging = {}
+    for name, env in configs.items():
+        for key in ("MCQGEN_HEDGE_BACKEND", "MCQGEN_HEDGE_AFTER", "MCQGEN_HEDGE_DEADLINES"):
+            os.environ.pop(key, None)
+        os.environ.update(env)
+        for factory in (mcqgen.get_backend_llm, mcqgen.get_hedge_backend_llm, mcqgen.get_latency_stats,
+                        mcqgen.get_llm, mcqgen.get_quiz_llm, mcqgen.get_spec_backend_llm, mcqgen.get_spec_llm,
+                        mcqgen.get_chains):
+            factory.cache_clear()
+        results[f"quiz_chain/{name}"] = percentiles(run(mcqgen.get_chains().quiz_chain, inputs, args.calls,
+                                                        args.concurrency))
+        if "MCQGEN_HEDGE_BACKEND" in env:
+            hedging[name] = mcqgen.get_latency_stats().stats().get("quiz_chain")
+        print(f"{name} done", file=sys.stderr)
+
+    print_results(results)
+    print(f"\n{'config':<40} {'p95 ms':>10} {'p99 ms':>10} {'hedged':>8} {'won':>6}")
+    for name, stats in results.items():
+        hedge = hedging.get(name.split("/", 1)[1]) or {}
+        print(f"{name:<40} {stats['p95_ms']:>10.1f} {stats['p99_ms']:>10.1f} "
+              f"{hedge.get('hedged', '-'):>8} {hedge.get('hedge_wins', '-'):>6}")
+    path = save_report("hedge", results, vars(args), {"hedging": hedging})
+    print(f"\nReport written to {path}")
+
+    failures = []
+    baseline = results["quiz_chain/unhedged"]["p99_ms"]
+    for name in ("hedged/p95", "hedged/deadline"):
+        if results[f"quiz_chain/{name}"]["p99_ms"] >= baseline:
+            failures.append(f"{name} did not cut p99 latency")
+    if args.compare and compare(results, args.compare, args.threshold):
+        failures.append("hedging regressed against the baseline")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
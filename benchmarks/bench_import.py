@@ -0,0 +1,95 @@
+"""Cold import-time benchmark for the mcqgenerator package.
+
+    python -m benchmarks.bench_import [--repeat 5] [--compare REPORT.json]
+
+Imports each module in a fresh interpreter from an empty working directory and
+checks it against IMPORT_BUDGET_MS. An import also fails the run if it creates
+files (logs/, caches) or loads a client library (langchain_groq) or LangChain
+itself where that is only needed once a chain is actually built.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import DEFAULT_THRESHOLD, ROOT, compare, print_results, save_report
+
+# module -> (median cold import budget in ms, modules it must not pull in)
+IMPORT_BUDGET_MS = {
+    "src.mcqgenerator": (50, ["langchain_core", "langchain_groq", "pandas"]),
+    "src.mcqgenerator.logger": (50, ["langchain_core"]),
+    "src.mcqgenerator.mcqgen": (50, ["langchain_core", "langchain_groq", "pandas"]),
+    "src.mcqgenerator.utils": (300, ["langchain_core", "langchain_groq"]),
+    "src.mcqgenerator.streaming": (300, ["langchain_core", "langchain_groq"]),
+    "src.mcqgenerator.api": (300, ["langchain_groq"]),
+}
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({{"ms": elapsed, "loaded": [m for m in {forbidden!r} if m in sys.modules]}}))
+"""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def cold_import(module, forbidden):
+    """Import module in a new interpreter; returns (ms, forbidden modules loaded, files created)."""
+    with tempfile.TemporaryDirectory(prefix="mcqgen-import-") as cwd:
+        env = {**os.environ, "PYTHONPATH": ROOT, "PYTHONDONTWRITEBYTECODE": "1"}
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, forbidden=forbidden)],
+            cwd=cwd, env=env, capture_output=True, text=True, check=True,
+        )
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        return probe["ms"], probe["loaded"], os.listdir(cwd)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+    failures = []
+    for module, (budget, forbidden) in IMPORT_BUDGET_MS.items():
+        timings = []
+        for _ in range(args.repeat):
+            ms, loaded, created = cold_import(module, forbidden)
+            timings.append(ms)
+        timings.sort()
+        median = timings[len(timings) // 2]
+        results[f"import/{module}"] = {
+            "median_ms": round(median, 3),
+            "min_ms": round(timings[0], 3),
+            "max_ms": round(timings[-1], 3),
+            "repeat": args.repeat,
+            "budget_ms": budget,
+        }
+        if median > budget:
+            failures.append(f"{module}: {median:.0f} ms is over the {budget} ms budget")
+        if loaded:
+            failures.append(f"{module}: imports {', '.join(loaded)}")
+        if created:
+            failures.append(f"{module}: created {', '.join(created)} on import")
+
+    print_results(results)
+    path = save_report("import", results, vars(args))
+    print(f"\nReport written to {path}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        failures.append("import time regressed against the baseline")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
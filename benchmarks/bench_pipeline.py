@@ -0,0 +1,126 @@
+"""End-to-end pipeline benchmark against the local fake LLM.
+
+    python -m benchmarks.bench_pipeline [--sizes 1 10 50] [--repeat 5] [--compare REPORT.json]
+
+Times read_file (TXT and PDF), prompt building, generate_evaluate_chain,
+get_table_data and the Streamlitapp4 quiz render for documents built from data.txt
+at growing sizes. For summarise it also reports the size of the quiz prompt that is
+finally sent, whole and condensed (with and without focus topics). It writes a JSON report (with per-chain token totals) to
+benchmarks/results/ and, with --compare, flags stages that regressed against an
+earlier report.
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.common import (
+    DEFAULT_THRESHOLD, NamedBytesIO, ROOT, compare, measure, print_results, print_tokens, save_report,
+    synthetic_pdf, synthetic_text, use_fake_llm,
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50], help="multiples of data.txt")
+    parser.add_argument("--number", type=int, default=10, help="questions per quiz")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM time to first token (s)")
+    parser.add_argument("--tps", type=float, default=5000, help="fake LLM tokens per second")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--no-render", action="store_true", help="skip the Streamlit render stage")
+    return parser.parse_args(argv)
+
+
+def bench_render(rows, repeat):
+    """Time one full run of Streamlitapp4 with a quiz already in session state."""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("streamlit not installed; skipping render stage", file=sys.stderr)
+        return None
+
+    def render():
+        app = AppTest.from_file(f"{ROOT}/Streamlitapp4.py", default_timeout=60)
+        app.session_state["quiz_data"] = rows
+        app.session_state["review_text"] = "review"
+        app.session_state["answers"] = {}
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+    return measure(render, repeat)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    use_fake_llm(latency=args.latency, tokens_per_second=args.tps)
+
+    from src.mcqgenerator.mcqgen import get_chains, get_token_accountant
+    from src.mcqgenerator.summarise import summarise
+    from src.mcqgenerator.utils import estimate_tokens, get_table_data, read_file
+    chains = get_chains()
+
+    with open(f"{ROOT}/response.json", "r") as f:
+        response_json = json.load(f)
+
+    results = {}
+    summaries = {}
+    rows = None
+    for size in args.sizes:
+        text = synthetic_text(size)
+        pdf = synthetic_pdf(text)
+        inputs = {"text": text, "number": args.number, "subject": "Biology", "tone": "Medium",
+                  "response_json": response_json, "fresh": True}
+
+        results[f"read_file/txt/x{size}"] = measure(
+            lambda: read_file(NamedBytesIO(text.encode("utf-8"), "doc.txt")), args.repeat)
+        results[f"read_file/pdf/x{size}"] = measure(
+            lambda: read_file(NamedBytesIO(pdf, "doc.pdf")), args.repeat)
+        results[f"prompt/x{size}"] = measure(lambda: chains.quiz_generation_prompt.invoke(inputs), args.repeat)
+        results[f"summarise/x{size}"] = measure(lambda: summarise(text), args.repeat)
+        summary = summarise(text)
+        condensed = {**inputs, "text": summary.text, "retrieve": False}
+
+        def prompt_tokens(prompt_inputs):
+            return estimate_tokens(chains.quiz_generation_prompt.invoke(prompt_inputs).to_string())
+
+        summaries[f"x{size}"] = {"input_tokens": summary.input_tokens, "output_tokens": summary.output_tokens,
+                                 "ratio": round(summary.ratio, 2), "prompt_tokens": prompt_tokens(inputs),
+                                 "condensed_prompt_tokens": prompt_tokens(condensed),
+                                 "condensed_topics_prompt_tokens": prompt_tokens({**condensed, "topics": "cell"})}
+
+        outputs = []
+        results[f"chain/x{size}"] = measure(
+            lambda: outputs.append(chains.generate_evaluate_chain.invoke(inputs)), args.repeat)
+        quiz = outputs[-1]["quiz"]
+        results[f"get_table_data/x{size}"] = measure(lambda: get_table_data(quiz), args.repeat)
+        rows = get_table_data(quiz)
+        print(f"x{size}: {len(text)} chars, {len(pdf)} byte PDF done", file=sys.stderr)
+
+    if rows and not args.no_render:
+        stats = bench_render(rows, args.repeat)
+        if stats:
+            results[f"render/quiz/{len(rows)}q"] = stats
+
+    print_results(results)
+    tokens = get_token_accountant().stats()
+    print_tokens(tokens)
+    for name, summary in summaries.items():
+        print(f"summarise {name}: {summary['input_tokens']} -> {summary['output_tokens']} tokens "
+              f"({summary['ratio']}x); quiz prompt {summary['prompt_tokens']} -> "
+              f"{summary['condensed_prompt_tokens']} tokens "
+              f"({summary['condensed_topics_prompt_tokens']} with focus topics)")
+    path = save_report("pipeline", results, vars(args), {"tokens": tokens, "summaries": summaries})
+    print(f"\nReport written to {path}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Review modes: how long the user waits for a quiz, and for its review.
+
+    python -m benchmarks.bench_review [--quizzes 10] [--compare REPORT.json]
+
+Runs generate_chain plus review.review_result on distinct documents in each
+REVIEW_MODES mode against the local fake LLM. "quiz/<mode>" is the time until the quiz
+is returned (what the user waits for), "review/<mode>" the time until its review is
+written. Background and lazy reviews must take the review off the quiz's critical
+path: the wait for the quiz must drop by at least 80% of review_chain's mean latency.
+The speedup over eager reviews follows from the review's share of the eager wait;
+it is 2x when the review takes as long as the quiz.
+
+"scores/full" times review_questions (per-question scores in parallel batches of
+--batch-size) on a new quiz, and "scores/one-edited" the same quiz again with one
+question edited, which must take exactly one model call.
+"""
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.common import (
+    DEFAULT_THRESHOLD, ROOT, base_text, compare, percentiles, print_results, save_report, use_fake_llm,
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quizzes", type=int, default=10, help="quizzes per mode")
+    parser.add_argument("--number", type=int, default=10, help="questions per quiz")
+    parser.add_argument("--batch-size", type=int, default=4, help="questions per scoring call")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM time to first token (s)")
+    parser.add_argument("--tps", type=float, default=500, help="fake LLM tokens per second")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    use_fake_llm(latency=args.latency, tokens_per_second=args.tps)
+    from src.mcqgenerator.mcqgen import get_chains, get_review_store, get_token_accountant
+    from src.mcqgenerator.review import REVIEW_MODES, review_questions, review_result
+    from src.mcqgenerator.schema import parse_quiz
+
+    with open(f"{ROOT}/response.json", "r") as f:
+        response_json = json.load(f)
+    inputs = {"text": base_text(), "number": args.number, "subject": "Biology", "tone": "Medium",
+              "response_json": response_json, "fresh": True}
+    chain = get_chains().generate_chain
+    store = get_review_store()
+
+    results = {}
+    for mode in REVIEW_MODES:
+        quiz_seconds, review_seconds = [], []
+        for i in range(args.quizzes):
+            # a distinct document per run keeps the response cache out of it
+            run_inputs = {**inputs, "text": f"{inputs['text']}\n\n{mode} document {i}."}
+            started = time.perf_counter()
+            result = chain.invoke(run_inputs)
+            key = review_result(run_inputs, result["quiz"], mode)["review_key"]
+            quiz_seconds.append(time.perf_counter() - started)
+            # the user opens the review tab straight away
+            store.get(key, timeout=None)
+            review_seconds.append(time.perf_counter() - started)
+        results[f"quiz/{mode}"] = percentiles(quiz_seconds)
+        results[f"review/{mode}"] = percentiles(review_seconds)
+        print(f"{mode} done", file=sys.stderr)
+
+    accountant = get_token_accountant()
+    full, edited, edit_calls = [], [], []
+    for i in range(args.quizzes):
+        run_inputs = {**inputs, "text": f"{inputs['text']}\n\nscored document {i}.", "fresh": False}
+        quiz = chain.invoke(run_inputs)["quiz"]
+        started = time.perf_counter()
+        review_questions(run_inputs, quiz, args.batch_size)
+        full.append(time.perf_counter() - started)
+
+        questions = parse_quiz(quiz)
+        first = next(iter(questions))
+        # the fake builds the same first question for every document: keep each edit unseen
+        questions[first]["mcq"] += f" (edited {i})"
+        calls = accountant.stats().get("question_review_chain", {}).get("calls", 0)
+        started = time.perf_counter()
+        review_questions(run_inputs, questions, args.batch_size)
+        edited.append(time.perf_counter() - started)
+        edit_calls.append(accountant.stats()["question_review_chain"]["calls"] - calls)
+    results["scores/full"] = percentiles(full)
+    results["scores/one-edited"] = percentiles(edited)
+    print("scores done", file=sys.stderr)
+
+    print_results(results)
+    eager = results["quiz/eager"]["median_ms"]
+    review_ms = accountant.stats()["review_chain"]["seconds_per_call"] * 1000
+    speedups = {mode: round(eager / results[f"quiz/{mode}"]["median_ms"], 3) for mode in REVIEW_MODES}
+    print(f"\nthe review is {review_ms:.0f} ms, {review_ms / eager:.0%} of the eager wait")
+    for mode, speedup in speedups.items():
+        print(f"quiz ready {speedup:.2f}x sooner with {mode} reviews")
+    print(f"per-question scores {results['scores/full']['median_ms']:.0f} ms "
+          f"({review_ms / results['scores/full']['median_ms']:.2f}x faster than the essay), "
+          f"{results['scores/one-edited']['median_ms']:.0f} ms after editing one question")
+    path = save_report("review", results, vars(args),
+                       {"speedups": speedups, "review_ms": round(review_ms, 3), "edit_calls": edit_calls,
+                        "store": store.stats()})
+    print(f"\nReport written to {path}")
+
+    failures = []
+    for mode in ("background", "lazy"):
+        if eager - results[f"quiz/{mode}"]["median_ms"] < 0.8 * review_ms:
+            failures.append(f"{mode} reviews still hold up the quiz")
+    if any(calls != 1 for calls in edit_calls):
+        failures.append(f"editing one question took {max(edit_calls)} scoring calls instead of 1")
+    if args.compare and compare(results, args.compare, args.threshold):
+        failures.append("review modes regressed against the baseline")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Per-stage model routing: review on a smaller, faster model.
+
+    python -m benchmarks.bench_routing [--quizzes 10] [--review-speedup 4] [--compare REPORT.json]
+
+Every stage first runs on one fake "large" model (--latency, --tps); then review is
+routed to a fake "small" model that is --review-speedup times faster
+(MCQGEN_REVIEW_BACKEND). Both configurations run generate_evaluate_chain on the same
+documents and the suite reports end-to-end latency, the per-stage latency and tokens
+from the TokenAccountant, and the end-to-end speedup. Routing must make the pipeline
+faster.
+"""
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.common import (
+    DEFAULT_THRESHOLD, ROOT, base_text, compare, measure, print_results, print_tokens, save_report, use_fake_llm,
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quizzes", type=int, default=10, help="generate_evaluate_chain runs per configuration")
+    parser.add_argument("--number", type=int, default=5, help="questions per quiz")
+    parser.add_argument("--latency", type=float, default=0.3, help="large model time to first token (s)")
+    parser.add_argument("--tps", type=float, default=500, help="large model tokens per second")
+    parser.add_argument("--review-speedup", type=float, default=4.0, help="how much faster the small model is")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    use_fake_llm(latency=args.latency, tokens_per_second=args.tps)
+    from src.mcqgenerator import mcqgen
+
+    with open(f"{ROOT}/response.json", "r") as f:
+        response_json = json.load(f)
+    inputs = {"text": base_text(), "number": args.number, "subject": "Biology", "tone": "Medium",
+              "response_json": response_json, "fresh": True}
+    small = (f"fake:small,latency={args.latency / args.review_speedup},"
+             f"tokens_per_second={args.tps * args.review_speedup}")
+    configs = {
+        "single-model": {},
+        "review-routed": {"MCQGEN_REVIEW_BACKEND": small},
+    }
+
+    results = {}
+    tokens = {}
+    for name, env in configs.items():
+        os.environ.pop("MCQGEN_REVIEW_BACKEND", None)
+        os.environ.update(env)
+        for factory in (mcqgen.get_spec_backend_llm, mcqgen.get_spec_scheduler, mcqgen.get_spec_llm,
+                        mcqgen.get_token_accountant, mcqgen.get_chains):
+            factory.cache_clear()
+        chain = mcqgen.get_chains().generate_evaluate_chain
+        runs = iter(range(args.quizzes))
+        # a distinct document per run keeps the response cache out of it
+        results[f"chain/{name}"] = measure(
+            lambda: chain.invoke({**inputs, "text": f"{inputs['text']}\n\nDocument {next(runs)}."}),
+            args.quizzes)
+        tokens[name] = mcqgen.get_token_accountant().stats()
+        print(f"{name} done", file=sys.stderr)
+
+    print_results(results)
+    for name, stages in tokens.items():
+        print(f"\n{name}:", end="")
+        print_tokens(stages)
+    speedup = results["chain/single-model"]["median_ms"] / results["chain/review-routed"]["median_ms"]
+    review_speedup = (tokens["single-model"]["review_chain"]["seconds_per_call"]
+                      / tokens["review-routed"]["review_chain"]["seconds_per_call"])
+    print(f"\nreview stage {review_speedup:.2f}x faster, end to end {speedup:.2f}x faster")
+    path = save_report("routing", results, vars(args),
+                       {"tokens": tokens, "speedup": round(speedup, 3), "review_speedup": round(review_speedup, 3)})
+    print(f"\nReport written to {path}")
+
+    failures = []
+    if speedup <= 1.0:
+        failures.append("routing review to the small model did not speed up the pipeline")
+    if args.compare and compare(results, args.compare, args.threshold):
+        failures.append("routing regressed against the baseline")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""HTTP service latency and throughput against the local fake LLM.
+
+    python -m benchmarks.bench_service [--concurrency 1 4 16] [--requests 32] [--compare REPORT.json]
+
+Starts service.GenerationServer on a free port. For each concurrency level it sends
+--requests POST /generate calls that many at a time, and the same number of
+POST /stream calls, where it also times the first question. It then overloads a
+server limited to --max-in-flight to check that the extra requests get 503 at once
+instead of queueing. Every request asks for a distinct document, so the response
+cache does not answer for the model. Finally a burst of --burst identical requests
+must cost the model calls of a single request (single-flight coalescing).
+"""
+import argparse
+import http.client
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import DEFAULT_THRESHOLD, ROOT, base_text, compare, print_results, save_report, use_fake_llm
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level and endpoint")
+    parser.add_argument("--number", type=int, default=5, help="questions per request")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="limit for the overload check")
+    parser.add_argument("--burst", type=int, default=16, help="identical requests sent at once")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake LLM latency per call (s)")
+    parser.add_argument("--tps", type=float, default=5000, help="fake LLM tokens per second")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def start_server(**kwargs):
+    from src.mcqgenerator.service import GenerationServer
+
+    server = GenerationServer(("127.0.0.1", 0), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def post(port, path, body):
+    """(status, seconds to the first response line, total seconds, lines) for one request."""
+    started = time.perf_counter()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+    conn.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    first = None
+    lines = []
+    while True:
+        line = response.readline()
+        if not line:
+            break
+        if first is None:
+            first = time.perf_counter() - started
+        lines.append(line)
+    conn.close()
+    return response.status, first, time.perf_counter() - started, lines
+
+
+def stats_ms(seconds):
+    timings = sorted(s * 1000 for s in seconds)
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(timings[0], 3),
+        "max_ms": round(timings[-1], 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "repeat": len(timings),
+    }
+
+
+def run_level(port, path, concurrency, bodies):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda body: post(port, path, body), bodies))
+    wall = time.perf_counter() - started
+    failed = [status for status, *_ in outcomes if status != 200]
+    return outcomes, len(bodies) / wall, failed
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    use_fake_llm(latency=args.latency, tokens_per_second=args.tps)
+
+    with open(f"{ROOT}/response.json", "r") as f:
+        response_json = json.load(f)
+    text = base_text()
+    counter = iter(range(10 ** 9))
+
+    def body():
+        # a distinct document per request keeps the response cache and question bank out of it
+        return {"text": f"{text}\n\nDocument {next(counter)}.", "number": args.number, "subject": "Biology",
+                "tone": "Medium", "response_json": response_json, "fresh": True}
+
+    server = start_server(max_in_flight=max(args.concurrency + [args.burst]))
+    port = server.server_address[1]
+    results = {}
+    throughput = {}
+    failures = []
+    for concurrency in args.concurrency:
+        for path in ("/generate", "/stream"):
+            outcomes, rate, failed = run_level(port, path, concurrency, [body() for _ in range(args.requests)])
+            name = f"{path.strip('/')}/c{concurrency}"
+            results[name] = stats_ms([total for _, _, total, _ in outcomes])
+            if path == "/stream":
+                results[f"stream_first_question/c{concurrency}"] = stats_ms([first for _, first, _, _ in outcomes])
+            throughput[name] = round(rate, 2)
+            print(f"{name}: {rate:.1f} req/s, {len(failed)} failed", file=sys.stderr)
+            if failed:
+                failures.append(f"{name}: {len(failed)} requests failed ({sorted(set(failed))})")
+
+    # burst: the same document from everyone at once; the shared calls are counted by the scheduler
+    from src.mcqgenerator.mcqgen import get_scheduler
+    before = get_scheduler().stats()["completed"]
+    post(port, "/generate", body())
+    single = get_scheduler().stats()["completed"] - before
+    same = body()
+    before = get_scheduler().stats()["completed"]
+    outcomes, _, failed = run_level(port, "/generate", args.burst, [same] * args.burst)
+    burst_calls = get_scheduler().stats()["completed"] - before
+    results[f"burst/{args.burst}"] = stats_ms([total for _, _, total, _ in outcomes])
+    print(f"burst: {args.burst} identical requests made {burst_calls} model calls "
+          f"(one request makes {single})", file=sys.stderr)
+    if failed or burst_calls > single:
+        failures.append(f"burst of {args.burst} made {burst_calls} model calls, one request makes {single}")
+    server.shutdown()
+
+    # overload: twice the limit at once; the extras must be refused quickly, not queued
+    limited = start_server(max_in_flight=args.max_in_flight)
+    outcomes, _, _ = run_level(limited.server_address[1], "/generate", args.max_in_flight * 2,
+                               [body() for _ in range(args.max_in_flight * 2)])
+    limited.shutdown()
+    refused = [total for status, _, total, _ in outcomes if status == 503]
+    served = [total for status, _, total, _ in outcomes if status == 200]
+    print(f"overload: {len(served)} served, {len(refused)} refused", file=sys.stderr)
+    if not refused:
+        failures.append("no request was refused past max_in_flight")
+    else:
+        results["overload/refused"] = stats_ms(refused)
+        if served and max(refused) > min(served):
+            failures.append("refused requests waited as long as served ones")
+
+    print_results(results)
+    print(f"\n{'endpoint':<40} {'req/s':>12} {'p95 ms':>12}")
+    for name, rate in throughput.items():
+        print(f"{name:<40} {rate:>12.2f} {results[name]['p95_ms']:>12.2f}")
+    path = save_report("service", results, vars(args), {"throughput": throughput, "burst_calls": burst_calls})
+    print(f"\nReport written to {path}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        failures.append("service regressed against the baseline")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
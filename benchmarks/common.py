@@ -0,0 +1,165 @@
+"""Shared helpers for the benchmark suites (run from the repository root)."""
+import io
+import json
+import os
+import platform
+import statistics
+import tempfile
+import textwrap
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+# a stage that gets this much slower than the baseline is reported as a regression
+DEFAULT_THRESHOLD = 0.20
+
+
+def use_fake_llm(latency=0.05, tokens_per_second=5000, error_rate=0.0, malformed_rate=0.0, seed=0):
+    """Point mcqgen at the local FakeQuizModel. Must run before mcqgen is imported."""
+    os.environ.update({
+        "MCQGEN_LLM_BACKEND": "fake",
+        "MCQGEN_FAKE_LATENCY": str(latency),
+        "MCQGEN_FAKE_TPS": str(tokens_per_second),
+        "MCQGEN_FAKE_ERROR_RATE": str(error_rate),
+        "MCQGEN_FAKE_MALFORMED_RATE": str(malformed_rate),
+        "MCQGEN_FAKE_SEED": str(seed),
+        # keep benchmark runs out of the real cache and away from the free-tier limits
+        "MCQGEN_CACHE_DIR": tempfile.mkdtemp(prefix="mcqgen-bench-"),
+        "MCQGEN_SCORE_CACHE_DIR": tempfile.mkdtemp(prefix="mcqgen-bench-scores-"),
+        "MCQGEN_RPM": "1000000",
+        "MCQGEN_TPM": "1000000000",
+    })
+
+
+def measure(fn, repeat=5):
+    """Run fn repeat times; return timing stats in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "max_ms": round(max(timings), 3),
+        "repeat": repeat,
+    }
+
+
+def percentiles(seconds):
+    """Median, min, max, p95 and p99 in milliseconds of latencies given in seconds."""
+    timings = sorted(s * 1000 for s in seconds)
+
+    def at(fraction):
+        return round(timings[min(len(timings) - 1, int(len(timings) * fraction))], 3)
+
+    return {"median_ms": round(statistics.median(timings), 3), "min_ms": round(timings[0], 3),
+            "max_ms": round(timings[-1], 3), "p95_ms": at(0.95), "p99_ms": at(0.99), "repeat": len(timings)}
+
+
+def base_text():
+    with open(os.path.join(ROOT, "data.txt"), "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def synthetic_text(multiplier):
+    """data.txt repeated multiplier times as separate paragraphs."""
+    return "\n\n".join([base_text()] * multiplier)
+
+
+def _pdf_escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def synthetic_pdf(text, lines_per_page=50, width=95):
+    """A minimal text PDF (Helvetica, one text object per page) PyPDF2 can extract from."""
+    lines = textwrap.wrap(text, width) or [""]
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        body = "BT /F1 10 Tf 12 TL 40 800 Td\n" + "".join(f"({_pdf_escape(line)}) '\n" for line in page) + "ET"
+        stream = body.encode("latin-1", errors="replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class NamedBytesIO(io.BytesIO):
+    """Just enough of Streamlit's UploadedFile for read_file."""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def save_report(suite, results, config, extra=None):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    report = {
+        "suite": suite,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": config,
+        "results": results,
+        **(extra or {}),
+    }
+    path = os.path.join(RESULTS_DIR, f"{suite}_{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def compare(results, baseline_path, threshold=DEFAULT_THRESHOLD):
+    """Print per-stage change against a previous report; return the regressed stage names."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    print(f"\n{'stage':<40} {'baseline ms':>12} {'now ms':>12} {'change':>9}")
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["median_ms"]
+        now = stats["median_ms"]
+        change = (now - before) / before if before else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<40} {before:>12.2f} {now:>12.2f} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def print_results(results):
+    print(f"\n{'stage':<40} {'median ms':>12} {'min ms':>12} {'max ms':>12}")
+    for name, stats in results.items():
+        print(f"{name:<40} {stats['median_ms']:>12.2f} {stats['min_ms']:>12.2f} {stats['max_ms']:>12.2f}")
+
+
+def print_tokens(stages):
+    """Print TokenAccountant.stats() as a table."""
+    print(f"\n{'chain':<40} {'calls':>6} {'hits':>6} {'input tok':>10} {'output tok':>10} {'s/call':>8}  model")
+    for name, totals in stages.items():
+        print(f"{name:<40} {totals['calls']:>6} {totals['cache_hits']:>6} "
+              f"{totals['input_tokens']:>10} {totals['output_tokens']:>10} "
+              f"{totals.get('seconds_per_call', 0.0):>8.3f}  {totals.get('model') or ''}")
@@ -1,6 +1,199 @@
-def main():
-    print("Hello from automcqgen!")
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.mcqgenerator.chunking import generate_chunked
+from src.mcqgenerator.dedup import DEFAULT_THRESHOLD, MinHashIndex, question_text
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.mcqgen import get_chains, get_scheduler
+from src.mcqgenerator.repair import repair_quiz
+from src.mcqgenerator.summarise import summarise
+from src.mcqgenerator.utils import get_table_data, read_file
+
+SUPPORTED = (".pdf", ".txt")
+CSV_FIELDS = ["MCQ", "Choices", "Correct"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate a question bank from a directory of PDF and TXT documents."
+    )
+    parser.add_argument("directory", help="directory containing .pdf / .txt documents")
+    parser.add_argument("--subject", required=True, help="subject the questions are for, e.g. Physiology")
+    parser.add_argument("--tone", default="Medium", help="difficulty level (default: Medium)")
+    parser.add_argument("--number", type=int, default=10, help="questions per document (default: 10)")
+    parser.add_argument("--topics", help="comma-separated topics; long documents are narrowed to passages about them")
+    parser.add_argument("--out", default="question_bank.jsonl", help="JSONL output, appended to")
+    parser.add_argument("--csv", help="also append rows to this CSV (MCQ, Choices, Correct)")
+    parser.add_argument("--workers", type=int, default=4, help="documents generated in parallel")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <out>.checkpoint.json)")
+    parser.add_argument("--chunked", action="store_true", help="use chunked generation for large documents")
+    parser.add_argument("--fresh", action="store_true", help="skip the response cache")
+    parser.add_argument("--dedup-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"drop questions this similar to one already in the bank (default: {DEFAULT_THRESHOLD}); "
+                             "1.1 keeps everything")
+    parser.add_argument("--condense", type=int, default=0, metavar="TOKENS",
+                        help="condense documents longer than TOKENS to their key sentences before generation "
+                             "(extractive, no model call; default: off)")
+    return parser.parse_args(argv)
+
+
+def find_documents(directory):
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(SUPPORTED):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return set(json.load(f)["done"])
+
+
+def save_checkpoint(path, done):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"done": sorted(done)}, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_bank_index(path, threshold):
+    """Near-duplicate index primed with the questions already in the output file."""
+    index = MinHashIndex(threshold)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            index.add([question_text(json.loads(line)) for line in f if line.strip()])
+    return index
+
+
+def load_response_json():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(script_dir, "response.json"), "r") as f:
+        return json.load(f)
+
+
+def generate_document(path, inputs, chunked, condense=0):
+    """Generate and parse the quiz for one document; returns its table rows."""
+    with open(path, "rb") as file:
+        text = read_file(file)
+    inputs = {**inputs, "text": text}
+    if condense:
+        # the condensed text is already within its budget: retrieval would cut it again
+        inputs = {**inputs, "text": summarise(text, condense).text, "retrieve": False}
+    # question banks skip the review stage
+    config = {"metadata": {"priority": "batch"}}
+    if chunked:
+        quiz = generate_chunked(inputs)
+    else:
+        quiz = get_chains().quiz_chain.invoke(inputs, config)
+        quiz = repair_quiz(quiz, inputs, config=config)
+    return get_table_data(quiz)
+
+
+def csv_row(row):
+    # same shape as experiment/biologyquestions.csv
+    choices = " | ".join(
+        f"{letter}: {row[f'Option {letter.upper()}']}" for letter in "abcd" if row[f"Option {letter.upper()}"]
+    )
+    # the table has the answer's letter; the CSV has its text (answers that matched no option are kept as given)
+    correct = row["Correct Answer"]
+    correct = row.get(f"Option {correct.upper()}") or correct
+    return {"MCQ": row["MCQ"], "Choices": choices, "Correct": correct}
+
+
+def run(args):
+    scheduler = get_scheduler()
+    checkpoint = args.checkpoint or f"{args.out}.checkpoint.json"
+    documents = find_documents(args.directory)
+    done = load_checkpoint(checkpoint)
+    pending = [p for p in documents if os.path.relpath(p, args.directory) not in done]
+    print(f"{len(documents)} documents, {len(documents) - len(pending)} already done, {len(pending)} to go",
+          file=sys.stderr)
+    if not pending:
+        return 0
+
+    inputs = {
+        "number": args.number,
+        "subject": args.subject,
+        "tone": args.tone,
+        "response_json": load_response_json(),
+        "fresh": args.fresh,
+        "topics": args.topics,
+    }
+
+    new_csv = args.csv and (not os.path.exists(args.csv) or os.path.getsize(args.csv) == 0)
+    jsonl_file = open(args.out, "a", encoding="utf-8")
+    csv_file = open(args.csv, "a", newline="", encoding="utf-8") if args.csv else None
+    writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS) if csv_file else None
+    if new_csv:
+        writer.writeheader()
+
+    bank = load_bank_index(args.out, args.dedup_threshold)
+    started = time.perf_counter()
+    tokens_before = scheduler.stats()["tokens_used"]
+    completed = failed = dropped = 0
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = {pool.submit(generate_document, path, inputs, args.chunked, args.condense): path for path in pending}
+            for future in as_completed(futures):
+                name = os.path.relpath(futures[future], args.directory)
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"{name}: {e}")
+                    print(f"{name}: FAILED ({e})", file=sys.stderr)
+                    continue
+
+                # questions already in the bank (from this or an earlier run) are not written again
+                matches = bank.add([question_text(row) for row in rows])
+                repeats = sum(match is not None for match in matches)
+                dropped += repeats
+                rows = [row for row, match in zip(rows, matches) if match is None]
+
+                for number, row in enumerate(rows, start=1):
+                    record = {"document": name, "number": number, "subject": args.subject, "tone": args.tone, **row}
+                    jsonl_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    if writer:
+                        writer.writerow(csv_row(row))
+                jsonl_file.flush()
+                if csv_file:
+                    csv_file.flush()
+
+                # only checkpoint once the document's rows are on disk
+                done.add(name)
+                save_checkpoint(checkpoint, done)
+                completed += 1
+
+                minutes = (time.perf_counter() - started) / 60
+                tokens = scheduler.stats()["tokens_used"] - tokens_before
+                dropped_note = f" ({repeats} repeats dropped)" if repeats else ""
+                report = (f"[{completed + failed}/{len(pending)}] {name}: {len(rows)} questions{dropped_note} | "
+                          f"{completed / minutes:.1f} docs/min | {tokens / minutes:.0f} tokens/min")
+                logger.info(report)
+                print(report, file=sys.stderr)
+    finally:
+        jsonl_file.close()
+        if csv_file:
+            csv_file.close()
+
+    print(f"Done: {completed} generated, {failed} failed, {dropped} repeated questions dropped "
+          f"in {time.perf_counter() - started:.1f}s",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    return run(parse_args(argv))
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
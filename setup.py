@@ -9,8 +9,9 @@ setup(
     install_requires=[
         "langchain",
         "langchain-groq",
-        "streamlit",
+        "streamlit>=1.37",
         "python-dotenv",
         "PyPDF2",
+        "numpy",
     ],
 )
@@ -0,0 +1,20 @@
+"""Quiz generation pipeline.
+
+Importing the package is cheap: no LLM client, prompt or log file is created until
+something is actually generated. The public API is loaded on first attribute access.
+"""
+import importlib
+
+_EXPORTS = {
+    "agenerate": "api",
+    "agenerate_many": "api",
+    "generate_many": "api",
+    "get_chains": "mcqgen",
+    "set_tracing": "mcqgen",
+}
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(f"{__name__}.{_EXPORTS[name]}"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,69 @@
+import asyncio
+from collections import namedtuple
+
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.mcqgen import get_chains
+
+# How many quiz+review pipelines one process keeps in flight by default
+DEFAULT_CONCURRENCY = 8
+
+
+class GenerationResult(namedtuple("GenerationResult", ["index", "inputs", "result", "error"])):
+    @property
+    def ok(self):
+        return self.error is None
+
+
+async def agenerate(inputs, semaphore=None, chain=None, config=None):
+    """Async generate_evaluate_chain.invoke; returns {..., "quiz", "review"}.
+
+    Pass a shared asyncio.Semaphore to bound how many calls are in flight at once.
+    """
+    chain = chain or get_chains().generate_evaluate_chain
+    if semaphore is None:
+        return await chain.ainvoke(inputs, config)
+    async with semaphore:
+        return await chain.ainvoke(inputs, config)
+
+
+def _batch_config(config):
+    # batch work queues behind interactive users in the rate-limit scheduler
+    config = dict(config or {})
+    config["metadata"] = {"priority": "batch", **(config.get("metadata") or {})}
+    return config
+
+
+async def agenerate_many(inputs_list, max_concurrency=DEFAULT_CONCURRENCY, chain=None, config=None):
+    """Run many generations concurrently; returns GenerationResults in input order.
+
+    A failing item is reported in its result's error and does not cancel the others.
+    """
+    config = _batch_config(config)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(index, inputs):
+        try:
+            result = await agenerate(inputs, semaphore, chain, config)
+        except Exception as e:
+            logger.error(f"Batch item {index} failed: {e}")
+            return GenerationResult(index, inputs, None, e)
+        return GenerationResult(index, inputs, result, None)
+
+    return await asyncio.gather(*(run(i, inputs) for i, inputs in enumerate(inputs_list)))
+
+
+def generate_many(inputs_list, max_concurrency=DEFAULT_CONCURRENCY, chain=None, config=None):
+    """Blocking batch API on a thread pool; returns GenerationResults in input order."""
+    chain = chain or get_chains().generate_evaluate_chain
+    inputs_list = list(inputs_list)
+    config = {**_batch_config(config), "max_concurrency": max_concurrency}
+    outputs = chain.batch(inputs_list, config, return_exceptions=True)
+
+    results = []
+    for index, (inputs, output) in enumerate(zip(inputs_list, outputs)):
+        if isinstance(output, Exception):
+            logger.error(f"Batch item {index} failed: {output}")
+            results.append(GenerationResult(index, inputs, None, output))
+        else:
+            results.append(GenerationResult(index, inputs, output, None))
+    return results
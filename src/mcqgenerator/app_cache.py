@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+from collections import Counter
+
+import streamlit as st
+
+from src.mcqgenerator.mcqgen import (get_chains, get_question_bank, get_response_cache, get_single_flight,
+                                     get_text_cache)
+
+# st.cache_resource does not report hits, so calls and builds are counted here
+_calls = Counter()
+_builds = Counter()
+_lock = threading.Lock()
+
+
+def _count(counter, name):
+    with _lock:
+        counter[name] += 1
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _response_json(path, mtime):
+    _count(_builds, "response.json")
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_response_json(path):
+    """response.json, parsed once per process and shared by every session.
+
+    The file's mtime is part of the cache key, so editing it takes effect on the next
+    rerun. Treat the result as read-only.
+    """
+    _count(_calls, "response.json")
+    return _response_json(path, os.path.getmtime(path))
+
+
+@st.cache_resource(show_spinner=False)
+def _chains():
+    _count(_builds, "chains")
+    return get_chains()
+
+
+def load_chains():
+    """The Chains tuple, built once per process and shared by every session."""
+    _count(_calls, "chains")
+    return _chains()
+
+
+def cache_stats():
+    """One row per cache: hits, misses and hit rate, plus size where there is one.
+
+    The question bank only has a row once something has used it.
+    """
+    rows = []
+    with _lock:
+        for name in sorted(_calls):
+            hits = _calls[name] - _builds[name]
+            rows.append({"cache": name, "hits": hits, "misses": _builds[name],
+                         "hit_rate": hits / _calls[name], "size": ""})
+
+    text = get_text_cache().stats()
+    rows.append({"cache": "document text", "hits": text["hits"], "misses": text["misses"],
+                 "hit_rate": text["hit_rate"],
+                 "size": f"{text['entries']} docs, {text['bytes'] / 1024 / 1024:.1f} MB"})
+    responses = get_response_cache().stats()
+    rows.append({"cache": "LLM responses", "hits": responses["hits"], "misses": responses["misses"],
+                 "hit_rate": responses["hit_rate"], "size": ""})
+    flights = get_single_flight().stats()
+    rows.append({"cache": "shared in-flight calls", "hits": flights["coalesced"], "misses": flights["executed"],
+                 "hit_rate": flights["coalesce_rate"], "size": f"{flights['in_flight']} in flight"})
+    # only apps that use the bank build it; the panel should not create its database
+    if get_question_bank.cache_info().currsize:
+        bank = get_question_bank().stats()
+        rows.append({"cache": "question bank", "hits": bank["served"], "misses": bank["generated"],
+                     "hit_rate": bank["hit_rate"], "size": f"{bank['questions']} questions"})
+    return rows
+
+
+def render_debug_panel():
+    """Sidebar expander with the hit rates of the caches above."""
+    with st.sidebar.expander("🛠 Debug: caches"):
+        rows = cache_stats()
+        for row in rows:
+            row["hit_rate"] = f"{row['hit_rate']:.0%}"
+        st.table(rows)
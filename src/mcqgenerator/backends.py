@@ -0,0 +1,333 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from langchain_core.runnables import Runnable
+
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.scheduler import ScheduledChatModel, admitted
+
+DEFAULT_GROQ_MODEL = "openai/gpt-oss-120b"
+# completion cap for groq backends (unset: the model's own), which the scheduler reserves per call
+DEFAULT_MAX_TOKENS = int(os.getenv("MCQGEN_MAX_TOKENS", "0")) or None
+# hedge after this long until a stage has MIN_SAMPLES latencies to take a p95 from
+DEFAULT_HEDGE_AFTER = 15.0
+MIN_SAMPLES = 20
+WINDOW = 200
+PERCENTILE = 0.95
+
+_END = object()
+
+
+def _settings(options):
+    """"model,temperature=0.2" -> ("model", {"temperature": 0.2}); numbers become floats."""
+    name = None
+    settings = {}
+    for option in options.split(","):
+        if "=" in option:
+            key, value = option.split("=", 1)
+            try:
+                settings[key.strip()] = float(value)
+            except ValueError:
+                settings[key.strip()] = value.strip()
+        elif option.strip():
+            name = option.strip()
+    return name, settings
+
+
+def make_backend(spec):
+    """A raw chat model from a backend spec.
+
+    "groq", "groq:<model>" or "groq:<model>,temperature=0.2" is ChatGroq, with HTTP
+    clients that pass every response's rate-limit headers on to the scheduler;
+    "fake" or "fake:latency=0.1,slow_rate=0.05" is the local FakeQuizModel with those
+    settings over its MCQGEN_FAKE_* ones.
+    """
+    kind, _, options = spec.partition(":")
+    name, settings = _settings(options)
+    if kind == "fake":
+        from src.mcqgenerator.fake_llm import FakeQuizModel
+        if name:
+            settings["model_name"] = name
+        return FakeQuizModel.from_env(**settings)
+    if kind == "groq":
+        import httpx
+        from langchain_groq import ChatGroq
+        from src.mcqgenerator.scheduler import arecord_headers, record_headers
+        max_tokens = settings.pop("max_tokens", DEFAULT_MAX_TOKENS)
+        # Retries are left to the scheduler, which waits out retry-after instead of retrying blind
+        return ChatGroq(**{"model": name or DEFAULT_GROQ_MODEL,
+                           "api_key": os.getenv("GROQ_API_KEY"),
+                           "temperature": 0.5,
+                           "max_retries": 0,
+                           "max_tokens": int(max_tokens) if max_tokens else None,
+                           "http_client": httpx.Client(event_hooks={"response": [record_headers]}),
+                           "http_async_client": httpx.AsyncClient(event_hooks={"response": [arecord_headers]}),
+                           **settings})
+    raise Exception(f"unknown LLM backend {spec!r}, expected groq[:model][,settings] or fake[:settings]")
+
+
+def parse_deadlines(value):
+    """"quiz_chain=20,review_chain=8" -> {"quiz_chain": 20.0, "review_chain": 8.0}."""
+    deadlines = {}
+    for item in (value or "").split(","):
+        if item.strip():
+            stage, _, seconds = item.partition("=")
+            deadlines[stage.strip()] = float(seconds)
+    return deadlines
+
+
+def _stage(config):
+    metadata = (config or {}).get("metadata") or {}
+    return metadata.get("stage", "default")
+
+
+class LatencyStats:
+    """Recent primary latencies per stage, the hedging deadlines taken from them, and hedge outcomes.
+
+    A stage's deadline is its entry in deadlines if there is one, otherwise the p95 of
+    its last WINDOW primary latencies (hedge_after until there are MIN_SAMPLES).
+    Latencies of calls that lost a hedge are recorded too, so slow calls keep counting
+    towards the p95.
+    """
+
+    def __init__(self, deadlines=None, hedge_after=DEFAULT_HEDGE_AFTER):
+        self.deadlines = dict(deadlines or {})
+        self.hedge_after = hedge_after
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=WINDOW)).append(seconds)
+
+    def count(self, stage, event):
+        with self._lock:
+            counts = self._counts.setdefault(stage, {"calls": 0, "hedged": 0, "hedge_wins": 0, "fallbacks": 0})
+            counts[event] += 1
+
+    def _p95(self, samples):
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * PERCENTILE))]
+
+    def deadline(self, stage):
+        if stage in self.deadlines:
+            return self.deadlines[stage]
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None or len(samples) < MIN_SAMPLES:
+                return self.hedge_after
+            return self._p95(samples)
+
+    def stats(self):
+        """Per stage: calls, how many were hedged, how many the secondary won, fallbacks after errors."""
+        with self._lock:
+            stats = {}
+            for stage, counts in self._counts.items():
+                samples = self._samples.get(stage) or ()
+                stats[stage] = {
+                    **counts,
+                    "hedge_win_rate": counts["hedge_wins"] / counts["hedged"] if counts["hedged"] else 0.0,
+                    "p95_s": round(self._p95(samples), 3) if samples else None,
+                }
+            return stats
+
+
+def _close_loser(future, winner):
+    # the stream that lost is closed as soon as its first chunk is in
+    if future.exception() is None and future.result() is not winner:
+        future.result()[0].close()
+
+
+class HedgedChatModel(Runnable):
+    """Sends a call to primary and, if it has not answered by the stage's deadline, to secondary too.
+
+    Whichever answers first is used; the other call runs to completion in the
+    background and its answer is dropped. If primary fails first, secondary is asked
+    straight away. Streams are hedged on the time to their first chunk. The stage is
+    config["metadata"]["stage"] (CachedChain sets it to the chain name).
+
+    When primary is a ScheduledChatModel the clock starts once its scheduler lets the
+    call out: time spent queued for rate limits is not backend latency.
+    """
+
+    def __init__(self, llm, secondary, latency_stats=None, max_workers=16):
+        # .llm is what cache.model_settings keys on: answers count as primary's
+        self.llm = llm
+        self.secondary = secondary
+        self.latency_stats = latency_stats or LatencyStats()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcqgen-hedge")
+
+    def _submit(self, fn, *args, **kwargs):
+        # run with the caller's context so LangChain callbacks and tracing still apply
+        return self._pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+    def _timed(self, stage, future, started):
+        future.add_done_callback(lambda _: self.latency_stats.record(stage, time.perf_counter() - started))
+
+    def _start_primary(self, start, event):
+        """start() the primary call; event is set once it is past its scheduler (or done)."""
+        if not isinstance(self.llm, ScheduledChatModel):
+            event.set()
+        # the call is started in a copy of this context, which carries the event with it
+        token = admitted.set(event)
+        try:
+            primary = start()
+        finally:
+            admitted.reset(token)
+        primary.add_done_callback(lambda _: event.set())
+        return primary
+
+    def _race(self, stage, start_primary, start_secondary):
+        """Result of the first of primary/secondary to succeed, hedging after the deadline."""
+        stats = self.latency_stats
+        stats.count(stage, "calls")
+        event = threading.Event()
+        primary = self._start_primary(start_primary, event)
+        event.wait()
+        started = time.perf_counter()
+        self._timed(stage, primary, started)
+        done, _ = wait([primary], timeout=stats.deadline(stage))
+        if done and primary.exception() is None:
+            return primary.result()
+
+        if done:
+            stats.count(stage, "fallbacks")
+            logger.warning(f"{stage}: primary failed ({primary.exception()}), asking the secondary")
+            return start_secondary().result()
+
+        stats.count(stage, "hedged")
+        logger.info(f"{stage}: no answer after {time.perf_counter() - started:.2f}s, hedging")
+        secondary = start_secondary()
+        pending = {primary, secondary}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is secondary:
+                        stats.count(stage, "hedge_wins")
+                    return future.result()
+        # both failed: report the primary's error
+        return primary.result()
+
+    def invoke(self, input, config=None, **kwargs):
+        return self._race(
+            _stage(config),
+            lambda: self._submit(self.llm.invoke, input, config, **kwargs),
+            lambda: self._submit(self.secondary.invoke, input, config, **kwargs),
+        )
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        stage = _stage(config)
+        stats = self.latency_stats
+        stats.count(stage, "calls")
+        event = asyncio.Event()
+        primary = self._start_primary(lambda: asyncio.ensure_future(self.llm.ainvoke(input, config, **kwargs)), event)
+        await event.wait()
+        started = time.perf_counter()
+        primary.add_done_callback(lambda _: stats.record(stage, time.perf_counter() - started))
+        done, _ = await asyncio.wait([primary], timeout=stats.deadline(stage))
+        if done and primary.exception() is None:
+            return primary.result()
+
+        if done:
+            stats.count(stage, "fallbacks")
+            logger.warning(f"{stage}: primary failed ({primary.exception()}), asking the secondary")
+            return await self.secondary.ainvoke(input, config, **kwargs)
+
+        stats.count(stage, "hedged")
+        logger.info(f"{stage}: no answer after {time.perf_counter() - started:.2f}s, hedging")
+        secondary = asyncio.ensure_future(self.secondary.ainvoke(input, config, **kwargs))
+        pending = {primary, secondary}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is secondary:
+                        stats.count(stage, "hedge_wins")
+                    # the loser's answer would be dropped anyway
+                    for loser in pending:
+                        loser.cancel()
+                    return task.result()
+        return primary.result()
+
+    def _first_chunk(self, model, input, config, kwargs):
+        """Start a stream on the pool; the future resolves to (iterator, first chunk)."""
+        def start():
+            chunks = iter(model.stream(input, config, **kwargs))
+            return chunks, next(chunks, _END)
+        return self._submit(start)
+
+    def stream(self, input, config=None, **kwargs):
+        stage = _stage(config)
+        futures = []
+
+        def start(model):
+            future = self._first_chunk(model, input, config, kwargs)
+            futures.append(future)
+            return future
+
+        winner = self._race(f"{stage}/first_chunk", lambda: start(self.llm), lambda: start(self.secondary))
+        for future in futures:
+            future.add_done_callback(lambda f: _close_loser(f, winner))
+        chunks, first = winner
+        if first is _END:
+            return
+        yield first
+        yield from chunks
+
+    async def astream(self, input, config=None, **kwargs):
+        stage = f"{_stage(config)}/first_chunk"
+        stats = self.latency_stats
+        stats.count(stage, "calls")
+
+        async def start(model):
+            chunks = model.astream(input, config, **kwargs).__aiter__()
+            try:
+                return chunks, await chunks.__anext__()
+            except StopAsyncIteration:
+                return chunks, _END
+
+        event = asyncio.Event()
+        primary = self._start_primary(lambda: asyncio.ensure_future(start(self.llm)), event)
+        await event.wait()
+        started = time.perf_counter()
+        primary.add_done_callback(lambda _: stats.record(stage, time.perf_counter() - started))
+        done, _ = await asyncio.wait([primary], timeout=stats.deadline(stage))
+        if done and primary.exception() is not None:
+            stats.count(stage, "fallbacks")
+            logger.warning(f"{stage}: primary failed ({primary.exception()}), asking the secondary")
+            winner = await start(self.secondary)
+        elif done:
+            winner = primary.result()
+        else:
+            stats.count(stage, "hedged")
+            secondary = asyncio.ensure_future(start(self.secondary))
+            pending = {primary, secondary}
+            winner = None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and winner is None:
+                        winner = task.result()
+                        if task is secondary:
+                            stats.count(stage, "hedge_wins")
+            for task in pending:
+                task.cancel()
+            for task in (primary, secondary):
+                if task.done() and not task.cancelled() and task.exception() is None and task.result() is not winner:
+                    await task.result()[0].aclose()
+            if winner is None:
+                winner = primary.result()
+
+        chunks, first = winner
+        if first is _END:
+            return
+        yield first
+        async for chunk in chunks:
+            yield chunk
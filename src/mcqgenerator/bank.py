@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.prompts import normalise_whitespace
+from src.mcqgenerator.schema import Question, parse_quiz
+
+DEFAULT_BANK_PATH = os.path.join(os.getcwd(), ".cache", "question_bank.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    doc_hash TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    tone TEXT NOT NULL,
+    stem_hash TEXT NOT NULL,
+    question TEXT NOT NULL,
+    created REAL NOT NULL,
+    served INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (doc_hash, subject, tone, stem_hash)
+);
+CREATE INDEX IF NOT EXISTS questions_lookup ON questions (doc_hash, subject, tone);
+CREATE INDEX IF NOT EXISTS questions_subject ON questions (subject, tone);
+"""
+
+
+def document_hash(text):
+    """Content hash of a document; extraction whitespace differences do not change it."""
+    return hashlib.sha256(normalise_whitespace(text).encode("utf-8")).hexdigest()
+
+
+def _label(value):
+    return " ".join(str(value).split()).lower()
+
+
+def _topics_label(topics):
+    """Comma-separated topics, normalised, deduplicated and sorted; "" for none."""
+    if not topics:
+        return ""
+    if isinstance(topics, str):
+        topics = topics.split(",")
+    return ",".join(sorted({_label(topic) for topic in topics if topic and _label(topic)}))
+
+
+def _stem_hash(question):
+    return hashlib.sha256(_label(question.mcq).encode("utf-8")).hexdigest()
+
+
+class QuestionBank:
+    """SQLite store of generated questions, keyed by document hash (and focus topics), subject and tone.
+
+    Only questions that pass validation are stored, once per stem. serve() returns
+    them in insertion order, so asking again for the same quiz gives the same quiz
+    text (and the review comes from the response cache).
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("MCQGEN_BANK_PATH", DEFAULT_BANK_PATH)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        # opened on first use; Streamlit reruns and worker threads share one connection
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def key(inputs):
+        """(doc_hash, subject, tone) for quiz inputs.
+
+        Focus topics narrow the passages a quiz is written from, so a quiz on a document
+        with topics is stored apart from one on the whole document (and from other topics).
+        """
+        doc_hash = document_hash(inputs["text"])
+        topics = _topics_label(inputs.get("topics"))
+        if topics:
+            doc_hash = hashlib.sha256(f"{doc_hash}\n{topics}".encode("utf-8")).hexdigest()
+        return doc_hash, _label(inputs["subject"]), _label(inputs["tone"])
+
+    def take(self, doc_hash, subject, tone, number):
+        """Up to number stored question objects for this document, subject and tone."""
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT id, question FROM questions WHERE doc_hash = ? AND subject = ? AND tone = ? "
+                "ORDER BY id LIMIT ?",
+                (doc_hash, _label(subject), _label(tone), number),
+            ).fetchall()
+            if rows:
+                conn.executemany("UPDATE questions SET served = served + 1 WHERE id = ?",
+                                 [(row[0],) for row in rows])
+                conn.commit()
+        return [json.loads(question) for _, question in rows]
+
+    def add(self, doc_hash, subject, tone, questions):
+        """Store valid question objects; returns how many were new."""
+        now = time.time()
+        records = []
+        for value in questions:
+            question = Question.from_dict(value) if isinstance(value, dict) else None
+            if question is None or question.problems():
+                continue
+            records.append((doc_hash, _label(subject), _label(tone), _stem_hash(question),
+                            json.dumps(value, ensure_ascii=False), now))
+        if not records:
+            return 0
+        with self._lock:
+            conn = self._connection()
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO questions (doc_hash, subject, tone, stem_hash, question, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                records,
+            )
+            conn.commit()
+            return conn.total_changes - before
+
+    def serve(self, inputs):
+        """Stored questions for these quiz inputs as a quiz dict keyed "1".."k" (k <= number)."""
+        if inputs.get("fresh"):
+            return {}
+        doc_hash, subject, tone = self.key(inputs)
+        questions = self.take(doc_hash, subject, tone, int(inputs["number"]))
+        with self._lock:
+            self.hits += len(questions)
+            self.misses += int(inputs["number"]) - len(questions)
+        if questions:
+            logger.info(f"Question bank served {len(questions)}/{inputs['number']} questions")
+        return {str(number): question for number, question in enumerate(questions, start=1)}
+
+    def store(self, inputs, quiz):
+        """Add the questions of a generated quiz (string or dict) to the bank."""
+        try:
+            questions = [value for value in parse_quiz(quiz).values() if isinstance(value, dict)]
+        except Exception as e:
+            logger.warning(f"Quiz not stored in the question bank: {e}")
+            return 0
+        added = self.add(*self.key(inputs), questions)
+        if added:
+            logger.info(f"Question bank stored {added} new questions")
+        return added
+
+    def stats(self):
+        with self._lock:
+            if self._conn is None and not os.path.exists(self.path):
+                # nothing stored yet: do not create the database just to count it
+                total = documents = 0
+            else:
+                total, documents = self._connection().execute(
+                    "SELECT COUNT(*), COUNT(DISTINCT doc_hash) FROM questions"
+                ).fetchone()
+            requested = self.hits + self.misses
+            return {
+                "questions": total,
+                "documents": documents,
+                "served": self.hits,
+                "generated": self.misses,
+                "hit_rate": self.hits / requested if requested else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,392 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable, RunnableBinding
+
+from src.mcqgenerator.logger import logger
+
+DEFAULT_CACHE_DIR = os.path.join(os.getcwd(), ".cache", "responses")
+# per-question review scores (review.review_questions) are stored apart from completions
+DEFAULT_SCORE_DIR = os.path.join(os.getcwd(), ".cache", "scores")
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+# eviction walks the whole directory, so only do it every so many writes
+EVICT_EVERY = 20
+# extracted document text kept in memory by TextCache
+DEFAULT_TEXT_ENTRIES = 32
+DEFAULT_TEXT_BYTES = int(os.getenv("MCQGEN_TEXT_CACHE_MB", "64")) * 1024 * 1024
+
+
+class ResponseCache:
+    """Persistent, content-addressed cache of LLM completions.
+
+    Entries are JSON files named by the sha256 of the rendered prompt plus the model
+    settings. A file's mtime is its last use, which drives LRU eviction once the cache
+    is over max_entries / max_bytes; entries older than max_age are never served.
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age=DEFAULT_MAX_AGE):
+        self.path = path or os.getenv("MCQGEN_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(prompt, settings):
+        payload = json.dumps({"prompt": prompt, "settings": settings}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._file(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+
+        if entry is not None and time.time() - entry["created"] > self.max_age:
+            self._remove(path)
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # touch so LRU eviction sees the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["value"]
+
+    def set(self, key, value):
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "value": value}, f)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.path):
+            return entries
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under the limits."""
+        now = time.time()
+        entries = sorted(self._entries())
+        live = []
+        removed = 0
+        for mtime, size, path in entries:
+            # mtime >= created, so anything untouched for max_age is certainly expired
+            if now - mtime > self.max_age:
+                self._remove(path)
+                removed += 1
+            else:
+                live.append((mtime, size, path))
+
+        total = sum(size for _, size, _ in live)
+        while live and (len(live) > self.max_entries or total > self.max_bytes):
+            _, size, path = live.pop(0)
+            self._remove(path)
+            total -= size
+            removed += 1
+
+        if removed:
+            logger.info(f"Response cache evicted {removed} entries ({len(live)} left, {total} bytes)")
+        return removed
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class TextCache:
+    """In-memory LRU of text extracted from uploaded files, keyed by a hash of their bytes.
+
+    Re-uploading (or re-submitting) the same file skips extraction. Least recently used
+    entries are dropped once there are more than max_entries or their strings take
+    more than max_bytes.
+    """
+
+    def __init__(self, max_entries=DEFAULT_TEXT_ENTRIES, max_bytes=DEFAULT_TEXT_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(name, data):
+        # the extension decides how the bytes are read
+        return f"{os.path.splitext(name)[1].lower()}:{hashlib.sha256(data).hexdigest()}"
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def set(self, key, text):
+        size = sys.getsizeof(text)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= sys.getsizeof(self._entries.pop(key))
+            self._entries[key] = text
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= sys.getsizeof(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+            }
+
+
+def model_settings(llm):
+    """The parts of a chat model's configuration that change its output."""
+    kwargs = {}
+    while True:
+        if isinstance(llm, RunnableBinding):
+            kwargs.update(llm.kwargs)
+            llm = llm.bound
+        elif isinstance(getattr(llm, "llm", None), Runnable):
+            # wrappers such as ScheduledChatModel keep the real model in .llm
+            llm = llm.llm
+        else:
+            break
+    # ChatGroq keeps model/temperature in _default_params; other chat models in _identifying_params
+    params = getattr(llm, "_default_params", None) or getattr(llm, "_identifying_params", None) or {}
+    return {"class": type(llm).__name__, **params, **kwargs}
+
+
+class CachedChain(Runnable):
+    """prompt | llm | StrOutputParser(), with completions served from a ResponseCache.
+
+    Pass "fresh": True in the inputs to skip the lookup (the new completion still
+    replaces the cached one). With an accountant (prompts.TokenAccountant) every
+    call's input and output tokens are counted under the chain's name. stream_llm,
+    if given, serves stream/astream instead of llm (Groq cannot stream
+    schema-constrained output). With flights (singleflight.SingleFlight), cache
+    misses for the same key that overlap in time share one model call. With
+    validate (e.g. schema.parse_quiz), completions it raises on are returned but
+    not cached, so a malformed answer is not served again.
+    """
+
+    def __init__(self, prompt, llm, cache, name=None, accountant=None, stream_llm=None, flights=None,
+                 validate=None):
+        self.prompt = prompt
+        self.llm = llm
+        self.stream_llm = stream_llm or llm
+        self.cache = cache
+        self.name = name or "CachedChain"
+        self.accountant = accountant
+        self.flights = flights
+        self.validate = validate
+        self.parser = StrOutputParser()
+
+    def _lookup(self, inputs, llm=None):
+        prompt_value = self.prompt.invoke(inputs)
+        key = self.cache.key(prompt_value.to_string(), model_settings(llm or self.llm))
+        if isinstance(inputs, dict) and inputs.get("fresh"):
+            return prompt_value, key, None
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.info(f"{self.name}: cache hit {key[:12]}")
+            if self.accountant is not None:
+                self.accountant.cache_hit(self.name)
+        return prompt_value, key, cached
+
+    def _before(self, prompt_value):
+        """(estimated input tokens, start time) for _after."""
+        if self.accountant is None:
+            return None, time.perf_counter()
+        return self.accountant.before(self.name, prompt_value.to_string()), time.perf_counter()
+
+    def _cacheable(self, output):
+        if self.validate is None:
+            return True
+        try:
+            self.validate(output)
+            return True
+        except Exception as e:
+            logger.warning(f"{self.name}: not caching an unusable completion ({e})")
+            return False
+
+    def _after(self, key, call, output, message):
+        if self._cacheable(output):
+            self.cache.set(key, output)
+        if self.accountant is not None:
+            estimate, started = call
+            self.accountant.after(self.name, estimate, output, message, time.perf_counter() - started,
+                                  model_settings(self.llm).get("model"))
+
+    @staticmethod
+    def _tap(chunks, seen):
+        # keep the message chunks so their usage metadata can be merged afterwards
+        for chunk in chunks:
+            seen.append(chunk)
+            yield chunk
+
+    @staticmethod
+    async def _atap(chunks, seen):
+        async for chunk in chunks:
+            seen.append(chunk)
+            yield chunk
+
+    @staticmethod
+    def _merge(seen):
+        if not seen:
+            return None
+        message = seen[0]
+        for chunk in seen[1:]:
+            message = message + chunk
+        return message
+
+    def _config(self, config):
+        # the chain name tells backends.HedgedChatModel which stage's deadline applies
+        config = dict(config or {})
+        config["metadata"] = {"stage": self.name, **(config.get("metadata") or {})}
+        return config
+
+    def _call(self, prompt_value, key, config, kwargs):
+        call = self._before(prompt_value)
+        message = self.llm.invoke(prompt_value, self._config(config), **kwargs)
+        output = self.parser.invoke(message)
+        self._after(key, call, output, message)
+        return output
+
+    async def _acall(self, prompt_value, key, config, kwargs):
+        call = self._before(prompt_value)
+        message = await self.llm.ainvoke(prompt_value, self._config(config), **kwargs)
+        output = self.parser.invoke(message)
+        self._after(key, call, output, message)
+        return output
+
+    def _stream_call(self, prompt_value, key, config, kwargs):
+        call = self._before(prompt_value)
+        seen = []
+        parts = []
+        chunks = self._tap(self.stream_llm.stream(prompt_value, self._config(config), **kwargs), seen)
+        for chunk in self.parser.transform(chunks):
+            parts.append(chunk)
+            yield chunk
+        self._after(key, call, "".join(parts), self._merge(seen))
+
+    async def _astream_call(self, prompt_value, key, config, kwargs):
+        call = self._before(prompt_value)
+        seen = []
+        parts = []
+        chunks = self._atap(self.stream_llm.astream(prompt_value, self._config(config), **kwargs), seen)
+        async for chunk in self.parser.atransform(chunks):
+            parts.append(chunk)
+            yield chunk
+        self._after(key, call, "".join(parts), self._merge(seen))
+
+    def invoke(self, input, config=None, **kwargs):
+        prompt_value, key, cached = self._lookup(input)
+        if cached is not None:
+            return cached
+        if self.flights is None:
+            return self._call(prompt_value, key, config, kwargs)
+        return self.flights.do(key, lambda: self._call(prompt_value, key, config, kwargs))
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        prompt_value, key, cached = self._lookup(input)
+        if cached is not None:
+            return cached
+        if self.flights is None:
+            return await self._acall(prompt_value, key, config, kwargs)
+        return await self.flights.ado(key, lambda: self._acall(prompt_value, key, config, kwargs))
+
+    def stream(self, input, config=None, **kwargs):
+        prompt_value, key, cached = self._lookup(input, self.stream_llm)
+        if cached is not None:
+            yield cached
+            return
+        if self.flights is None:
+            yield from self._stream_call(prompt_value, key, config, kwargs)
+        else:
+            yield from self.flights.stream(key, lambda: self._stream_call(prompt_value, key, config, kwargs))
+
+    async def astream(self, input, config=None, **kwargs):
+        prompt_value, key, cached = self._lookup(input, self.stream_llm)
+        if cached is not None:
+            yield cached
+            return
+        if self.flights is None:
+            chunks = self._astream_call(prompt_value, key, config, kwargs)
+        else:
+            chunks = self.flights.astream(key, lambda: self._astream_call(prompt_value, key, config, kwargs))
+        async for chunk in chunks:
+            yield chunk
@@ -0,0 +1,215 @@
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.mcqgenerator.dedup import find_duplicates
+from src.mcqgenerator.extraction import default_workers, file_page_count, iter_file_pages, read_bytes
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.mcqgen import get_chains, get_text_cache
+from src.mcqgenerator.repair import repair_quiz
+from src.mcqgenerator.utils import CHARS_PER_TOKEN, estimate_tokens, load_quiz_dict
+
+DEFAULT_CHUNK_TOKENS = 3000
+DEFAULT_MAX_WORKERS = 4
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def _pieces(text, max_tokens):
+    """Break text into paragraph/sentence pieces that each fit in max_tokens."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    for para in _PARAGRAPH_SPLIT.split(text):
+        para = para.strip()
+        if not para:
+            continue
+        if len(para) <= max_chars:
+            yield para
+            continue
+        for sentence in _SENTENCE_SPLIT.split(para):
+            # a single run-on "sentence" still has to be cut somewhere
+            for i in range(0, len(sentence), max_chars):
+                yield sentence[i:i + max_chars]
+
+
+def split_text(text, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """Split text into chunks of at most max_tokens, packing whole paragraphs where possible."""
+    return [chunk for chunk, _, _ in iter_chunks([text], max_tokens)]
+
+
+def share(number, start, end, total):
+    """Questions owed to the span [start, end) of a document of size total.
+
+    Cumulative rounding, so the shares of consecutive spans always add up to number.
+    """
+    if total <= 0:
+        return 0
+    return round(number * end / total) - round(number * start / total)
+
+
+def iter_chunks(pages, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """Lazily chunk an iterable of page texts.
+
+    Yields (chunk, start, end) where start/end are positions measured in pages
+    (fractional inside a page), so a chunk's share of the questions can be worked out
+    before the rest of the document has been read.
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be positive")
+
+    current = []
+    current_tokens = 0
+    start = end = 0.0
+    for number, page in enumerate(pages):
+        pieces = list(_pieces(page, max_tokens))
+        page_chars = sum(len(piece) for piece in pieces)
+        seen = 0
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                yield "\n\n".join(current), start, end
+                current = []
+                current_tokens = 0
+                start = end
+            current.append(piece)
+            current_tokens += piece_tokens
+            seen += len(piece)
+            end = number + seen / page_chars
+        # pages with no text still count towards the document size
+        end = float(number + 1)
+    if current:
+        yield "\n\n".join(current), start, end
+
+
+def merge_quizzes(quizzes):
+    """Merge several quizzes in the response.json shape into one, renumbering from 1.
+
+    Chunks often overlap in what they cover, so near-duplicates across them are dropped.
+    """
+    questions = []
+    for quiz in quizzes:
+        questions.extend(value for value in load_quiz_dict(quiz).values() if isinstance(value, dict))
+    duplicates = find_duplicates(questions)
+    if duplicates:
+        logger.info(f"Dropped {len(duplicates)}/{len(questions)} near-duplicate questions across chunks")
+    kept = [question for i, question in enumerate(questions) if i not in duplicates]
+    return {str(number): question for number, question in enumerate(kept, start=1)}
+
+
+def _generate_chunk(quiz_chain, chunk_inputs):
+    # bad questions are repaired against their own chunk's text
+    return repair_quiz(quiz_chain.invoke(chunk_inputs), chunk_inputs)
+
+
+def _run_chunks(jobs, inputs, max_workers):
+    """Run quiz_chain over (chunk, count) jobs concurrently.
+
+    jobs may be a lazy iterator: each chunk is submitted as soon as it is produced.
+    Returns (chunk inputs, output) pairs in document order; output is None for a chunk
+    that failed.
+    """
+    quiz_chain = get_chains().quiz_chain
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        submitted = []
+        for chunk, count in jobs:
+            # a chunk is already a prompt-sized slice of the document: no retrieval on it
+            chunk_inputs = {**inputs, "text": chunk, "number": count, "retrieve": False}
+            submitted.append((chunk_inputs, pool.submit(_generate_chunk, quiz_chain, chunk_inputs)))
+        results = []
+        for i, (chunk_inputs, future) in enumerate(submitted):
+            try:
+                results.append((chunk_inputs, future.result()))
+            except Exception as e:
+                logger.error(f"Chunk {i + 1}/{len(submitted)} failed: {e}")
+                results.append((chunk_inputs, None))
+
+    done = sum(output is not None for _, output in results)
+    if not done:
+        raise Exception("Chunked generation failed: no chunk produced a quiz")
+    logger.info(f"Chunked generation: {done}/{len(results)} chunks in {time.perf_counter() - started:.2f}s")
+    return results
+
+
+def _shortfall(chunk_inputs, output):
+    if output is None:
+        return chunk_inputs["number"]
+    try:
+        kept = sum(isinstance(value, dict) for value in load_quiz_dict(output).values())
+    except Exception:
+        kept = 0
+    return chunk_inputs["number"] - kept
+
+
+def _merge(results, inputs):
+    """merge_quizzes over the chunk outputs, topped up to inputs["number"] questions.
+
+    Chunks can come back short (or fail) and merging drops questions that repeat
+    across chunks; the missing ones are asked for in one repair_quiz call against the
+    chunk that came up shortest, with every kept stem listed so they are not repeated.
+    """
+    quiz = merge_quizzes(output for _, output in results if output is not None)
+    number = int(inputs["number"])
+    if len(quiz) >= number:
+        return quiz
+    chunk_inputs = max(results, key=lambda result: _shortfall(*result))[0]
+    logger.info(f"Merged quiz has {len(quiz)}/{number} questions, topping it up")
+    return load_quiz_dict(repair_quiz(quiz, {**chunk_inputs, "number": number}))
+
+
+def _allocate(chunks, number, total):
+    for chunk, start, end in chunks:
+        count = share(number, start, end, total)
+        if count > 0:
+            yield chunk, count
+
+
+def generate_chunked(inputs, max_chunk_tokens=DEFAULT_CHUNK_TOKENS, max_workers=DEFAULT_MAX_WORKERS):
+    """Map-reduce version of quiz_chain for documents too big for a single prompt.
+
+    The text is split into token-bounded chunks, each chunk is asked for its share of
+    inputs["number"] (proportional to its length), the per-chunk quiz_chain calls run
+    concurrently and the results are merged into a single quiz dict, topped up if
+    it came out short.
+    """
+    chunks = iter_chunks([inputs["text"]], max_chunk_tokens)
+    jobs = _allocate(chunks, int(inputs["number"]), 1)
+    return _merge(_run_chunks(jobs, inputs, max_workers), inputs)
+
+
+def generate_chunked_from_pages(pages, page_count, inputs, max_chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                                max_workers=DEFAULT_MAX_WORKERS):
+    """Like generate_chunked, but consumes page texts as they are extracted.
+
+    Pairs with extraction.iter_file_pages: generation of the first chunks starts while
+    later pages are still being extracted.
+    """
+    chunks = iter_chunks(pages, max_chunk_tokens)
+    jobs = _allocate(chunks, int(inputs["number"]), page_count)
+    return _merge(_run_chunks(jobs, inputs, max_workers), inputs)
+
+
+def generate_chunked_file(file, inputs, workers=None, max_chunk_tokens=DEFAULT_CHUNK_TOKENS,
+                          max_workers=DEFAULT_MAX_WORKERS):
+    """generate_chunked on an uploaded file, generating while its pages are extracted.
+
+    The extracted text goes into the TextCache, so a resubmitted file is not read
+    again (and is chunked straight from the cache). Returns (text, quiz dict).
+    """
+    cache = get_text_cache()
+    key = cache.key(file.name, read_bytes(file))
+    text = cache.get(key)
+    if text is not None:
+        return text, generate_chunked({**inputs, "text": text}, max_chunk_tokens, max_workers)
+
+    extracted = []
+
+    def pages():
+        for page in iter_file_pages(file, workers or default_workers()):
+            extracted.append(page.text)
+            yield page.text
+
+    quiz = generate_chunked_from_pages(pages(), file_page_count(file), inputs, max_chunk_tokens, max_workers)
+    text = "".join(extracted)
+    cache.set(key, text)
+    return text, quiz
@@ -0,0 +1,185 @@
+import json
+import os
+import string
+from operator import itemgetter
+
+import numpy as np
+
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.schema import Question, parse_quiz
+
+# Estimated Jaccard similarity (word bigrams of stem + options) at which two questions count as repeats
+DEFAULT_THRESHOLD = float(os.getenv("MCQGEN_DEDUP_THRESHOLD", "0.7"))
+NUM_PERM = 64
+# 16 bands of 4 rows: pairs above ~0.5 similarity become candidates, then get checked exactly
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# ASCII punctuation becomes whitespace, so splitting the bytes yields the words
+_PUNCTUATION = bytes.maketrans(string.punctuation.replace("_", "").encode(), b" " * 31)
+_ROW_TEXT = itemgetter("MCQ", "Option A", "Option B", "Option C", "Option D")
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+# stands between texts when they are tokenised together
+_SEPARATOR = "mcqgendedupseparator"
+# permutations hashed per pass
+_BLOCK = 8
+
+
+def _multipliers(count, seed):
+    rng = np.random.default_rng(seed)
+    # multiply-shift hashing needs odd multipliers
+    return rng.integers(1, 2 ** 63, size=count, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+
+def question_text(question):
+    """Stem and options of a question (a table row or a model question object) as one string."""
+    if isinstance(question, str):
+        return question
+    if "MCQ" in question and "Option D" in question:
+        return " ".join(map(str, _ROW_TEXT(question)))
+    parsed = Question.from_dict(question)
+    return " ".join(str(part) for part in (parsed.mcq, *parsed.options) if part)
+
+
+class MinHashIndex:
+    """Incremental near-duplicate index over question texts.
+
+    Texts are reduced to word-bigram shingles and given MinHash signatures, a whole
+    batch at a time in NumPy. LSH bands then pair each text with the first text that
+    shared one of its band keys, so nothing is compared against everything; a pair
+    counts as a near-duplicate when the signatures agree on at least threshold of
+    their positions (the estimated Jaccard similarity).
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, seed=0):
+        self.threshold = threshold
+        self._a = _multipliers(NUM_PERM, seed)[:, None]
+        self._band = _multipliers(ROWS, seed + 1)
+        # per band: sorted band keys and the index of the first text that had each key
+        empty = np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+        self._tables = [empty] * BANDS
+        self._signatures = np.empty((0, NUM_PERM), dtype=np.uint32)
+        self.size = 0
+
+    def _shingles(self, texts):
+        """Word-bigram hashes of every text, concatenated, and where each text's run starts."""
+        # all texts are split in one go; _SEPARATOR marks where each one ends
+        joined = f" {_SEPARATOR} ".join(["", *texts, ""]).lower().encode("utf-8", "replace")
+        words = joined.translate(_PUNCTUATION).split()
+        # words are identified by their hash; the index only lives as long as the process
+        ids = np.fromiter(map(hash, words), dtype=np.int64, count=len(words)).view(np.uint64)
+        separator = ids == np.uint64(hash(_SEPARATOR.encode()) % 2 ** 64)
+
+        # (word, next word) pairs, including (last word, separator) so every text has at
+        # least one shingle; pairs starting at a separator straddle two texts, except for
+        # (separator, separator), which is what an empty text looks like
+        keep = ~separator[:-1] | separator[1:]
+        shingles = (ids[:-1] * _GOLDEN ^ ids[1:])[keep]
+        ends = np.flatnonzero(separator[1:][keep])
+        starts = np.concatenate([[0], ends[:-1] + 1])
+        return shingles, starts
+
+    def signatures(self, texts):
+        """(len(texts), NUM_PERM) uint32 MinHash signatures."""
+        shingles, starts = self._shingles(texts)
+        signatures = np.empty((NUM_PERM, len(texts)), dtype=np.uint32)
+        hashed = np.empty((_BLOCK, len(shingles)), dtype=np.uint64)
+        # a few permutations at a time keeps the temporary array small
+        for block in range(0, NUM_PERM, _BLOCK):
+            # multiply-shift: the top 32 bits of a * x (mod 2**64), a odd
+            np.multiply(self._a[block:block + _BLOCK], shingles, out=hashed)
+            hashed >>= np.uint64(32)
+            signatures[block:block + _BLOCK] = np.minimum.reduceat(hashed, starts, axis=1)
+        return signatures.T
+
+    def _band_keys(self, signatures):
+        bands = signatures.astype(np.uint64).reshape(len(signatures), BANDS, ROWS)
+        return (bands * self._band).sum(axis=2)
+
+    def _candidates(self, keys, base):
+        """(index, earlier index) pairs that share a band key."""
+        index = np.arange(base, base + len(keys))
+        found, earlier = [], []
+        for band in range(BANDS):
+            unique, first, inverse = np.unique(keys[:, band], return_index=True, return_inverse=True)
+            first = first + base
+            known_keys, known_first = self._tables[band]
+            if len(known_keys):
+                at = np.minimum(np.searchsorted(known_keys, unique), len(known_keys) - 1)
+                seen = known_keys[at] == unique
+                owner = np.where(seen, known_first[at], first)
+                unique, first = unique[~seen], first[~seen]
+            else:
+                owner = first
+            merged_keys = np.concatenate([known_keys, unique])
+            order = np.argsort(merged_keys, kind="stable")
+            self._tables[band] = merged_keys[order], np.concatenate([known_first, first])[order]
+
+            owner = owner[inverse]
+            paired = owner != index
+            found.append(index[paired])
+            earlier.append(owner[paired])
+        found = np.concatenate(found)
+        earlier = np.concatenate(earlier)
+        pairs = np.unique(found * (base + len(keys)) + earlier)
+        return pairs // (base + len(keys)), pairs % (base + len(keys))
+
+    def add(self, texts):
+        """Index texts in order; returns, for each, the index of an earlier near-duplicate or None.
+
+        Indexes count from the first text ever added. Duplicates are indexed too.
+        """
+        if not texts:
+            return []
+        base = self.size
+        signatures = self.signatures(texts)
+        keys = self._band_keys(signatures)
+        self._signatures = np.concatenate([self._signatures, signatures])
+        self.size += len(texts)
+
+        found, earlier = self._candidates(keys, base)
+        similarity = (self._signatures[found] == self._signatures[earlier]).mean(axis=1)
+        close = similarity >= self.threshold
+        found, earlier, similarity = found[close], earlier[close], similarity[close]
+        # the most similar earlier text wins
+        order = np.lexsort((-similarity, found))
+        found, earlier = found[order], earlier[order]
+        found, best = np.unique(found, return_index=True)
+
+        matches = [None] * len(texts)
+        for i, match in zip(found.tolist(), earlier[best].tolist()):
+            matches[i - base] = match
+        return matches
+
+
+def find_duplicates(questions, threshold=DEFAULT_THRESHOLD):
+    """{index: index of the earlier question it repeats} for a list of rows or question objects."""
+    matches = MinHashIndex(threshold).add([question_text(question) for question in questions])
+    return {i: match for i, match in enumerate(matches) if match is not None}
+
+
+def dedup_quiz(quiz, threshold=DEFAULT_THRESHOLD):
+    """Remove near-duplicate entries from a quiz completion.
+
+    Returns the quiz unchanged when there are none, otherwise the remaining entries as
+    a JSON string under their original keys; repair.repair_quiz then sees the dropped
+    keys as missing and regenerates them.
+    """
+    try:
+        quiz_dict = parse_quiz(quiz)
+    except Exception:
+        # unparseable quizzes are left to repair
+        return quiz
+    keys = [key for key, value in quiz_dict.items() if isinstance(value, dict)]
+    duplicates = find_duplicates([quiz_dict[key] for key in keys], threshold)
+    if not duplicates:
+        return quiz
+    for i, match in duplicates.items():
+        logger.info(f"Question {keys[i]} repeats question {keys[match]}; dropping it")
+    dropped = {keys[i] for i in duplicates}
+    return json.dumps({key: value for key, value in quiz_dict.items() if key not in dropped}, indent=4)
+
+
+def dedup_step(inputs):
+    """generate_evaluate_chain step: drop repeated questions so repair can replace them."""
+    return dedup_quiz(inputs["quiz"])
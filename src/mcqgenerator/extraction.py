@@ -0,0 +1,113 @@
+import io
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+
+from src.mcqgenerator.logger import logger
+
+# Below this many pages the process pool costs more to start than it saves
+PARALLEL_MIN_PAGES = 32
+PAGES_PER_TASK = 8
+
+PageText = namedtuple("PageText", ["number", "text", "seconds"])
+
+_worker_reader = None
+
+
+def _init_worker(data):
+    # every worker parses the PDF once and then serves page ranges from it
+    global _worker_reader
+    _worker_reader = PyPDF2.PdfReader(io.BytesIO(data))
+
+
+def _extract_pages(reader, start, stop):
+    pages = []
+    for number in range(start, stop):
+        started = time.perf_counter()
+        text = reader.pages[number].extract_text() or ""
+        pages.append(PageText(number + 1, text, time.perf_counter() - started))
+    return pages
+
+
+def _extract_range(start, stop):
+    return _extract_pages(_worker_reader, start, stop)
+
+
+def read_bytes(file):
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return file.read()
+
+
+def pdf_page_count(file):
+    return len(PyPDF2.PdfReader(io.BytesIO(read_bytes(file))).pages)
+
+
+def iter_pdf_pages(file, workers=None):
+    """Yield PageText tuples in page order as soon as each page is extracted.
+
+    With workers > 1 and a large enough PDF, page ranges are extracted in a process
+    pool; pages are still yielded in order, so the caller can start on page 1 while
+    later pages are being extracted.
+    """
+    data = read_bytes(file)
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    total = len(reader.pages)
+    workers = workers or 1
+    started = time.perf_counter()
+    timings = []
+
+    if workers <= 1 or total < PARALLEL_MIN_PAGES:
+        for number in range(total):
+            page = _extract_pages(reader, number, number + 1)[0]
+            timings.append(page.seconds)
+            yield page
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) as pool:
+            futures = [
+                pool.submit(_extract_range, start, min(start + PAGES_PER_TASK, total))
+                for start in range(0, total, PAGES_PER_TASK)
+            ]
+            for future in futures:
+                for page in future.result():
+                    timings.append(page.seconds)
+                    yield page
+
+    if timings:
+        logger.info(
+            f"Extracted {total} pages in {time.perf_counter() - started:.2f}s "
+            f"(workers={workers}, mean {sum(timings) / len(timings) * 1000:.1f}ms/page, "
+            f"slowest {max(timings) * 1000:.1f}ms)"
+        )
+
+
+def iter_file_pages(file, workers=None):
+    """Yield the pages of an uploaded PDF or TXT file (a TXT file is a single page)."""
+    # extensions in any case: "Handout.PDF" is a PDF too
+    name = file.name.lower()
+    if name.endswith(".pdf"):
+        try:
+            yield from iter_pdf_pages(file, workers)
+        except Exception as e:
+            raise Exception(f"Error reading PDF file: {e}")
+
+    elif name.endswith(".txt"):
+        started = time.perf_counter()
+        text = read_bytes(file).decode("utf-8")
+        yield PageText(1, text, time.perf_counter() - started)
+
+    else:
+        raise Exception("unsupported file format, only pdf and txt file are supported")
+
+
+def file_page_count(file):
+    if file.name.lower().endswith(".pdf"):
+        return pdf_page_count(file)
+    return 1
+
+
+def default_workers():
+    return min(4, os.cpu_count() or 1)
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import os
+import random
+import re
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.mcqgenerator.utils import CHARS_PER_TOKEN, estimate_tokens
+
+_NUMBER = re.compile(r"quiz of (\d+) multiple choice questions")
+_SENTENCE = re.compile(r"[^.!?]{20,}[.!?]")
+_QUESTION = re.compile(r'"mcq"')
+_QUESTION_ID = re.compile(r'"([0-9a-f]{16})":\{"mcq"')
+# characters per streamed chunk, roughly one token
+_CHUNK_CHARS = 4
+
+
+class FakeLLMError(Exception):
+    """Raised by FakeQuizModel to simulate a failed API call."""
+
+    status_code = 500
+
+
+class FakeQuizModel(BaseChatModel):
+    """Local stand-in for ChatGroq that answers the quiz and review prompts.
+
+    Quiz prompts get a valid quiz in the response.json shape with as many questions
+    as the prompt asks for, built from sentences of the text; question scoring prompts
+    get scores for every question ID; anything else gets a review with a paragraph
+    per question of the quiz it was shown. Timing follows latency (time to first
+    token) plus output tokens at tokens_per_second; slow_rate of the calls take
+    slow_latency instead, for a latency tail. error_rate and malformed_rate inject
+    failures; max_tokens cuts completions off like a real model's cap.
+    """
+
+    latency: float = 0.2
+    tokens_per_second: float = 500.0
+    error_rate: float = 0.0
+    malformed_rate: float = 0.0
+    slow_rate: float = 0.0
+    slow_latency: float = 2.0
+    seed: int | None = None
+    max_tokens: int | None = None
+    model_name: str = "fake-quiz"
+
+    def model_post_init(self, __context):
+        self._random = random.Random(self.seed)
+
+    @classmethod
+    def from_env(cls, **overrides):
+        """Configure from MCQGEN_FAKE_* environment variables; keyword arguments win."""
+        seed = os.getenv("MCQGEN_FAKE_SEED")
+        settings = {
+            "latency": float(os.getenv("MCQGEN_FAKE_LATENCY", "0.2")),
+            "tokens_per_second": float(os.getenv("MCQGEN_FAKE_TPS", "500")),
+            "error_rate": float(os.getenv("MCQGEN_FAKE_ERROR_RATE", "0")),
+            "malformed_rate": float(os.getenv("MCQGEN_FAKE_MALFORMED_RATE", "0")),
+            "slow_rate": float(os.getenv("MCQGEN_FAKE_SLOW_RATE", "0")),
+            "slow_latency": float(os.getenv("MCQGEN_FAKE_SLOW_LATENCY", "2")),
+            "seed": int(seed) if seed else None,
+            "max_tokens": int(os.getenv("MCQGEN_FAKE_MAX_TOKENS", "0")) or None,
+        }
+        return cls(**{**settings, **overrides})
+
+    @property
+    def _llm_type(self):
+        return "fake-quiz"
+
+    @property
+    def _identifying_params(self):
+        return {"model": self.model_name, "latency": self.latency, "tokens_per_second": self.tokens_per_second}
+
+    def _respond(self, messages, response_format=None):
+        prompt = "\n".join(str(m.content) for m in messages)
+        if self._random.random() < self.error_rate:
+            raise FakeLLMError("simulated API failure")
+
+        match = _NUMBER.search(prompt)
+        if match:
+            text = _quiz(int(match.group(1)), prompt, self._random)
+            # schema-constrained output (response_format) always arrives complete
+            if response_format is None and self._random.random() < self.malformed_rate:
+                # cut the completion short, as a truncated generation would be
+                text = text[: self._random.randint(1, max(1, len(text) - 1))]
+        elif prompt.startswith("You are an expert english grammarian") and _QUESTION_ID.search(prompt):
+            text = _scores(_QUESTION_ID.findall(prompt), self._random)
+        else:
+            text = _review(len(_QUESTION.findall(prompt)))
+        if self.max_tokens:
+            text = text[: self.max_tokens * CHARS_PER_TOKEN]
+        return text, estimate_tokens(prompt)
+
+    def _latency(self):
+        return self.slow_latency if self._random.random() < self.slow_rate else self.latency
+
+    def _message(self, text, input_tokens, cls=AIMessage, output_tokens=None):
+        if output_tokens is None:
+            output_tokens = estimate_tokens(text)
+        return cls(
+            content=text,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+            response_metadata={"model_name": self.model_name},
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text, input_tokens = self._respond(messages, kwargs.get("response_format"))
+        time.sleep(self._latency() + estimate_tokens(text) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=self._message(text, input_tokens))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        text, input_tokens = self._respond(messages, kwargs.get("response_format"))
+        await asyncio.sleep(self._latency() + estimate_tokens(text) / self.tokens_per_second)
+        return ChatResult(generations=[ChatGeneration(message=self._message(text, input_tokens))])
+
+    def _chunks(self, text, input_tokens):
+        pieces = [text[i:i + _CHUNK_CHARS] for i in range(0, len(text), _CHUNK_CHARS)]
+        for i, piece in enumerate(pieces):
+            if i == len(pieces) - 1:
+                # like Groq, usage for the whole completion arrives with the last chunk
+                yield self._message(piece, input_tokens, AIMessageChunk, estimate_tokens(text))
+            else:
+                yield AIMessageChunk(content=piece)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        text, input_tokens = self._respond(messages, kwargs.get("response_format"))
+        time.sleep(self._latency())
+        for message in self._chunks(text, input_tokens):
+            time.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=message)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        text, input_tokens = self._respond(messages, kwargs.get("response_format"))
+        await asyncio.sleep(self._latency())
+        for message in self._chunks(text, input_tokens):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=message)
+
+
+def _scores(ids, rng):
+    return json.dumps({
+        question_id: {
+            "grammar": rng.randint(3, 5),
+            "bloom": rng.choice(["remember", "understand", "apply"]),
+            "distractors": rng.randint(2, 4),
+            "comment": "Clear stem; the distractors could be closer to the correct answer.",
+        }
+        for question_id in ids
+    }, indent=4)
+
+
+def _review(number):
+    paragraphs = [
+        f"Question {i}: the stem is clear and grammatical, and the four options are parallel in form. "
+        f"It tests recall of a single statement from the text; recasting it as a short scenario would "
+        f"test application instead. The distractors are easy to rule out and could be made more plausible."
+        for i in range(1, number + 1)
+    ]
+    paragraphs.append("Overall the quiz is well formed; most questions target recall, so add application items.")
+    return "\n\n".join(paragraphs)
+
+
+def _quiz(number, prompt, rng):
+    sentences = _SENTENCE.findall(prompt.split("Text:", 1)[-1]) or ["This is a placeholder statement."]
+    quiz = {}
+    for i in range(number):
+        sentence = sentences[i % len(sentences)].strip()
+        correct = rng.choice("abcd")
+        quiz[str(i + 1)] = {
+            "mcq": f"Which statement about question {i + 1} is supported by the text?",
+            "options": {
+                letter: sentence if letter == correct else f"Distractor {letter} for question {i + 1}"
+                for letter in "abcd"
+            },
+            "correct": correct,
+            "hint": "Re-read the relevant passage.",
+            "explanation": f"The text states: {sentence}",
+        }
+    return json.dumps(quiz, indent=4)
@@ -0,0 +1,172 @@
+import io
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from src.mcqgenerator.logger import logger
+
+STAGES = ("extract", "generate", "parse", "review")
+DEFAULT_WORKERS = int(os.getenv("MCQGEN_JOB_WORKERS", "4"))
+# finished jobs are forgotten after this many seconds
+JOB_TTL = 3600
+
+
+class Job:
+    """State of one background generation, written by its worker and read by the UI.
+
+    stage is the stage running now; timings holds the seconds taken by each finished
+    stage. rows (the parsed quiz) is set before the review starts, so the quiz can be
+    shown while the review is still running. number is the number of questions asked for.
+    """
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.number = None
+        self.status = "queued"
+        self.stage = None
+        self.timings = {}
+        self.questions = []
+        self.result = None
+        self.rows = None
+        self.summary = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._stage_started = None
+
+    def enter(self, stage):
+        now = time.perf_counter()
+        if self.stage is not None:
+            self.timings[self.stage] = now - self._stage_started
+        self.stage = stage
+        self._stage_started = now
+
+    def add_question(self, key, question):
+        # streaming callback; list.append is atomic, so no lock is needed for the UI to read
+        self.questions.append((key, question))
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    @property
+    def progress(self):
+        """Fraction of STAGES finished."""
+        if self.status == "done":
+            return 1.0
+        return len(self.timings) / len(STAGES)
+
+
+class JobManager:
+    """Runs generation jobs on a shared thread pool so no Streamlit script thread waits on them.
+
+    Jobs outlive the session that submitted them: anyone holding the job ID can poll it
+    until JOB_TTL after it finished.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mcqgen-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(job, *args, **kwargs); returns the job ID. fn's return value becomes job.result."""
+        job = Job(uuid.uuid4().hex)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        started = time.perf_counter()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.enter(None)
+            job.status = "done"
+            logger.info(f"Job {job.id[:8]} done in {time.perf_counter() - started:.2f}s "
+                        + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in job.timings.items()))
+        except Exception as e:
+            logger.error(f"Job {job.id[:8]} failed in stage {job.stage}: {traceback.format_exc()}")
+            job.error = str(e)
+            job.status = "failed"
+        job.finished = time.time()
+
+    def _prune(self):
+        now = time.time()
+        for job_id in [i for i, job in self._jobs.items() if job.finished and now - job.finished > JOB_TTL]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+
+def uploaded_copy(uploaded_file):
+    """In-memory copy of an uploaded file that stays readable after the script run that got it."""
+    copy = io.BytesIO(uploaded_file.getvalue())
+    copy.name = uploaded_file.name
+    return copy
+
+
+def generate_job(job, file, inputs, chunked=False, condense=False, review_mode=None, review_kind=None):
+    """The Streamlit generation pipeline, one STAGES entry at a time; returns the result dict.
+
+    file is an uploaded file to extract; pass None when inputs already has the "text".
+    Unless review_mode (review.REVIEW_MODES) is "eager", the job finishes without the
+    review stage and the result's review_key fetches the review from get_review_store().
+    review_kind (review.REVIEW_KINDS) picks an essay or per-question scores.
+    """
+    # imported here: the worker needs them, the module that defines Job does not
+    from src.mcqgenerator.chunking import generate_chunked, generate_chunked_file
+    from src.mcqgenerator.extraction import default_workers
+    from src.mcqgenerator.mcqgen import get_question_bank
+    from src.mcqgenerator.review import DEFAULT_REVIEW_MODE, review_result
+    from src.mcqgenerator.streaming import stream_generate_evaluate
+    from src.mcqgenerator.summarise import summarise
+    from src.mcqgenerator.utils import get_table_data, read_file_cached
+
+    job.number = int(inputs["number"])
+    job.enter("extract")
+    # chunked generation reads the pages as they are extracted; condensing needs the whole text first
+    streamed = chunked and file is not None and not condense
+    if not streamed:
+        text = inputs["text"] if file is None else read_file_cached(file, workers=default_workers())
+        inputs = {**inputs, "text": text}
+        if condense:
+            job.summary = summarise(text)
+            # the condensed text is already within its budget: retrieval would cut it again
+            inputs = {**inputs, "text": job.summary.text, "retrieve": False}
+
+    job.enter("generate")
+    if streamed:
+        # extraction overlaps generation, so its time is counted here
+        text, quiz = generate_chunked_file(file, inputs, default_workers())
+        inputs = {**inputs, "text": text}
+        quiz = json.dumps(quiz, indent=4)
+    elif chunked:
+        quiz = json.dumps(generate_chunked(inputs), indent=4)
+    else:
+        # questions already in the bank for this document are served first
+        quiz = stream_generate_evaluate(inputs, on_question=job.add_question, bank=get_question_bank(),
+                                        review=False)["quiz"]
+
+    job.enter("parse")
+    job.rows = get_table_data(quiz)
+
+    review_mode = review_mode or DEFAULT_REVIEW_MODE
+    if review_mode == "eager":
+        job.enter("review")
+    return {**inputs, "quiz": quiz, **review_result(inputs, quiz, review_mode, review_kind)}
@@ -5,14 +5,25 @@ from datetime import datetime
 LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 
 log_path= os.path.join(os.getcwd(), "logs")
-os.makedirs(log_path, exist_ok=True)
 
 LOG_FILEPATH = os.path.join(log_path, LOG_FILE)
 
+
+class LazyFileHandler(logging.FileHandler):
+    """FileHandler that creates logs/ and the log file on the first record, not at import."""
+
+    def __init__(self, filename):
+        super().__init__(filename, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
 logging.basicConfig(
     level=logging.INFO,
-    filename=LOG_FILEPATH,
-    format="[%(asctime)s] %(lineno)d %(name)s -%(levelname)s -%(message)s"
+    format="[%(asctime)s] %(lineno)d %(name)s -%(levelname)s -%(message)s",
+    handlers=[LazyFileHandler(LOG_FILEPATH)]
 )
 
-logger = logging.getLogger("mcqgen")
\ No newline at end of file
+logger = logging.getLogger("mcqgen")
@@ -1,69 +1,375 @@
 import os
-import json
-import pandas as pd
-import traceback
-from dotenv import load_dotenv
+import threading
+from collections import namedtuple
+from functools import lru_cache, wraps
 
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
-from langchain_core.globals import set_debug
-from langchain_core.runnables import RunnablePassthrough
+# Nothing in this module talks to the network or the disk at import time: the LLM
+# client, prompts and chains (and LangChain itself) are loaded on first use by the
+# memoised get_* factories. The old module-level names (quiz_chain, llm, ...) still
+# work through __getattr__.
 
+Chains = namedtuple("Chains", [
+    "quiz_generation_prompt",
+    "review_prompt",
+    "quiz_chain",
+    "review_chain",
+    "generate_evaluate_chain",
+    "repair_prompt",
+    "repair_chain",
+    "generate_chain",
+    "question_review_prompt",
+    "question_review_chain",
+])
 
-load_dotenv()
-set_debug(True)
 
-llm = ChatGroq(model="openai/gpt-oss-120b",
-api_key=os.getenv("GROQ_API_KEY"),
-temperature=0.5)
+# Prompts are kept free of indentation and padding: every character is billed on every
+# call. The inputs are compiled (prompts.compile_*_inputs) before rendering.
 
 #PROMPT 1
-quiz_generation_prompt = ChatPromptTemplate.from_messages([
-    (
-        "system", 
-        """You are an expert MCQ maker. 
-        It is your job to create a quiz of {number} multiple choice questions for {subject} students in {tone} tone. 
-        
-        Make sure the questions are not repeated and check all the questions to be conforming the text as well.
-        Make sure to format your response like the RESPONSE_JSON below and use it as a guide. 
-        Ensure to make {number} MCQs.
-        
-        For each question you MUST also include:
-        - "hint": A helpful clue that nudges the student toward the correct answer without giving it away directly.
-        - "explanation": A clear explanation of why the correct answer is right and why the other options are wrong.
-        
-        ### RESPONSE_JSON
-        {response_json}"""
-    ),
-    (
-        "human", 
-        "Text: {text}"
+QUIZ_SYSTEM_TEMPLATE = """You are an expert MCQ maker.
+It is your job to create a quiz of {number} multiple choice questions for {subject} students in {tone} tone.
+Make sure the questions are not repeated and check all the questions to be conforming the text as well.
+Ensure to make {number} MCQs.
+For each question you MUST also include:
+- "hint": A helpful clue that nudges the student toward the correct answer without giving it away directly.
+- "explanation": A clear explanation of why the correct answer is right and why the other options are wrong.
+Respond with a JSON object keyed "1" to "{number}", each value shaped like this RESPONSE_JSON entry:
+{response_json}"""
+
+QUIZ_HUMAN_TEMPLATE = "Text: {text}"
+
+# --- REPAIR: replacements for the questions that came back missing or invalid ---
+REPAIR_SYSTEM_TEMPLATE = """You are an expert MCQ maker.
+Some questions of a {subject} quiz came back missing or invalid:
+{problems}
+Write a quiz of {count} multiple choice questions for {subject} students in {tone} tone to replace them.
+Each question needs exactly four options a-d, the letter of the correct option, a "hint" and an "explanation".
+Do not repeat these existing questions:
+{existing}
+Respond with a JSON object keyed "1" to "{count}", each value shaped like this RESPONSE_JSON entry:
+{response_json}"""
+
+# --- PROMPT 2: EVALUATION ---
+REVIEW_TEMPLATE = """You are an expert english grammarian and writer.
+Given a Multiple Choice Quiz for {subject} students.
+You need to evaluate the complexity of the question and give a complete analysis of the quiz.
+Quiz_MCQs:
+{quiz}
+Check from an expert English Writer of the above quiz:"""
+
+# --- PROMPT 3: PER-QUESTION SCORES (a batch of questions keyed by content hash, see review.py) ---
+QUESTION_REVIEW_TEMPLATE = """You are an expert english grammarian and writer.
+Score each of these multiple choice questions for {subject} students, keyed by ID:
+{questions}
+For every ID give "grammar" (1-5: how clear and correct the wording is),
+"bloom" (the Bloom's taxonomy level it tests: remember, understand, apply, analyze, evaluate or create),
+"distractors" (1-5: how plausible the wrong options are) and a one-sentence "comment".
+Respond with a JSON object keyed by the same IDs."""
+
+
+_build_lock = threading.RLock()
+
+
+def _memoised(fn):
+    """lru_cache, but concurrent first calls build the object only once."""
+    cached = lru_cache(maxsize=None)(fn)
+
+    @wraps(fn)
+    def wrapper(*args):
+        with _build_lock:
+            return cached(*args)
+
+    wrapper.cache_clear = cached.cache_clear
+    wrapper.cache_info = cached.cache_info
+    return wrapper
+
+
+def set_tracing(enabled=True):
+    """Turn LangChain's full debug traces on or off (MCQGEN_DEBUG=1 turns them on at startup)."""
+    from langchain_core.globals import set_debug
+    set_debug(enabled)
+
+
+@_memoised
+def get_backend_llm():
+    """The raw chat model: ChatGroq, or the local fake with MCQGEN_LLM_BACKEND=fake.
+
+    MCQGEN_LLM_BACKEND takes any backends.make_backend spec, e.g. groq:llama-3.3-70b-versatile.
+    """
+    from dotenv import load_dotenv
+    from src.mcqgenerator.backends import make_backend
+    load_dotenv()
+    set_tracing(os.getenv("MCQGEN_DEBUG") == "1")
+
+    # MCQGEN_LLM_BACKEND=fake swaps Groq for a local stand-in (offline runs and benchmarks)
+    return make_backend(os.getenv("MCQGEN_LLM_BACKEND", "groq"))
+
+
+@_memoised
+def get_hedge_backend_llm():
+    """The raw secondary model that slow calls are hedged to (MCQGEN_HEDGE_BACKEND), or None."""
+    from dotenv import load_dotenv
+    from src.mcqgenerator.backends import make_backend
+    load_dotenv()
+    spec = os.getenv("MCQGEN_HEDGE_BACKEND")
+    return make_backend(spec) if spec else None
+
+
+@_memoised
+def get_scheduler():
+    from src.mcqgenerator.scheduler import RateLimitScheduler
+    # Every call goes through one process-wide RPM/TPM scheduler
+    return RateLimitScheduler()
+
+
+@_memoised
+def get_hedge_scheduler():
+    from src.mcqgenerator.scheduler import RateLimitScheduler
+    # the secondary model has rate limits of its own
+    return RateLimitScheduler()
+
+
+@_memoised
+def get_latency_stats():
+    from src.mcqgenerator.backends import DEFAULT_HEDGE_AFTER, LatencyStats, parse_deadlines
+    # per-stage primary latencies (hedging deadlines) and how often hedging won
+    return LatencyStats(parse_deadlines(os.getenv("MCQGEN_HEDGE_DEADLINES")),
+                        float(os.getenv("MCQGEN_HEDGE_AFTER", DEFAULT_HEDGE_AFTER)))
+
+
+def _scheduled(backend, secondary=None, scheduler=None):
+    from src.mcqgenerator.scheduler import ScheduledChatModel
+    llm = ScheduledChatModel(backend, scheduler or get_scheduler())
+    if secondary is None:
+        return llm
+    from src.mcqgenerator.backends import HedgedChatModel
+    return HedgedChatModel(llm, ScheduledChatModel(secondary, get_hedge_scheduler()), get_latency_stats())
+
+
+def _structured(llm, fmt):
+    return llm.bind(response_format=fmt) if llm is not None else None
+
+
+@_memoised
+def get_llm():
+    return _scheduled(get_backend_llm(), get_hedge_backend_llm())
+
+
+@_memoised
+def get_quiz_llm():
+    """get_llm() constrained to the quiz JSON schema (MCQGEN_STRUCTURED_OUTPUT=off disables it)."""
+    from src.mcqgenerator.schema import response_format
+
+    fmt = response_format()
+    if fmt is None:
+        return get_llm()
+    return _scheduled(_structured(get_backend_llm(), fmt), _structured(get_hedge_backend_llm(), fmt))
+
+
+def _default_spec():
+    return os.getenv("MCQGEN_LLM_BACKEND", "groq")
+
+
+def _stage_spec(stage):
+    """The backends.make_backend spec a stage ("generate", "review" or "repair") runs on.
+
+    MCQGEN_<STAGE>_BACKEND (e.g. MCQGEN_REVIEW_BACKEND=groq:llama-3.1-8b-instant) routes the
+    stage to its own model; without it the stage uses MCQGEN_LLM_BACKEND's.
+    """
+    return os.getenv(f"MCQGEN_{stage.upper()}_BACKEND") or _default_spec()
+
+
+@_memoised
+def get_spec_backend_llm(spec):
+    """The raw chat model for a backend spec: one client per spec, however many stages use it."""
+    if spec == _default_spec():
+        return get_backend_llm()
+    from src.mcqgenerator.backends import make_backend
+    return make_backend(spec)
+
+
+@_memoised
+def get_spec_scheduler(spec):
+    from src.mcqgenerator.scheduler import RateLimitScheduler
+    if spec == _default_spec():
+        return get_scheduler()
+    # providers rate-limit each model separately, so stages sharing one share its limits
+    return RateLimitScheduler()
+
+
+@_memoised
+def get_spec_llm(spec, structured=False):
+    """get_llm() / get_quiz_llm() (structured=True), or their equivalents on another backend spec."""
+    if spec == _default_spec():
+        return get_quiz_llm() if structured else get_llm()
+    from src.mcqgenerator.schema import response_format
+
+    backend = get_spec_backend_llm(spec)
+    fmt = response_format() if structured else None
+    if fmt is None:
+        return _scheduled(backend, get_hedge_backend_llm(), get_spec_scheduler(spec))
+    return _scheduled(_structured(backend, fmt), _structured(get_hedge_backend_llm(), fmt),
+                      get_spec_scheduler(spec))
+
+
+def get_stage_backend_llm(stage):
+    """The raw chat model a stage runs on (see _stage_spec)."""
+    return get_spec_backend_llm(_stage_spec(stage))
+
+
+def get_stage_scheduler(stage):
+    return get_spec_scheduler(_stage_spec(stage))
+
+
+def get_stage_llm(stage, structured=False):
+    return get_spec_llm(_stage_spec(stage), structured)
+
+
+@_memoised
+def get_response_cache():
+    from src.mcqgenerator.cache import ResponseCache
+    # Shared on-disk cache of completions, keyed by rendered prompt + model settings
+    return ResponseCache()
+
+
+@_memoised
+def get_score_cache():
+    from src.mcqgenerator.cache import DEFAULT_SCORE_DIR, ResponseCache
+    # Per-question review scores; their lookups do not count towards the response cache's stats
+    return ResponseCache(os.getenv("MCQGEN_SCORE_CACHE_DIR", DEFAULT_SCORE_DIR))
+
+
+@_memoised
+def get_text_cache():
+    from src.mcqgenerator.cache import TextCache
+    # Extracted upload text, so resubmitting the same file skips PDF parsing
+    return TextCache()
+
+
+@_memoised
+def get_question_bank():
+    from src.mcqgenerator.bank import QuestionBank
+    # Generated questions kept across sessions, served before generating new ones
+    return QuestionBank()
+
+
+@_memoised
+def get_job_manager():
+    from src.mcqgenerator.jobs import JobManager
+    # Background generation jobs shared by every Streamlit session
+    return JobManager()
+
+
+@_memoised
+def get_review_store():
+    from src.mcqgenerator.review import ReviewStore
+    # Reviews written after the quiz is returned, or only when someone asks for them
+    return ReviewStore()
+
+
+@_memoised
+def get_single_flight():
+    from src.mcqgenerator.singleflight import SingleFlight
+    # Identical requests that arrive together (a class uploading one handout) share one model call
+    return SingleFlight()
+
+
+@_memoised
+def get_token_accountant():
+    from src.mcqgenerator.prompts import TokenAccountant
+    # Per-stage input/output token totals, also logged after every call
+    return TokenAccountant()
+
+
+@_memoised
+def get_chains():
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+    from src.mcqgenerator.cache import CachedChain
+    from src.mcqgenerator.prompts import compile_quiz_inputs, compile_review_inputs
+    from src.mcqgenerator.dedup import dedup_step
+    from src.mcqgenerator.repair import repair_step
+    from src.mcqgenerator.schema import parse_quiz
+
+    response_cache = get_response_cache()
+    accountant = get_token_accountant()
+    flights = get_single_flight()
+
+    #PROMPT 1: compact schema + normalised text, then render
+    quiz_generation_prompt = RunnableLambda(compile_quiz_inputs) | ChatPromptTemplate.from_messages([
+        ("system", QUIZ_SYSTEM_TEMPLATE),
+        ("human", QUIZ_HUMAN_TEMPLATE)
+    ])
+
+    # Non-streaming quiz calls get schema-enforced JSON; streams use the plain model.
+    # Each stage can run on its own model (MCQGEN_GENERATE/REVIEW/REPAIR_BACKEND)
+    quiz_chain = CachedChain(quiz_generation_prompt, get_stage_llm("generate", True), response_cache,
+                             name="quiz_chain", accountant=accountant, stream_llm=get_stage_llm("generate"),
+                             flights=flights, validate=parse_quiz)
+
+    # --- PROMPT 2: EVALUATION (the quiz is re-sent as compact JSON) ---
+    review_prompt = RunnableLambda(compile_review_inputs) | ChatPromptTemplate.from_template(REVIEW_TEMPLATE)
+
+    # Input: {subject, quiz} -> Output: String (The Review)
+    review_chain = CachedChain(review_prompt, get_stage_llm("review"), response_cache, name="review_chain",
+                               accountant=accountant, flights=flights)
+
+    # Small follow-up call for just the questions that failed validation (see repair.py)
+    repair_prompt = RunnableLambda(compile_quiz_inputs) | ChatPromptTemplate.from_messages([
+        ("system", REPAIR_SYSTEM_TEMPLATE),
+        ("human", QUIZ_HUMAN_TEMPLATE)
+    ])
+    repair_chain = CachedChain(repair_prompt, get_stage_llm("repair", True), response_cache, name="repair_chain",
+                               accountant=accountant, stream_llm=get_stage_llm("repair"), flights=flights,
+                               validate=parse_quiz)
+
+    # One call per batch of questions; review.review_questions fans the batches out
+    question_review_prompt = ChatPromptTemplate.from_template(QUESTION_REVIEW_TEMPLATE)
+    question_review_chain = CachedChain(question_review_prompt, get_stage_llm("review"), response_cache,
+                                        name="question_review_chain", accountant=accountant, flights=flights,
+                                        validate=parse_quiz)
+
+    # The quiz on its own, for callers that review later (review.review_result)
+    generate_chain = (
+        # Step 1: Pass inputs through, but ALSO run quiz_chain and store result in 'quiz'
+        RunnablePassthrough.assign(quiz=quiz_chain)
+
+        # Step 2: Drop near-duplicate questions...
+        | RunnablePassthrough.assign(quiz=RunnableLambda(dedup_step))
+
+        # Step 3: ...and re-request them along with any that are missing or invalid
+        | RunnablePassthrough.assign(quiz=RunnableLambda(repair_step))
     )
-])
 
-quiz_chain = quiz_generation_prompt | llm | StrOutputParser()
-
-# --- PROMPT 2: EVALUATION (Your new template) ---
-review_prompt = ChatPromptTemplate.from_template(
-    """You are an expert english grammarian and writer. 
-    Given a Multiple Choice Quiz for {subject} students.
-    You need to evaluate the complexity of the question and give a complete analysis of the quiz.
-    
-    Quiz_MCQs:
-    {quiz}
-    
-    Check from an expert English Writer of the above quiz:"""
-)
-
-# Input: {subject, quiz} -> Output: String (The Review) 
-review_chain = review_prompt | llm | StrOutputParser()
-
-#Combine the two chains
-generate_evaluate_chain = (
-    # Step 1: Pass inputs through, but ALSO run quiz_chain and store result in 'quiz'
-    RunnablePassthrough.assign(quiz=quiz_chain)
-    
-    # Step 2: Now that 'quiz' is in the state, run review_chain and store in 'review'
-    | RunnablePassthrough.assign(review=review_chain)
-)
\ No newline at end of file
+    #Combine the two chains
+    # Step 4: Now that 'quiz' is in the state, run review_chain and store in 'review'
+    generate_evaluate_chain = generate_chain | RunnablePassthrough.assign(review=review_chain)
+
+    return Chains(quiz_generation_prompt, review_prompt, quiz_chain, review_chain, generate_evaluate_chain,
+                  repair_prompt, repair_chain, generate_chain, question_review_prompt, question_review_chain)
+
+
+_LAZY = {
+    "groq_llm": get_backend_llm,
+    "llm": get_llm,
+    "quiz_llm": get_quiz_llm,
+    "scheduler": get_scheduler,
+    "latency_stats": get_latency_stats,
+    "response_cache": get_response_cache,
+    "score_cache": get_score_cache,
+    "question_bank": get_question_bank,
+    "text_cache": get_text_cache,
+    "job_manager": get_job_manager,
+    "review_store": get_review_store,
+    "token_accountant": get_token_accountant,
+    "single_flight": get_single_flight,
+}
+
+
+def __getattr__(name):
+    # keeps `from src.mcqgenerator.mcqgen import generate_evaluate_chain` working
+    if name in _LAZY:
+        return _LAZY[name]()
+    if name in Chains._fields:
+        return getattr(get_chains(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,158 @@
+import json
+import re
+import threading
+from functools import lru_cache
+
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.utils import estimate_tokens, load_quiz_dict
+
+_SPACES = re.compile(r"[ \t\f\v\xa0]+")
+_LINE_EDGES = re.compile(r" *\n *")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def normalise_whitespace(text):
+    """Collapse runs of spaces, trim every line and keep at most one blank line in a row.
+
+    PDF extraction leaves a lot of padding that costs tokens and carries no meaning.
+    """
+    if not isinstance(text, str):
+        return text
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = _SPACES.sub(" ", text)
+    text = _LINE_EDGES.sub("\n", text)
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def compact_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+@lru_cache(maxsize=32)
+def _compact_schema(response_json):
+    try:
+        example = json.loads(response_json)
+    except ValueError:
+        return normalise_whitespace(response_json)
+    if not isinstance(example, dict) or not example:
+        return compact_json(example)
+    # the example repeats the same question object; one copy is enough to show the shape
+    first = next(iter(example.values()))
+    return compact_json({"1": first})
+
+
+def compact_schema(response_json):
+    """The response.json example reduced to a single question object, without indentation."""
+    if not isinstance(response_json, str):
+        response_json = json.dumps(response_json, sort_keys=False)
+    return _compact_schema(response_json)
+
+
+def compact_quiz(quiz):
+    """Re-serialise a quiz completion as compact JSON (or just squeeze its whitespace)."""
+    try:
+        return compact_json(load_quiz_dict(quiz))
+    except Exception:
+        return normalise_whitespace(quiz)
+
+
+def compile_quiz_inputs(inputs):
+    """Inputs for the quiz prompt: minimal schema and whitespace-normalised text.
+
+    Long texts are cut down to their best passages for the quiz (retrieval.select_passages)
+    unless inputs["retrieve"] is False, as it is for text that is already cut to size.
+    """
+    from src.mcqgenerator.retrieval import select_passages
+
+    compiled = dict(inputs)
+    compiled["response_json"] = compact_schema(inputs["response_json"])
+    compiled["text"] = normalise_whitespace(inputs["text"])
+    if inputs.get("retrieve", True):
+        compiled["text"] = select_passages(compiled["text"], inputs)
+    return compiled
+
+
+def compile_review_inputs(inputs):
+    """Inputs for the review prompt: the quiz as compact JSON."""
+    compiled = dict(inputs)
+    compiled["quiz"] = compact_quiz(inputs["quiz"])
+    return compiled
+
+
+def usage_tokens(message):
+    """(input_tokens, output_tokens) reported by the provider, or (None, None)."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("input_tokens"), usage.get("output_tokens")
+
+
+def _model_name(message):
+    # ChatGroq and the fake model both report the model that answered
+    return (getattr(message, "response_metadata", None) or {}).get("model_name")
+
+
+class TokenAccountant:
+    """Per-stage token and latency totals (quiz_chain, review_chain, ...).
+
+    Each call is counted twice: the estimated input size of the rendered prompt
+    before the call, and the input/output tokens the provider billed after it (falling
+    back to estimates when the model reports no usage), along with how long the call
+    took and which model answered. Cache hits are counted but cost nothing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def _stage(self, stage):
+        return self._stages.setdefault(stage, {
+            "calls": 0,
+            "cache_hits": 0,
+            "estimated_input_tokens": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "seconds": 0.0,
+            "model": None,
+        })
+
+    def before(self, stage, prompt_text):
+        """Count a rendered prompt about to be sent; returns its estimated size."""
+        estimate = estimate_tokens(prompt_text)
+        with self._lock:
+            totals = self._stage(stage)
+            totals["calls"] += 1
+            totals["estimated_input_tokens"] += estimate
+        return estimate
+
+    def after(self, stage, estimate, output_text, message=None, seconds=0.0, model=None):
+        input_tokens, output_tokens = usage_tokens(message)
+        if input_tokens is None:
+            input_tokens = estimate
+        if output_tokens is None:
+            output_tokens = estimate_tokens(output_text)
+        with self._lock:
+            totals = self._stage(stage)
+            totals["input_tokens"] += input_tokens
+            totals["output_tokens"] += output_tokens
+            totals["seconds"] += seconds
+            totals["model"] = _model_name(message) or model or totals["model"]
+        logger.info(f"{stage}: ~{estimate} input tokens estimated, "
+                    f"{input_tokens} input / {output_tokens} output billed, {seconds:.2f}s")
+        return input_tokens, output_tokens
+
+    def cache_hit(self, stage):
+        with self._lock:
+            self._stage(stage)["cache_hits"] += 1
+
+    def stats(self):
+        """Totals per stage and overall; seconds_per_call is the mean latency of calls that missed the cache."""
+        with self._lock:
+            stages = {stage: dict(totals) for stage, totals in self._stages.items()}
+        stages["total"] = {
+            key: sum(totals[key] for totals in stages.values())
+            for key in ("calls", "cache_hits", "estimated_input_tokens", "input_tokens", "output_tokens", "seconds")
+        }
+        stages["total"]["model"] = None
+        for totals in stages.values():
+            totals["seconds"] = round(totals["seconds"], 3)
+            totals["seconds_per_call"] = round(totals["seconds"] / totals["calls"], 3) if totals["calls"] else 0.0
+        return stages
@@ -0,0 +1,101 @@
+import json
+import os
+import time
+
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.mcqgen import get_chains
+from src.mcqgenerator.schema import Question, parse_quiz
+
+# Follow-up calls allowed per quiz; 0 turns repair off
+DEFAULT_MAX_ROUNDS = int(os.getenv("MCQGEN_REPAIR_ROUNDS", "1"))
+
+
+def find_problems(quiz, number):
+    """Parse a quiz and work out which entries need replacing.
+
+    Returns (quiz_dict, problems), where problems maps each bad key to its reasons.
+    Keys are added as "missing" until the quiz would have number questions.
+    """
+    try:
+        quiz_dict = dict(parse_quiz(quiz))
+    except Exception as e:
+        logger.warning(f"Quiz could not be parsed, every question needs repairing: {e}")
+        quiz_dict = {}
+
+    problems = {}
+    for key, value in quiz_dict.items():
+        reasons = Question.from_dict(value).problems() if isinstance(value, dict) else ["not a question object"]
+        if reasons:
+            problems[key] = reasons
+
+    missing = number - len(quiz_dict)
+    candidate = 1
+    while missing > 0:
+        key = str(candidate)
+        if key not in quiz_dict:
+            problems[key] = ["missing"]
+            missing -= 1
+        candidate += 1
+    return quiz_dict, problems
+
+
+def _ordered(quiz_dict):
+    # numbered keys in numeric order, anything else after them
+    return {
+        key: quiz_dict[key]
+        for key in sorted(quiz_dict, key=lambda k: (not k.isdigit(), int(k) if k.isdigit() else 0, k))
+    }
+
+
+def repair_quiz(quiz, inputs, max_rounds=DEFAULT_MAX_ROUNDS, chain=None, config=None):
+    """Replace only the missing or invalid questions of a quiz.
+
+    The bad entries are re-requested from repair_chain in one small call (per round)
+    and spliced back under their original keys. Returns the quiz unchanged when
+    nothing needs fixing, otherwise the repaired quiz as a JSON string. Entries that
+    are still bad after max_rounds are left as they are.
+    """
+    number = int(inputs["number"])
+    quiz_dict, problems = find_problems(quiz, number)
+    if not problems or max_rounds <= 0:
+        return quiz
+
+    started = time.perf_counter()
+    bad = len(problems)
+    chain = chain or get_chains().repair_chain
+    for _ in range(max_rounds):
+        keys = list(problems)
+        existing = [
+            Question.from_dict(value).mcq for key, value in quiz_dict.items()
+            if key not in problems and isinstance(value, dict)
+        ]
+        reply = chain.invoke({
+            **inputs,
+            "count": len(keys),
+            "problems": "\n".join(f"- {key}: {', '.join(reasons)}" for key, reasons in problems.items()),
+            "existing": "\n".join(f"- {stem}" for stem in existing) or "- none",
+        }, config)
+        try:
+            replacements = [value for value in parse_quiz(reply).values() if isinstance(value, dict)]
+        except Exception as e:
+            logger.warning(f"Repair reply could not be parsed: {e}")
+            break
+
+        # the reply is numbered from 1; its entries replace the bad keys in order
+        for key, value in zip(keys, replacements):
+            if not Question.from_dict(value).problems():
+                quiz_dict[key] = value
+        quiz_dict, problems = find_problems(quiz_dict, number)
+        if not problems:
+            break
+
+    logger.info(
+        f"Repaired {bad - len(problems)}/{bad} questions in {time.perf_counter() - started:.2f}s"
+        + (f", still bad: {', '.join(problems)}" if problems else "")
+    )
+    return json.dumps(_ordered(quiz_dict), indent=4)
+
+
+def repair_step(inputs, config=None):
+    """generate_evaluate_chain step: repair inputs["quiz"] before it is reviewed."""
+    return repair_quiz(inputs["quiz"], inputs, config=config)
@@ -0,0 +1,155 @@
+import math
+import os
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.utils import estimate_tokens
+
+# Opt-in: documents over this many tokens (or TOKENS_PER_QUESTION per question asked for,
+# whichever is more) are cut down to their best passages; with 0, the default, only
+# requests that name focus topics are
+DEFAULT_BUDGET = int(os.getenv("MCQGEN_RETRIEVAL_TOKENS", "0"))
+TOKENS_PER_QUESTION = 300
+PASSAGE_TOKENS = 150
+TOP_K = 3
+QUERY_TERMS = 8
+
+_TERM = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a about above after again all also an and any are as at be because been before being between both but by
+can could did do does during each few for from further had has have having he her here hers him his how i
+if in into is it its itself just may more most no nor not of off on once only or other our out over own
+same she should so some such than that the their them then there these they this those through to too
+under until up very was we were what when where which while who whom why will with would you your
+""".split())
+
+
+def terms(text):
+    """Lowercased word tokens without stopwords."""
+    return [term for term in _TERM.findall(text.lower()) if term not in _STOPWORDS and len(term) > 1]
+
+
+class BM25Index:
+    """Okapi BM25 over a list of passages, with an inverted index of NumPy postings."""
+
+    def __init__(self, passages, k1=1.5, b=0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.counts = [Counter(terms(passage)) for passage in passages]
+        lengths = np.array([sum(count.values()) for count in self.counts], dtype=float)
+        average = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+        self._norm = k1 * (1 - b + b * lengths / average)
+
+        postings = {}
+        for i, count in enumerate(self.counts):
+            for term, tf in count.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(i)
+                postings[term][1].append(tf)
+        n = len(passages)
+        self.idf = {}
+        self.postings = {}
+        for term, (ids, tfs) in postings.items():
+            self.idf[term] = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            self.postings[term] = (np.array(ids), np.array(tfs, dtype=float))
+
+    def scores(self, query_terms):
+        scores = np.zeros(len(self.passages))
+        for term in set(query_terms):
+            hit = self.postings.get(term)
+            if hit is None:
+                continue
+            ids, tf = hit
+            scores[ids] += self.idf[term] * tf * (self.k1 + 1) / (tf + self._norm[ids])
+        return scores
+
+    def search(self, query, k=TOP_K):
+        """Indexes of the k best passages for a query (string or term list), best first."""
+        query_terms = terms(query) if isinstance(query, str) else query
+        scores = self.scores(query_terms)
+        best = np.argsort(-scores, kind="stable")[:k]
+        return [int(i) for i in best if scores[i] > 0]
+
+    def section_queries(self, count):
+        """One query per equal slice of the document: the slice's most distinctive terms.
+
+        Used when no topics are given, so every part of the document gets asked about.
+        """
+        count = max(1, min(count, len(self.passages)))
+        bounds = np.linspace(0, len(self.passages), count + 1).astype(int)
+        queries = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            section = Counter()
+            for passage_counts in self.counts[start:end]:
+                section.update(passage_counts)
+            weighted = sorted(section, key=lambda term: -section[term] * self.idf[term])
+            queries.append(weighted[:QUERY_TERMS])
+        return queries
+
+
+@lru_cache(maxsize=8)
+def _index(text):
+    # imported here: chunking pulls in the chains
+    from src.mcqgenerator.chunking import split_text
+    return BM25Index(split_text(text, PASSAGE_TOKENS))
+
+
+def _topics(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [topic.strip() for topic in value if topic and topic.strip()]
+
+
+def select_passages(text, inputs, budget=DEFAULT_BUDGET):
+    """Shrink text to the passages a quiz on it needs, within budget tokens.
+
+    Only runs when budget is set or the user gave focus topics (inputs["topics"]), and
+    never on less than TOKENS_PER_QUESTION per question asked for. Queries are the
+    topics or, failing that, one per section of the document so the quiz still covers
+    all of it; the subject is added to every query. Each query's top passages are taken
+    in turn until the budget is spent and are returned in document order. Text within
+    the budget is returned unchanged.
+    """
+    topics = _topics(inputs.get("topics"))
+    if budget <= 0 and not topics:
+        return text
+    budget = max(budget, TOKENS_PER_QUESTION * int(inputs.get("number", 10)))
+    if estimate_tokens(text) <= budget:
+        return text
+
+    started = time.perf_counter()
+    index = _index(text)
+    subject = terms(str(inputs.get("subject", "")))
+    if topics:
+        queries = [terms(topic) + subject for topic in topics]
+    else:
+        queries = [query + subject for query in index.section_queries(int(inputs.get("number", 10)))]
+    ranked = [index.search(query, TOP_K) for query in queries]
+
+    chosen = set()
+    used = 0
+    for rank in range(TOP_K):
+        for hits in ranked:
+            if rank >= len(hits) or hits[rank] in chosen:
+                continue
+            cost = estimate_tokens(index.passages[hits[rank]])
+            if used + cost > budget and chosen:
+                continue
+            chosen.add(hits[rank])
+            used += cost
+    if not chosen:
+        return text
+
+    selected = "\n\n".join(index.passages[i] for i in sorted(chosen))
+    logger.info(
+        f"Retrieval: {len(chosen)}/{len(index.passages)} passages, {estimate_tokens(selected)}/"
+        f"{estimate_tokens(text)} tokens for {len(queries)} queries in {time.perf_counter() - started:.3f}s"
+    )
+    return selected
@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.prompts import compact_json, normalise_whitespace
+from src.mcqgenerator.schema import Question, parse_quiz
+
+# "eager": the review is written before the quiz is returned; "background": the quiz is
+# returned first and its review starts straight away; "lazy": the review is only written
+# when someone asks for it
+REVIEW_MODES = ("eager", "background", "lazy")
+DEFAULT_REVIEW_MODE = os.getenv("MCQGEN_REVIEW_MODE", "eager")
+# "essay": one free-text review of the whole quiz; "questions": structured scores per question
+REVIEW_KINDS = ("essay", "questions")
+DEFAULT_REVIEW_KIND = os.getenv("MCQGEN_REVIEW_KIND", "essay")
+DEFAULT_WORKERS = int(os.getenv("MCQGEN_REVIEW_WORKERS", "4"))
+MAX_REVIEWS = 256
+# questions per question_review_chain call, and calls in flight at once
+DEFAULT_BATCH_SIZE = int(os.getenv("MCQGEN_REVIEW_BATCH", "4"))
+DEFAULT_CONCURRENCY = int(os.getenv("MCQGEN_REVIEW_CONCURRENCY", "4"))
+BLOOM_LEVELS = ("remember", "understand", "apply", "analyze", "evaluate", "create")
+
+
+def _label(value):
+    return " ".join(str(value).split()).lower()
+
+
+def review_key(inputs, quiz, kind="essay"):
+    """Content hash of a quiz (string or dict), the subject it is reviewed for and the kind of review."""
+    text = quiz if isinstance(quiz, str) else json.dumps(quiz, sort_keys=True)
+    payload = f"{kind}\n{_label(inputs.get('subject', ''))}\n{normalise_whitespace(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _reviewed_part(question):
+    """What a question review looks at: stem, options and answer (not the hint or explanation)."""
+    parsed = Question.from_dict(question)
+    options = dict(zip("abcd", (normalise_whitespace(str(option or "")) for option in parsed.options)))
+    return {"mcq": normalise_whitespace(str(parsed.mcq or "")), "options": options,
+            "correct": parsed.correct_letter() or str(parsed.correct or "")}
+
+
+def question_hash(question):
+    """Content hash of one question's stem, options and answer; whitespace and case do not change it."""
+    return hashlib.sha256(compact_json(_reviewed_part(question)).lower().encode("utf-8")).hexdigest()[:16]
+
+
+def _scores(value):
+    """One question's scores from the model, clamped to their scales; None if unusable."""
+    if not isinstance(value, dict):
+        return None
+    try:
+        grammar = min(5, max(1, int(value.get("grammar"))))
+        distractors = min(5, max(1, int(value.get("distractors"))))
+    except (TypeError, ValueError):
+        return None
+    bloom = _label(value.get("bloom", "")).replace("analyse", "analyze")
+    return {"grammar": grammar, "bloom": bloom if bloom in BLOOM_LEVELS else None,
+            "distractors": distractors, "comment": str(value.get("comment") or "")}
+
+
+def _review_batch(chain, inputs, batch):
+    """{hash: scores} for one batch of {hash: question}; questions the model skipped are left out."""
+    output = chain.invoke({"subject": inputs["subject"], "fresh": inputs.get("fresh", False),
+                           "questions": compact_json({h: _reviewed_part(q) for h, q in batch.items()})})
+    try:
+        parsed = parse_quiz(output)
+    except ValueError as e:
+        logger.warning(f"Question review batch unreadable: {e}")
+        return {}
+    scores = {h: _scores(parsed.get(h)) for h in batch}
+    return {h: value for h, value in scores.items() if value is not None}
+
+
+def review_questions(inputs, quiz, batch_size=DEFAULT_BATCH_SIZE, max_concurrency=DEFAULT_CONCURRENCY):
+    """Structured review of every question: {quiz key: {"hash", "grammar", "bloom", "distractors", "comment"}}.
+
+    Scores are stored per question_hash (with the subject and review model) in the
+    score cache, so only questions that are new or were edited since an earlier review
+    go to the model, in batches of batch_size with up to max_concurrency batches at a
+    time. Questions the model did not score are missing from the result.
+    """
+    from src.mcqgenerator.cache import model_settings
+    from src.mcqgenerator.mcqgen import QUESTION_REVIEW_TEMPLATE, get_chains, get_score_cache
+
+    started = time.perf_counter()
+    chain = get_chains().question_review_chain
+    cache = get_score_cache()
+    settings = model_settings(chain.llm)
+    subject = _label(inputs["subject"])
+
+    def cache_key(h):
+        return cache.key(f"{QUESTION_REVIEW_TEMPLATE}\n{subject}\n{h}", settings)
+
+    questions = {key: value for key, value in parse_quiz(quiz).items() if isinstance(value, dict)}
+    hashes = {key: question_hash(value) for key, value in questions.items()}
+    scores = {}
+    todo = {}
+    for key, h in hashes.items():
+        if h in scores or h in todo:
+            continue
+        cached = None if inputs.get("fresh") else cache.get(cache_key(h))
+        if cached is not None:
+            scores[h] = cached
+        else:
+            todo[h] = questions[key]
+
+    def run(batch):
+        try:
+            return _review_batch(chain, inputs, batch), None
+        except Exception as e:
+            logger.warning(f"Question review batch of {len(batch)} failed: {e}")
+            return {}, e
+
+    pending = list(todo)
+    batches = [{h: todo[h] for h in pending[i:i + batch_size]} for i in range(0, len(pending), batch_size)]
+    errors = []
+    if batches:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches)))) as pool:
+            for result, error in pool.map(run, batches):
+                for h, value in result.items():
+                    cache.set(cache_key(h), value)
+                scores.update(result)
+                if error is not None:
+                    errors.append(error)
+    if errors and len(errors) == len(batches):
+        # nothing new got scored: report it rather than return a partial review
+        raise errors[0]
+
+    logger.info(f"Reviewed {len(todo)}/{len(hashes)} questions in {len(batches)} batches "
+                f"({len(hashes) - len(todo)} already scored) in {time.perf_counter() - started:.2f}s")
+    return {key: {"hash": h, **scores[h]} for key, h in hashes.items() if h in scores}
+
+
+def score_summary(scores):
+    """Mean grammar and distractor scores and the Bloom level counts of a review_questions() result."""
+    values = list(scores.values())
+    if not values:
+        return {"questions": 0, "grammar": None, "distractors": None, "bloom": {}}
+    bloom = {}
+    for value in values:
+        if value["bloom"]:
+            bloom[value["bloom"]] = bloom.get(value["bloom"], 0) + 1
+    return {"questions": len(values),
+            "grammar": round(sum(value["grammar"] for value in values) / len(values), 2),
+            "distractors": round(sum(value["distractors"] for value in values) / len(values), 2),
+            "bloom": bloom}
+
+
+class ReviewStore:
+    """Quiz reviews written off the request path, kept with the quiz they belong to.
+
+    add() registers a finished quiz under review_key() and, unless start=False, starts
+    its review on a worker thread; get() returns the review once it is written (lazy
+    quizzes are started by their first get()). The last MAX_REVIEWS quizzes are kept.
+    An "essay" review is review_chain's text and a "questions" review is the
+    review_questions() dict; both come back from disk (the response and score caches)
+    after a restart.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_entries=MAX_REVIEWS):
+        self.max_entries = max_entries
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mcqgen-review")
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.written = 0
+
+    def add(self, inputs, quiz, start=True, kind="essay"):
+        """Register a quiz for a REVIEW_KINDS review; returns its key."""
+        key = review_key(inputs, quiz, kind)
+        with self._lock:
+            if key not in self._entries:
+                # the document text is not needed for the review
+                self._entries[key] = {"inputs": {k: v for k, v in inputs.items() if k != "text"},
+                                      "quiz": quiz, "kind": kind, "future": None}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if start:
+            self.start(key)
+        return key
+
+    def start(self, key):
+        """Start the review of a registered quiz unless it is running or written; returns its future.
+
+        A review that failed is started again. Returns None for unknown keys.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            future = entry["future"]
+            if future is None or (future.done() and future.exception() is not None):
+                entry["future"] = self._pool.submit(self._review, key, entry)
+            return entry["future"]
+
+    def write(self, key):
+        """The review of a registered quiz, written on the calling thread unless it has already started."""
+        with self._lock:
+            entry = self._entries[key]
+            future = entry["future"]
+            if future is None:
+                entry["future"] = Future()
+        if future is not None:
+            return future.result()
+        try:
+            review = self._review(key, entry)
+        except Exception as e:
+            entry["future"].set_exception(e)
+            raise
+        entry["future"].set_result(review)
+        return review
+
+    def _review(self, key, entry):
+        # imported here: the store is built before the chains are needed
+        from src.mcqgenerator.mcqgen import get_chains
+        started = time.perf_counter()
+        if entry["kind"] == "questions":
+            review = review_questions(entry["inputs"], entry["quiz"])
+        else:
+            review = get_chains().review_chain.invoke({**entry["inputs"], "quiz": entry["quiz"]})
+        with self._lock:
+            self.written += 1
+        logger.info(f"Review {key[:12]} written in {time.perf_counter() - started:.2f}s")
+        return review
+
+    def status(self, key):
+        """"pending" (lazy, not asked for yet), "running", "done", "failed", or None for unknown keys."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        future = entry["future"]
+        if future is None:
+            return "pending"
+        if not future.done():
+            return "running"
+        return "failed" if future.exception() is not None else "done"
+
+    def get(self, key, timeout=0):
+        """The review, starting it if needed; None if it is not written within timeout seconds.
+
+        timeout=None waits for it. Raises the review's error if it fails.
+        """
+        future = self.start(key)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            return None
+
+    def stats(self):
+        with self._lock:
+            futures = [entry["future"] for entry in self._entries.values()]
+        return {
+            "quizzes": len(futures),
+            "pending": sum(future is None for future in futures),
+            "running": sum(future is not None and not future.done() for future in futures),
+            "written": self.written,
+        }
+
+
+def review_result(inputs, quiz, mode=None, kind=None):
+    """{"review": ..., "review_key": ...} for a finished quiz under a REVIEW_MODES mode.
+
+    Only "eager" waits for the review; the others return None for it, to be fetched
+    later with get_review_store().get(review_key). kind is one of REVIEW_KINDS.
+    """
+    from src.mcqgenerator.mcqgen import get_review_store
+
+    mode = mode or DEFAULT_REVIEW_MODE
+    kind = kind or DEFAULT_REVIEW_KIND
+    if mode not in REVIEW_MODES:
+        raise Exception(f"unknown review mode {mode!r}, expected one of {', '.join(REVIEW_MODES)}")
+    if kind not in REVIEW_KINDS:
+        raise Exception(f"unknown review kind {kind!r}, expected one of {', '.join(REVIEW_KINDS)}")
+    store = get_review_store()
+    key = store.add(inputs, quiz, start=mode == "background", kind=kind)
+    # eager reviews are written by the caller, not queued behind background ones
+    review = store.write(key) if mode == "eager" else None
+    return {"review": review, "review_key": key}
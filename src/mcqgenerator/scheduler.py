@@ -0,0 +1,434 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+
+from langchain_core.runnables import Runnable
+
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.utils import estimate_tokens
+
+# Lower number = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "batch": PRIORITY_BATCH}
+
+# Groq free-tier limits for openai/gpt-oss-120b; override for paid tiers
+DEFAULT_RPM = int(os.getenv("MCQGEN_RPM", "30"))
+DEFAULT_TPM = int(os.getenv("MCQGEN_TPM", "8000"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("MCQGEN_MAX_CONCURRENCY", "8"))
+# Completion size reserved before a call when the model has no max_tokens set
+DEFAULT_OUTPUT_TOKENS = int(os.getenv("MCQGEN_OUTPUT_TOKENS", "2000"))
+MAX_RETRIES = 5
+# Additive increase: one more concurrent request after this many clean responses
+INCREASE_AFTER = 5
+
+_DURATION = re.compile(r"(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m(?!s))?(?:(\d+(?:\.\d+)?)s)?(?:(\d+(?:\.\d+)?)ms)?")
+# dict the HTTP response hook fills with the rate-limit headers of the call in progress
+_response_headers = contextvars.ContextVar("mcqgen_response_headers", default=None)
+# event a caller (HedgedChatModel) sets here to learn when its call is let out of the queue
+admitted = contextvars.ContextVar("mcqgen_admitted", default=None)
+
+
+def parse_duration(value):
+    """Parse Groq's reset headers ("7.66s", "2m59.56s", "120ms") or plain seconds."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    match = _DURATION.fullmatch(value)
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes, seconds, millis = (float(g) if g else 0.0 for g in match.groups())
+    return hours * 3600 + minutes * 60 + seconds + millis / 1000
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to capacity, refills at rate per second.
+
+    The level may go negative when a caller is charged more than it reserved; it
+    then has to refill before anyone else gets through.
+    """
+
+    def __init__(self, capacity, rate):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount can be taken (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.level -= amount
+
+    def sync(self, remaining):
+        """Take the server's word for what is left, up or down."""
+        self._refill()
+        self.level = min(self.capacity, float(remaining))
+
+
+class RateLimitScheduler:
+    """Admits LLM calls under request/token per-minute budgets.
+
+    Waiting callers are served strictly by (priority, arrival); concurrency is adapted
+    AIMD-style: halved (and paused for retry-after) on a 429, raised by one after a run
+    of clean responses.
+    """
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 min_concurrency=1):
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = max_concurrency
+        self.in_flight = 0
+        # tokens reserved by calls in flight, which the server has not charged yet
+        self.reserved = 0
+        self.paused_until = 0.0
+        self.rate_limited = 0
+        self.completed = 0
+        self.tokens_used = 0
+        self._clean = 0
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, tokens, priority=PRIORITY_INTERACTIVE, abandoned=None):
+        """Block until this call may go out; reserves one request and `tokens` tokens.
+
+        Returns True. Setting abandoned (a threading.Event) and notifying withdraws a
+        call that is still waiting; acquire then returns False without a reservation.
+        """
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    if abandoned is not None and abandoned.is_set():
+                        self._withdraw(ticket)
+                        return False
+                    wait = self._wait_time(ticket, tokens)
+                    if wait == 0:
+                        break
+                    self._cond.wait(timeout=wait)
+                heapq.heappop(self._queue)
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                self.in_flight += 1
+                self.reserved += tokens
+                return True
+            except BaseException:
+                self._withdraw(ticket)
+                raise
+            finally:
+                self._cond.notify_all()
+
+    async def aacquire(self, tokens, priority=PRIORITY_INTERACTIVE):
+        """acquire() for coroutines; cancelling the await gives up the place in the queue.
+
+        The waiting thread cannot be interrupted, so it is told to withdraw; if it took
+        the slot before it noticed, the slot is handed straight back.
+        """
+        abandoned = threading.Event()
+        waiter = asyncio.ensure_future(asyncio.to_thread(self.acquire, tokens, priority, abandoned))
+
+        def give_back(done):
+            if not done.cancelled() and done.exception() is None and done.result():
+                self.cancel(tokens)
+
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            abandoned.set()
+            with self._cond:
+                self._cond.notify_all()
+            waiter.add_done_callback(give_back)
+            raise
+
+    def _withdraw(self, ticket):
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+
+    def cancel(self, reserved):
+        """Give back a slot acquired for a call that was never made, with its reservation."""
+        with self._cond:
+            self.in_flight -= 1
+            self.reserved -= reserved
+            self.requests.take(-1)
+            self.tokens.take(-reserved)
+            self._cond.notify_all()
+
+    def _wait_time(self, ticket, tokens):
+        # None means "wait until notified"
+        if self._queue[0] != ticket or self.in_flight >= self.concurrency:
+            return None
+        return max(
+            self.paused_until - time.monotonic(),
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens),
+            0.0,
+        )
+
+    def release(self, reserved, used=None, headers=None, rate_limited=False):
+        """Finish a call: settle the token reservation and adapt to the response.
+
+        headers are the response's (lowercased) x-ratelimit-* and retry-after headers;
+        the remaining counts in them replace the buckets' own.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            self.reserved -= reserved
+            if used is not None:
+                self.tokens.take(used - reserved)
+                self.tokens_used += used
+            if headers:
+                self._apply_headers(headers)
+
+            if rate_limited:
+                self.rate_limited += 1
+                self._clean = 0
+                self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+                retry_after = parse_duration(headers.get("retry-after")) if headers else None
+                self.paused_until = max(self.paused_until, time.monotonic() + (retry_after or 1.0))
+                logger.warning(
+                    f"Rate limited: concurrency -> {self.concurrency}, "
+                    f"pausing {retry_after or 1.0:.2f}s"
+                )
+            else:
+                self.completed += 1
+                self._clean += 1
+                if self._clean >= INCREASE_AFTER and self.concurrency < self.max_concurrency:
+                    self.concurrency += 1
+                    self._clean = 0
+            self._cond.notify_all()
+
+    def _apply_headers(self, headers):
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_requests is not None:
+            self.requests.sync(remaining_requests)
+        if remaining_tokens is not None:
+            # the calls still in flight are only charged once they finish
+            self.tokens.sync(float(remaining_tokens) - self.reserved)
+        if remaining_tokens is not None and float(remaining_tokens) <= 0:
+            reset = parse_duration(headers.get("x-ratelimit-reset-tokens"))
+            if reset:
+                self.paused_until = max(self.paused_until, time.monotonic() + reset)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "concurrency": self.concurrency,
+                "in_flight": self.in_flight,
+                "queued": len(self._queue),
+                "completed": self.completed,
+                "rate_limited": self.rate_limited,
+                "tokens_used": self.tokens_used,
+            }
+
+
+def _rate_limit_headers(error):
+    """Headers of a 429 from the groq client (or anything shaped like it), else None."""
+    response = getattr(error, "response", None)
+    if getattr(error, "status_code", None) != 429 and getattr(response, "status_code", None) != 429:
+        return None
+    headers = getattr(response, "headers", None) or {}
+    return {k.lower(): v for k, v in headers.items()}
+
+
+def record_headers(response):
+    """httpx response event hook: keep the rate-limit headers for the scheduled call that made the request.
+
+    Give the backend's HTTP clients event_hooks={"response": [record_headers]} (or
+    arecord_headers for the async client) and ScheduledChatModel adapts to every
+    response, not just to 429s.
+    """
+    seen = _response_headers.get()
+    if seen is not None:
+        seen.update((k.lower(), v) for k, v in response.headers.items()
+                    if k.lower().startswith("x-ratelimit-") or k.lower() == "retry-after")
+
+
+async def arecord_headers(response):
+    record_headers(response)
+
+
+def _watch_headers():
+    # a dict rather than a value so the hook can fill it from a copied context
+    seen = {}
+    _response_headers.set(seen)
+    return seen
+
+
+def _admit():
+    event = admitted.get()
+    if event is not None:
+        event.set()
+
+
+def _priority(config):
+    metadata = (config or {}).get("metadata") or {}
+    priority = metadata.get("priority", PRIORITY_INTERACTIVE)
+    return PRIORITIES.get(priority, priority)
+
+
+def _used_tokens(message):
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+def _headers(message, seen):
+    """Rate-limit headers of a response: from response_metadata if the model puts them there, else the hook's."""
+    metadata = getattr(message, "response_metadata", None) or {}
+    headers = metadata.get("headers")
+    if headers:
+        return {k.lower(): v for k, v in headers.items()}
+    return seen or None
+
+
+def _max_tokens(llm, kwargs):
+    """The max_tokens a call will run with: passed in, bound with .bind(), or set on the model."""
+    limit = kwargs.get("max_tokens")
+    while limit is None and llm is not None:
+        bound = getattr(llm, "kwargs", None)
+        if isinstance(bound, dict):
+            limit = bound.get("max_tokens")
+        if limit is None:
+            limit = getattr(llm, "max_tokens", None)
+        llm = getattr(llm, "bound", None)
+    return limit
+
+
+class ScheduledChatModel(Runnable):
+    """Puts a chat model behind a RateLimitScheduler.
+
+    The wrapped model should have its own retries turned off (max_retries=0); 429s are
+    retried here after the server's retry-after instead. Batch callers can pass
+    config={"metadata": {"priority": "batch"}} to yield to interactive users.
+
+    Each call reserves its prompt's estimate plus the model's max_tokens (output_tokens
+    if it has none); the usage and rate-limit headers of the response then settle it.
+    """
+
+    def __init__(self, llm, scheduler=None, output_tokens=DEFAULT_OUTPUT_TOKENS, max_retries=MAX_RETRIES):
+        self.llm = llm
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.output_tokens = output_tokens
+        self.max_retries = max_retries
+
+    def _reserve(self, input, kwargs):
+        text = input.to_string() if hasattr(input, "to_string") else str(input)
+        return estimate_tokens(text) + int(_max_tokens(self.llm, kwargs) or self.output_tokens)
+
+    def invoke(self, input, config=None, **kwargs):
+        reserved = self._reserve(input, kwargs)
+        priority = _priority(config)
+        for attempt in range(self.max_retries + 1):
+            self.scheduler.acquire(reserved, priority)
+            _admit()
+            seen = _watch_headers()
+            try:
+                message = self.llm.invoke(input, config, **kwargs)
+            except Exception as e:
+                headers = _rate_limit_headers(e)
+                self.scheduler.release(reserved, headers=headers, rate_limited=headers is not None)
+                if headers is None or attempt == self.max_retries:
+                    raise
+                continue
+            self.scheduler.release(reserved, used=_used_tokens(message), headers=_headers(message, seen))
+            return message
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        reserved = self._reserve(input, kwargs)
+        priority = _priority(config)
+        for attempt in range(self.max_retries + 1):
+            await self.scheduler.aacquire(reserved, priority)
+            _admit()
+            seen = _watch_headers()
+            try:
+                message = await self.llm.ainvoke(input, config, **kwargs)
+            except Exception as e:
+                headers = _rate_limit_headers(e)
+                self.scheduler.release(reserved, headers=headers, rate_limited=headers is not None)
+                if headers is None or attempt == self.max_retries:
+                    raise
+                continue
+            self.scheduler.release(reserved, used=_used_tokens(message), headers=_headers(message, seen))
+            return message
+
+    def stream(self, input, config=None, **kwargs):
+        # a stream can only be retried if nothing has been yielded yet
+        reserved = self._reserve(input, kwargs)
+        priority = _priority(config)
+        for attempt in range(self.max_retries + 1):
+            self.scheduler.acquire(reserved, priority)
+            _admit()
+            used = headers = None
+            started = released = False
+            seen = _watch_headers()
+            try:
+                for chunk in self.llm.stream(input, config, **kwargs):
+                    started = True
+                    used = _used_tokens(chunk) or used
+                    headers = _headers(chunk, None) or headers
+                    yield chunk
+            except Exception as e:
+                headers = _rate_limit_headers(e)
+                self.scheduler.release(reserved, headers=headers, rate_limited=headers is not None)
+                released = True
+                if headers is None or started or attempt == self.max_retries:
+                    raise
+                continue
+            finally:
+                # also runs when the consumer stops iterating early
+                if not released:
+                    self.scheduler.release(reserved, used=used, headers=headers or seen or None)
+            return
+
+    async def astream(self, input, config=None, **kwargs):
+        reserved = self._reserve(input, kwargs)
+        priority = _priority(config)
+        for attempt in range(self.max_retries + 1):
+            await self.scheduler.aacquire(reserved, priority)
+            _admit()
+            used = headers = None
+            started = released = False
+            seen = _watch_headers()
+            try:
+                async for chunk in self.llm.astream(input, config, **kwargs):
+                    started = True
+                    used = _used_tokens(chunk) or used
+                    headers = _headers(chunk, None) or headers
+                    yield chunk
+            except Exception as e:
+                headers = _rate_limit_headers(e)
+                self.scheduler.release(reserved, headers=headers, rate_limited=headers is not None)
+                released = True
+                if headers is None or started or attempt == self.max_retries:
+                    raise
+                continue
+            finally:
+                if not released:
+                    self.scheduler.release(reserved, used=used, headers=headers or seen or None)
+            return
@@ -0,0 +1,198 @@
+import ast
+import json
+import os
+from collections import namedtuple
+
+from src.mcqgenerator.logger import logger
+
+OPTION_LETTERS = ("a", "b", "c", "d")
+
+# What the model is asked to return: {"1": question, "2": question, ...}
+QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "mcq": {"type": "string"},
+        "options": {
+            "type": "object",
+            "properties": {letter: {"type": "string"} for letter in OPTION_LETTERS},
+            "required": list(OPTION_LETTERS),
+            "additionalProperties": False,
+        },
+        "correct": {"type": "string"},
+        "hint": {"type": "string"},
+        "explanation": {"type": "string"},
+    },
+    "required": ["mcq", "options", "correct", "hint", "explanation"],
+    "additionalProperties": False,
+}
+QUIZ_SCHEMA = {"type": "object", "additionalProperties": QUESTION_SCHEMA}
+
+# json_schema (default), json_object, or off
+STRUCTURED_OUTPUT = os.getenv("MCQGEN_STRUCTURED_OUTPUT", "json_schema")
+
+# Key names models actually use, best first. Lookups are case-insensitive.
+FIELD_ALIASES = {
+    "mcq": ("mcq", "question", "stem"),
+    "options": ("options", "choices"),
+    "correct": ("correct", "correct_answer", "correct answer", "answer"),
+    "hint": ("hint", "clue"),
+    "explanation": ("explanation", "reason", "rationale"),
+}
+_FIELDS = tuple(FIELD_ALIASES)
+# alias -> (field index, rank), built once instead of on every lookup
+_ALIASES = {
+    alias: (index, rank)
+    for index, field in enumerate(_FIELDS)
+    for rank, alias in enumerate(FIELD_ALIASES[field])
+}
+# the spellings seen in practice resolve without lowercasing the key
+_ALIASES.update({alias.title(): hit for alias, hit in list(_ALIASES.items())})
+_ALIASES.update({"MCQ": _ALIASES["mcq"]})
+_DECODER = json.JSONDecoder()
+
+
+def response_format(mode=None):
+    """The response_format to bind to the quiz model for a structured-output mode (None when off)."""
+    mode = mode or STRUCTURED_OUTPUT
+    if mode == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": "quiz", "schema": QUIZ_SCHEMA}}
+    if mode == "json_object":
+        return {"type": "json_object"}
+    if mode == "off":
+        return None
+    raise Exception(f"Unknown structured output mode {mode!r} (use json_schema, json_object or off)")
+
+
+def _options(value):
+    if isinstance(value, dict):
+        options = (value.get("a"), value.get("b"), value.get("c"), value.get("d"))
+        if None not in options:
+            return options
+        letters = {}
+        for key, text in value.items():
+            letter = str(key).strip().lower()
+            if letter in OPTION_LETTERS and letter not in letters:
+                letters[letter] = text
+        return tuple(letters.get(letter) or "" for letter in OPTION_LETTERS)
+    if isinstance(value, (list, tuple)):
+        return tuple(list(value[:4]) + [""] * (4 - min(len(value), 4)))
+    return ("", "", "", "")
+
+
+class Question(namedtuple("Question", ["mcq", "options", "correct", "hint", "explanation"])):
+    """One parsed question; options is the (a, b, c, d) tuple of choices."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, value):
+        """Map a question object with any of the FIELD_ALIASES keys in one pass over its items."""
+        found = ["", None, "", "", ""]
+        ranks = [len(_ALIASES)] * len(_FIELDS)
+        for key, item in value.items():
+            hit = _ALIASES.get(key)
+            if hit is None:
+                if not isinstance(key, str):
+                    continue
+                hit = _ALIASES.get(key.lower())
+                if hit is None:
+                    continue
+            index, rank = hit
+            if item is not None and rank < ranks[index]:
+                found[index] = item
+                ranks[index] = rank
+        mcq, options, correct, hint, explanation = found
+        return cls(mcq, _options(options), correct, hint, explanation)
+
+    def correct_letter(self):
+        """The letter of the correct option, accepting the option text itself, "b", "B)" or "b. text".
+
+        Option text is matched first: an answer like "A nucleic acid" is an option, not "a".
+        """
+        correct = str(self.correct or "").strip()
+        if not correct:
+            return None
+        lowered = correct.lower()
+        for letter, option in zip(OPTION_LETTERS, self.options):
+            if option and str(option).strip().lower() == lowered:
+                return letter
+        if lowered[0] in OPTION_LETTERS and (len(lowered) == 1 or lowered[1] in ").: "):
+            return lowered[0]
+        return None
+
+    def problems(self):
+        """Why this question is unusable, as a list of short reasons (empty when it is fine)."""
+        problems = []
+        if not str(self.mcq or "").strip():
+            problems.append("empty question stem")
+        filled = sum(1 for option in self.options if str(option or "").strip())
+        if filled != len(OPTION_LETTERS):
+            problems.append(f"{filled} options instead of {len(OPTION_LETTERS)}")
+        letter = self.correct_letter()
+        if letter is None or not str(self.options[OPTION_LETTERS.index(letter)] or "").strip():
+            problems.append("correct answer is not one of the options")
+        return problems
+
+    def row(self):
+        """The quiz table row (the shape get_table_data has always returned).
+
+        "Correct Answer" is the resolved option letter, so answers the model gave as
+        option text are scored like any other; an unresolvable answer is kept as it is.
+        """
+        opt_a, opt_b, opt_c, opt_d = self.options
+        return {
+            "MCQ": self.mcq,
+            "Option A": opt_a,
+            "Option B": opt_b,
+            "Option C": opt_c,
+            "Option D": opt_d,
+            "Correct Answer": self.correct_letter() or self.correct,
+            "Hint": self.hint,
+            "Explanation": self.explanation,
+        }
+
+
+def _salvage(text):
+    # a truncated completion still has its complete questions at the front
+    from src.mcqgenerator.streaming import IncrementalQuizParser
+    return dict(IncrementalQuizParser().feed(text))
+
+
+def parse_quiz(text):
+    """Recover the quiz dict from a raw completion (or pass a dict through).
+
+    The object starting at the first "{" is decoded in a single pass, which also
+    skips code fences, preambles and anything after it. Python-literal output and
+    truncated completions are handled as fallbacks.
+    """
+    if isinstance(text, dict):
+        return text
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("No JSON object found in the completion")
+    try:
+        quiz, _ = _DECODER.raw_decode(text, start)
+        if isinstance(quiz, dict):
+            return quiz
+        error = "top level is not an object"
+    except ValueError as e:
+        error = e
+
+    end = text.rfind("}") + 1
+    try:
+        quiz = ast.literal_eval(text[start:end])
+        if isinstance(quiz, dict):
+            return quiz
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        pass
+
+    quiz = _salvage(text[start:])
+    if not quiz:
+        raise ValueError(f"Completion is not a valid quiz: {error}")
+    logger.warning(f"Recovered {len(quiz)} complete questions from a malformed completion")
+    return quiz
+
+
+def parse_questions(text):
+    """Parse a completion into Question records, skipping anything that is not a question object."""
+    return [Question.from_dict(value) for value in parse_quiz(text).values() if isinstance(value, dict)]
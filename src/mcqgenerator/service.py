@@ -0,0 +1,294 @@
+"""HTTP API over the generation pipeline, for callers that are not the Streamlit apps.
+
+    python -m src.mcqgenerator.service [--host 127.0.0.1] [--port 8000]
+
+Endpoints (JSON bodies take text, number, subject and tone, plus optional topics,
+fresh, review_mode and review_kind; response_json defaults to the repository's
+response.json):
+
+    POST /generate      quiz and review in one response
+    POST /stream        NDJSON: one {"question": ...} line per question as it completes,
+                        then one {"quiz": ..., "review": ...} line
+    POST /jobs          queue a background job; returns {"id": ...} with status 202
+    GET  /jobs/<id>     stage, progress and, once done, the result
+    GET  /reviews/<id>  status and, once written, the review of a quiz
+    GET  /health        load and cache figures
+
+With review_mode "background" or "lazy" (see review.py; MCQGEN_REVIEW_MODE sets the
+default) results come back without waiting for the review: "review" is null and
+"review_id" is the /reviews/<id> to fetch it from; "lazy" reviews start on that fetch.
+With review_kind "questions" the review is {question key: scores} instead of an essay.
+
+Every request goes through the same chains and the same rate-limited LLM client.
+Once MCQGEN_SERVICE_MAX_IN_FLIGHT generations are running (or MCQGEN_SERVICE_MAX_JOBS
+jobs are waiting), new ones get 503 with Retry-After instead of queueing.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.mcqgen import (get_chains, get_job_manager, get_latency_stats, get_review_store,
+                                     get_scheduler, get_single_flight)
+from src.mcqgenerator.review import REVIEW_KINDS, REVIEW_MODES, review_result
+from src.mcqgenerator.schema import parse_quiz
+
+DEFAULT_MAX_IN_FLIGHT = int(os.getenv("MCQGEN_SERVICE_MAX_IN_FLIGHT", "16"))
+DEFAULT_MAX_JOBS = int(os.getenv("MCQGEN_SERVICE_MAX_JOBS", "64"))
+MAX_BODY_BYTES = 10 * 1024 * 1024
+RETRY_AFTER_SECONDS = 2
+REQUIRED_FIELDS = ("text", "number", "subject", "tone")
+RESPONSE_JSON_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                  "response.json")
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _default_response_json():
+    with open(RESPONSE_JSON_PATH, "r") as f:
+        return json.load(f)
+
+
+def _result_body(result):
+    try:
+        quiz = parse_quiz(result["quiz"])
+    except Exception:
+        quiz = result["quiz"]
+    return {"quiz": quiz, "review": result.get("review"), "review_id": result.get("review_key")}
+
+
+def _job_body(job):
+    body = {
+        "id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": job.progress,
+        "timings": job.timings,
+        "questions": len(job.questions),
+    }
+    if job.status == "done":
+        body["result"] = _result_body(job.result)
+    elif job.status == "failed":
+        body["error"] = job.error
+    return body
+
+
+class GenerationServer(ThreadingHTTPServer):
+    """One thread per connection; generations beyond max_in_flight are turned away."""
+
+    daemon_threads = True
+
+    def __init__(self, address, max_in_flight=DEFAULT_MAX_IN_FLIGHT, max_jobs=DEFAULT_MAX_JOBS):
+        super().__init__(address, GenerationHandler)
+        self.max_in_flight = max_in_flight
+        self.max_jobs = max_jobs
+        self.in_flight = 0
+        self.served = 0
+        self.rejected = 0
+        self.response_json = _default_response_json()
+        self._lock = threading.Lock()
+        # built here so the first request does not pay for it
+        get_chains()
+
+    def admit(self):
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def submit_job(self, fn, *args, **kwargs):
+        """Queue a background job unless max_jobs are already waiting; its ID, or None if turned away."""
+        jobs = get_job_manager()
+        # checked and queued under one lock, so concurrent submits cannot all squeeze in
+        with self._lock:
+            stats = jobs.stats()
+            if stats["queued"] + stats["running"] >= self.max_jobs:
+                self.rejected += 1
+                return None
+            return jobs.submit(fn, *args, **kwargs)
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.served += 1
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self.in_flight, "max_in_flight": self.max_in_flight, "served": self.served,
+                    "rejected": self.rejected, "jobs": get_job_manager().stats(),
+                    "scheduler": get_scheduler().stats(), "single_flight": get_single_flight().stats(),
+                    "hedging": get_latency_stats().stats(), "reviews": get_review_store().stats()}
+
+
+class GenerationHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, body):
+        line = json.dumps(body, ensure_ascii=False).encode("utf-8") + b"\n"
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def _busy(self):
+        self._send_json(503, {"error": "server busy, retry later"}, {"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+    def _inputs(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, f"body over {MAX_BODY_BYTES} bytes")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            raise RequestError(400, f"invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise RequestError(400, "body must be a JSON object")
+        missing = [field for field in REQUIRED_FIELDS if not body.get(field)]
+        if missing:
+            raise RequestError(400, f"missing fields: {', '.join(missing)}")
+        try:
+            body["number"] = int(body["number"])
+        except (TypeError, ValueError):
+            raise RequestError(400, "number must be an integer")
+        if body.get("review_mode") not in (None, *REVIEW_MODES):
+            raise RequestError(400, f"review_mode must be one of {', '.join(REVIEW_MODES)}")
+        if body.get("review_kind") not in (None, *REVIEW_KINDS):
+            raise RequestError(400, f"review_kind must be one of {', '.join(REVIEW_KINDS)}")
+        body.setdefault("response_json", self.server.response_json)
+        return body
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", **self.server.stats()})
+        elif self.path.startswith("/jobs/"):
+            job = get_job_manager().get(self.path[len("/jobs/"):])
+            if job is None:
+                self._send_json(404, {"error": "unknown job"})
+            else:
+                self._send_json(200, _job_body(job))
+        elif self.path.startswith("/reviews/"):
+            self._review(self.path[len("/reviews/"):])
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        routes = {"/generate": self._generate, "/stream": self._stream, "/jobs": self._submit}
+        route = routes.get(self.path)
+        if route is None:
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            route(self._inputs())
+        except RequestError as e:
+            self._send_json(e.status, {"error": str(e)})
+
+    def _review(self, key):
+        store = get_review_store()
+        status = store.status(key)
+        if status is None:
+            self._send_json(404, {"error": "unknown review"})
+        elif status == "failed":
+            self._send_json(200, {"id": key, "status": status, "review": None, "error": "review failed"})
+        else:
+            # lazy reviews start here
+            review = store.get(key)
+            self._send_json(200, {"id": key, "status": store.status(key), "review": review})
+
+    def _generate(self, inputs):
+        if not self.server.admit():
+            self._busy()
+            return
+        started = time.perf_counter()
+        mode, kind = inputs.pop("review_mode", None), inputs.pop("review_kind", None)
+        try:
+            result = get_chains().generate_chain.invoke(inputs)
+            result.update(review_result(inputs, result["quiz"], mode, kind))
+        except Exception as e:
+            logger.error(f"/generate failed: {e}")
+            self._send_json(500, {"error": str(e)})
+            return
+        finally:
+            self.server.release()
+        self._send_json(200, {**_result_body(result), "seconds": round(time.perf_counter() - started, 3)})
+
+    def _stream(self, inputs):
+        # imported here: only the streaming endpoint needs the incremental parser
+        from src.mcqgenerator.streaming import stream_generate_evaluate
+
+        if not self.server.admit():
+            self._busy()
+            return
+        mode, kind = inputs.pop("review_mode", None), inputs.pop("review_kind", None)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                result = stream_generate_evaluate(
+                    inputs, on_question=lambda key, question: self._send_chunk({"key": key, "question": question}),
+                    review=False)
+                result.update(review_result(inputs, result["quiz"], mode, kind))
+                self._send_chunk(_result_body(result))
+            except Exception as e:
+                # the status line is gone already; the error is the last line instead
+                logger.error(f"/stream failed: {e}")
+                self._send_chunk({"error": str(e)})
+        finally:
+            # freed before the response ends, so a client's next request finds the slot free
+            self.server.release()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _submit(self, inputs):
+        # imported here: jobs pull in the Streamlit-side pipeline helpers only when used
+        from src.mcqgenerator.jobs import generate_job
+
+        job_id = self.server.submit_job(generate_job, None, inputs, review_mode=inputs.pop("review_mode", None),
+                                        review_kind=inputs.pop("review_kind", None))
+        if job_id is None:
+            self._busy()
+            return
+        self._send_json(202, {"id": job_id}, {"Location": f"/jobs/{job_id}"})
+
+
+def serve(host="127.0.0.1", port=8000, max_in_flight=DEFAULT_MAX_IN_FLIGHT, max_jobs=DEFAULT_MAX_JOBS):
+    server = GenerationServer((host, port), max_in_flight, max_jobs)
+    logger.info(f"Serving on http://{host}:{server.server_address[1]} (max {max_in_flight} in flight)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT)
+    parser.add_argument("--max-jobs", type=int, default=DEFAULT_MAX_JOBS)
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.max_in_flight, args.max_jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import asyncio
+import threading
+
+from src.mcqgenerator.logger import logger
+
+
+def _abandoned():
+    # a new exception per raise: one shared instance would collect every raise's traceback
+    return RuntimeError("the shared call was abandoned before it finished")
+
+
+class _Flight:
+    def __init__(self, loop=None):
+        self.cond = threading.Condition()
+        self.parts = []
+        self.done = False
+        self.abandoned = False
+        self.result = None
+        self.error = None
+        # the leader's event loop (None for threads); followers on it can take over its stream
+        self.loop = loop
+        self.heirs = 0
+        # the leader's iterator, once it has stopped reading and handed it over
+        self.source = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key onto one execution.
+
+    The first caller for a key (the leader) runs the work; callers that arrive while
+    it is running wait for it and get the same result, or the same exception. Nothing
+    is kept once the leader finishes, so this only merges calls that overlap in time;
+    the ResponseCache takes over after that. stream() and astream() also pass the
+    leader's chunks on to followers as they arrive.
+
+    A leader that gives up does not fail its followers: a follower carries on the
+    leader's stream if it stopped reading (a client that disconnected), or runs the
+    work again if it was cancelled before anything was sent.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key, loop=None, heir=False):
+        """(flight, True if the caller leads it).
+
+        An heir follower on the leader's loop (None for threads) is counted as able to
+        take over the leader's stream.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight(loop)
+                self.leaders += 1
+                return flight, True
+            self.followers += 1
+            if heir and flight.loop is loop:
+                flight.heirs += 1
+        logger.info(f"Joined in-flight call {key[:12]}")
+        return flight, False
+
+    def _finish(self, key, flight, result=None, error=None, abandoned=False):
+        with self._lock:
+            del self._flights[key]
+        with flight.cond:
+            flight.result = result
+            flight.error = error
+            flight.abandoned = abandoned
+            flight.done = True
+            flight.cond.notify_all()
+
+    def _abandon(self, key, flight, source):
+        """The leader stopped reading its stream: hand source to an heir, or end the flight."""
+        with self._lock:
+            if flight.heirs > 0:
+                with flight.cond:
+                    flight.source = source
+                    flight.cond.notify_all()
+                logger.info(f"Handed in-flight call {key[:12]} over to a follower")
+                return
+        self._finish(key, flight, abandoned=True)
+
+    def _claim(self, flight):
+        """The handed-over stream, if this heir is the one to take it (else None)."""
+        with self._lock:
+            source, flight.source = flight.source, None
+            if source is not None:
+                flight.heirs -= 1
+        return source
+
+    def _leave(self, key, flight):
+        """An heir stops following; the last one to go ends a stream nobody has taken over."""
+        with self._lock:
+            flight.heirs -= 1
+            orphaned = flight.heirs == 0 and flight.source is not None
+            flight.source = None
+        if orphaned:
+            self._finish(key, flight, abandoned=True)
+
+    @staticmethod
+    def _wait(flight):
+        """Wait for the flight to end; False if its leader gave up."""
+        with flight.cond:
+            flight.cond.wait_for(lambda: flight.done)
+        return not flight.abandoned
+
+    @staticmethod
+    def _result(flight):
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def do(self, key, fn):
+        """fn(), run once for all concurrent callers with this key."""
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            if self._wait(flight):
+                return self._result(flight)
+            # the leader was cancelled: run fn again, or follow whoever does
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, flight, error=e)
+            raise
+        self._finish(key, flight, result)
+        return result
+
+    async def ado(self, key, fn):
+        """await fn(), run once for all concurrent callers with this key (sync callers included)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            # the leader may be on another thread, so wait off the event loop
+            if await loop.run_in_executor(None, self._wait, flight):
+                return self._result(flight)
+            # the leader was cancelled: run fn again, or follow whoever does
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            self._finish(key, flight, abandoned=True)
+            raise
+        except BaseException as e:
+            self._finish(key, flight, error=e)
+            raise
+        self._finish(key, flight, result)
+        return result
+
+    def stream(self, key, fn):
+        """Iterate fn() once for all concurrent callers; every caller gets every chunk.
+
+        Followers that join late are replayed the chunks they missed first.
+        """
+        seen = 0
+        while True:
+            flight, leader = self._join(key, heir=True)
+            if leader:
+                chunks = iter(fn())
+                break
+            heir = flight.loop is None
+            chunks = None
+            try:
+                while chunks is None:
+                    parts, done = self._next(flight, seen, heir)
+                    seen += len(parts)
+                    yield from parts
+                    if done:
+                        break
+                    if heir:
+                        chunks = self._claim(flight)
+            finally:
+                if heir and chunks is None:
+                    self._leave(key, flight)
+            if chunks is not None:
+                break
+            if not flight.abandoned:
+                return
+            if seen:
+                raise _abandoned()
+            # the leader was cancelled before sending anything: start over
+        try:
+            for part in chunks:
+                self._publish(flight, part)
+                yield part
+        except GeneratorExit:
+            # our reader stopped, but chunks is intact: a follower can read on
+            self._abandon(key, flight, chunks)
+            raise
+        except BaseException as e:
+            self._finish(key, flight, error=e)
+            raise
+        self._finish(key, flight, flight.parts)
+
+    async def astream(self, key, fn):
+        """Async stream(); fn() returns an async iterator.
+
+        Only followers on the leader's event loop can carry on its stream.
+        """
+        loop = asyncio.get_running_loop()
+        seen = 0
+        while True:
+            flight, leader = self._join(key, loop, heir=True)
+            if leader:
+                chunks = fn()
+                break
+            heir = flight.loop is loop
+            chunks = None
+            try:
+                while chunks is None:
+                    parts, done = await loop.run_in_executor(None, self._next, flight, seen, heir)
+                    seen += len(parts)
+                    for part in parts:
+                        yield part
+                    if done:
+                        break
+                    if heir:
+                        chunks = self._claim(flight)
+            finally:
+                if heir and chunks is None:
+                    self._leave(key, flight)
+            if chunks is not None:
+                break
+            if not flight.abandoned:
+                return
+            if seen:
+                raise _abandoned()
+            # the leader was cancelled before sending anything: start over
+        try:
+            async for part in chunks:
+                self._publish(flight, part)
+                yield part
+        except GeneratorExit:
+            self._abandon(key, flight, chunks)
+            raise
+        except asyncio.CancelledError:
+            # cancelled inside chunks, which cannot be resumed
+            self._finish(key, flight, abandoned=True)
+            raise
+        except BaseException as e:
+            self._finish(key, flight, error=e)
+            raise
+        self._finish(key, flight, flight.parts)
+
+    @staticmethod
+    def _publish(flight, part):
+        with flight.cond:
+            flight.parts.append(part)
+            flight.cond.notify_all()
+
+    @staticmethod
+    def _next(flight, seen, heir=False):
+        """Chunks after the first seen, once there are any, and whether the stream is over.
+
+        An heir also wakes up when the stream is handed over.
+        """
+        with flight.cond:
+            flight.cond.wait_for(lambda: flight.done or len(flight.parts) > seen
+                                 or (heir and flight.source is not None))
+            parts = flight.parts[seen:]
+            done = flight.done
+        if done and flight.error is not None:
+            raise flight.error
+        return parts, done
+
+    def stats(self):
+        with self._lock:
+            calls = self.leaders + self.followers
+            return {
+                "calls": calls,
+                "executed": self.leaders,
+                "coalesced": self.followers,
+                "in_flight": len(self._flights),
+                "coalesce_rate": self.followers / calls if calls else 0.0,
+            }
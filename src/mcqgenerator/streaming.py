@@ -0,0 +1,187 @@
+import ast
+import json
+import re
+import time
+
+from src.mcqgenerator.dedup import dedup_quiz
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.mcqgen import get_chains
+from src.mcqgenerator.repair import repair_quiz
+from src.mcqgenerator.utils import load_quiz_dict
+
+# Only these characters change the parser state; everything else is skipped in bulk
+_SPECIAL = re.compile(r'[{}":,\\]')
+
+
+class IncrementalQuizParser:
+    """Pull complete question objects out of a quiz completion as it streams in.
+
+    Feed it text chunks in order; feed() returns the (key, question) pairs whose
+    closing brace arrived in that chunk. It only looks at structural characters and
+    only buffers the question currently being received, so total work is linear in
+    the length of the completion. Anything before the first "{" (markdown fences,
+    preamble) is ignored.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.expect_key = False
+        self.key = None
+        self._key_parts = None
+        self._obj_parts = None
+        self._parts = []
+        self.emitted = 0
+
+    @property
+    def text(self):
+        """Everything fed so far."""
+        return "".join(self._parts)
+
+    def _emit(self, raw):
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            try:
+                value = ast.literal_eval(raw)
+            except (ValueError, SyntaxError):
+                logger.warning(f"Skipping unparseable question {self.key!r}")
+                return None
+        if not isinstance(value, dict):
+            return None
+        self.emitted += 1
+        return (self.key if self.key is not None else str(self.emitted)), value
+
+    def feed(self, chunk):
+        self._parts.append(chunk)
+        out = []
+        key_from = obj_from = 0
+        skip_at = -1
+        if self.escape:
+            # the previous chunk ended on a backslash
+            skip_at = 0
+            self.escape = False
+
+        for match in _SPECIAL.finditer(chunk):
+            i = match.start()
+            if i == skip_at:
+                continue
+            ch = match.group()
+
+            if self.in_string:
+                if ch == "\\":
+                    if i + 1 < len(chunk):
+                        skip_at = i + 1
+                    else:
+                        self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self._key_parts is not None:
+                        self._key_parts.append(chunk[key_from:i])
+                        self.key = json.loads('"' + "".join(self._key_parts) + '"')
+                        self._key_parts = None
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                if self.depth == 1 and self.expect_key:
+                    self._key_parts = []
+                    key_from = i + 1
+            elif ch == "{":
+                self.depth += 1
+                if self.depth == 1:
+                    self.expect_key = True
+                elif self.depth == 2:
+                    self._obj_parts = []
+                    obj_from = i
+            elif ch == "}":
+                if self.depth == 2 and self._obj_parts is not None:
+                    self._obj_parts.append(chunk[obj_from:i + 1])
+                    question = self._emit("".join(self._obj_parts))
+                    self._obj_parts = None
+                    if question is not None:
+                        out.append(question)
+                self.depth = max(self.depth - 1, 0)
+            elif self.depth == 1:
+                if ch == ",":
+                    self.expect_key = True
+                elif ch == ":":
+                    self.expect_key = False
+
+        # carry partial keys / question objects over to the next chunk
+        if self._key_parts is not None:
+            self._key_parts.append(chunk[key_from:])
+        if self._obj_parts is not None:
+            self._obj_parts.append(chunk[obj_from:])
+        return out
+
+
+def stream_questions(inputs, parser=None, chain=None):
+    """Yield (key, question) pairs from quiz_chain.stream as soon as each one is complete.
+
+    The full completion is available afterwards as parser.text.
+    """
+    parser = parser or IncrementalQuizParser()
+    for chunk in (chain or get_chains().quiz_chain).stream(inputs):
+        yield from parser.feed(chunk)
+
+
+async def astream_questions(inputs, parser=None, chain=None):
+    parser = parser or IncrementalQuizParser()
+    async for chunk in (chain or get_chains().quiz_chain).astream(inputs):
+        for question in parser.feed(chunk):
+            yield question
+
+
+def _stream_quiz(inputs, on_question):
+    parser = IncrementalQuizParser()
+    started = time.perf_counter()
+    first = None
+    for key, question in stream_questions(inputs, parser):
+        if first is None:
+            first = time.perf_counter() - started
+        if on_question is not None:
+            on_question(key, question)
+
+    total = time.perf_counter() - started
+    if first is not None:
+        logger.info(f"Streamed {parser.emitted} questions: first after {first:.2f}s, all after {total:.2f}s")
+    return parser.text
+
+
+def stream_generate_evaluate(inputs, on_question=None, bank=None, review=True):
+    """Streaming version of generate_evaluate_chain.invoke.
+
+    on_question(key, question) is called for every question as it completes; bad
+    questions are repaired and the review runs once the quiz is finished. With a
+    bank (bank.QuestionBank), stored questions for the same document, subject and
+    tone are served first and only the shortfall is generated. Returns the same dict
+    shape as the chain; with review=False the review is left to the caller and is None.
+    """
+    served = bank.serve(inputs) if bank is not None else {}
+    if on_question is not None:
+        for key, question in served.items():
+            on_question(key, question)
+
+    if len(served) >= int(inputs["number"]):
+        quiz = json.dumps(served, indent=4)
+    elif served:
+        # the shortfall comes from one small repair call that is shown the served stems
+        quiz = repair_quiz(json.dumps(served), inputs)
+        if on_question is not None:
+            for key, question in load_quiz_dict(quiz).items():
+                if key not in served and isinstance(question, dict):
+                    on_question(key, question)
+    else:
+        # repeated questions, ones that streamed in broken and ones that never arrived
+        # are re-requested on their own
+        quiz = repair_quiz(dedup_quiz(_stream_quiz(inputs, on_question)), inputs)
+
+    if bank is not None and len(served) < int(inputs["number"]):
+        bank.store(inputs, quiz)
+
+    if not review:
+        return {**inputs, "quiz": quiz, "review": None}
+    review = get_chains().review_chain.invoke({**inputs, "quiz": quiz})
+    return {**inputs, "quiz": quiz, "review": review}
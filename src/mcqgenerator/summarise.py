@@ -0,0 +1,112 @@
+import os
+import re
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from src.mcqgenerator.logger import logger
+from src.mcqgenerator.retrieval import terms
+from src.mcqgenerator.utils import estimate_tokens
+
+# token budget of the condensed text
+DEFAULT_BUDGET = int(os.getenv("MCQGEN_SUMMARY_TOKENS", "3000"))
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-6
+# sentences shorter than this are headings, page numbers and list bullets
+MIN_SENTENCE_CHARS = 20
+
+_SENTENCE = re.compile(r"[^.!?\n]+(?:[.!?]+|\n|$)")
+
+
+class Summary(namedtuple("Summary", ["text", "input_tokens", "output_tokens", "sentences", "kept", "seconds"])):
+    """Result of summarise(); ratio is how many times smaller the text got."""
+
+    __slots__ = ()
+
+    @property
+    def ratio(self):
+        return self.input_tokens / self.output_tokens if self.output_tokens else 1.0
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE.findall(text) if len(s.strip()) >= MIN_SENTENCE_CHARS]
+
+
+def _tfidf(sentences):
+    """Sparse L2-normalised TF-IDF rows as (row, column, value) arrays."""
+    vocab = {}
+    rows, cols, counts = [], [], []
+    for i, sentence in enumerate(sentences):
+        seen = {}
+        for term in terms(sentence):
+            column = vocab.setdefault(term, len(vocab))
+            seen[column] = seen.get(column, 0) + 1
+        rows.extend([i] * len(seen))
+        cols.extend(seen)
+        counts.extend(seen.values())
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    df = np.bincount(cols, minlength=len(vocab))
+    values = (1 + np.log(np.asarray(counts, dtype=float))) * (np.log(len(sentences) / np.maximum(df, 1)) + 1)[cols]
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=len(sentences)))
+    values /= np.maximum(norms, 1e-12)[rows]
+    return rows, cols, values, len(vocab)
+
+
+def textrank(sentences):
+    """TextRank scores for sentences, with cosine similarity of TF-IDF vectors as edge weights.
+
+    The n x n similarity matrix is never built: W @ p is computed as X @ (X.T @ p)
+    minus the self-similarity, so memory and time stay linear in the text.
+    """
+    n = len(sentences)
+    rows, cols, values, width = _tfidf(sentences)
+    squared = np.bincount(rows, weights=values ** 2, minlength=n)
+
+    def similarity_times(p):
+        column_sums = np.bincount(cols, weights=values * p[rows], minlength=width)
+        return np.bincount(rows, weights=values * column_sums[cols], minlength=n) - squared * p
+
+    degree = similarity_times(np.ones(n))
+    degree[degree <= 0] = 1.0
+    scores = np.full(n, 1.0 / n)
+    for _ in range(MAX_ITERATIONS):
+        updated = (1 - DAMPING) / n + DAMPING * similarity_times(scores / degree)
+        done = np.abs(updated - scores).sum() < TOLERANCE
+        scores = updated
+        if done:
+            break
+    return scores
+
+
+def summarise(text, budget=DEFAULT_BUDGET):
+    """Keep the highest-ranked sentences of text that fit in budget tokens, in their original order.
+
+    Runs locally with no model call. Text already within the budget comes back as is.
+    """
+    started = time.perf_counter()
+    input_tokens = estimate_tokens(text)
+    sentences = split_sentences(text)
+    if input_tokens <= budget or len(sentences) < 2:
+        return Summary(text, input_tokens, input_tokens, len(sentences), len(sentences), 0.0)
+
+    scores = textrank(sentences)
+    kept = []
+    used = 0
+    for i in np.argsort(-scores, kind="stable"):
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost > budget:
+            continue
+        kept.append(i)
+        used += cost
+    condensed = " ".join(sentences[i] for i in sorted(kept))
+
+    summary = Summary(condensed, input_tokens, estimate_tokens(condensed), len(sentences), len(kept),
+                      time.perf_counter() - started)
+    logger.info(
+        f"Summarised {summary.input_tokens} -> {summary.output_tokens} tokens "
+        f"({summary.kept}/{summary.sentences} sentences, {summary.ratio:.1f}x) in {summary.seconds:.3f}s"
+    )
+    return summary
@@ -1,98 +1,52 @@
-import os
-import PyPDF2
-import json
 import traceback
 
-def read_file(file):
-    if file.name.endswith(".pdf"):
-        try:
-            pdf_reader=PyPDF2.PdfReader(file)
-            text=""
-            for page in pdf_reader.pages:
-                text+=page.extract_text()
-            return text
+from src.mcqgenerator.extraction import iter_file_pages, read_bytes
+from src.mcqgenerator.schema import Question, parse_questions, parse_quiz
 
-        except Exception as e:
-            raise Exception(f"Error reading PDF file: {e}")
+# Rough chars-per-token ratio for English text; good enough for budgeting
+CHARS_PER_TOKEN = 4
 
-    elif file.name.endswith(".txt"):
-        return file.read().decode("utf-8")
 
-    else:
-        raise Exception("unsupported file format, only pdf and txt file are supported")
+def estimate_tokens(text):
+    """Cheap token estimate (no tokenizer needed)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def read_file(file, workers=None):
+    # pages are joined once at the end instead of growing a string page by page
+    return "".join(page.text for page in iter_file_pages(file, workers))
+
+
+def read_file_cached(file, cache=None, workers=None):
+    """read_file, served from the process-wide TextCache when the same bytes were read before."""
+    if cache is None:
+        # imported here: mcqgen's factories are only needed once a file is read
+        from src.mcqgenerator.mcqgen import get_text_cache
+        cache = get_text_cache()
+    key = cache.key(file.name, read_bytes(file))
+    text = cache.get(key)
+    if text is None:
+        text = read_file(file, workers)
+        cache.set(key, text)
+    return text
+
+
+def load_quiz_dict(quiz_str):
+    """Recover the quiz dict from a raw model completion (or pass a dict through)."""
+    return parse_quiz(quiz_str)
+
+
+def question_to_row(value):
+    """Turn one question object from the model into a quiz table row."""
+    return Question.from_dict(value).row()
 
 
 def get_table_data(quiz_str):
     try:
-        #covert the quiz from string to dict
-        if isinstance(quiz_str, dict):
-            quiz_dict = quiz_str
-        else:
-            # Clean up the string if it contains markdown
-            if "```json" in quiz_str:
-                quiz_str = quiz_str.split("```json")[1].split("```")[0]
-            elif "```" in quiz_str:
-                quiz_str = quiz_str.split("```")[1].split("```")[0]
-            
-            # Find start and end of json
-            start = quiz_str.find('{')
-            end = quiz_str.rfind('}') + 1
-            if start != -1 and end != 0:
-                quiz_str = quiz_str[start:end]
-                
-            import ast
-            try:
-                quiz_dict = json.loads(quiz_str)
-            except Exception:
-                 quiz_dict = ast.literal_eval(quiz_str)
-            
-        quiz_table_data=[]
-
-        # Helper to do case-insensitive key lookup
-        def get_flex(d, *keys):
-            """Try multiple key names (case-insensitive) and return the first match."""
-            lower_map = {k.lower(): v for k, v in d.items()}
-            for key in keys:
-                val = lower_map.get(key.lower())
-                if val is not None:
-                    return val
-            return ""
+        quiz_table_data = [question.row() for question in parse_questions(quiz_str)]
 
-        #iterate over the dict and extract info
-        for key, value in quiz_dict.items():
-            if not isinstance(value, dict):
-                continue
-            
-            mcq = get_flex(value, "mcq", "question", "MCQ", "Question")
-            options = get_flex(value, "options", "Options", "choices", "Choices")
-            correct = get_flex(value, "correct", "correct_answer", "Correct Answer", "answer", "Answer")
-            hint = get_flex(value, "hint", "Hint", "clue", "Clue")
-            explanation = get_flex(value, "explanation", "Explanation", "reason", "Reason")
-            
-            # Parse options flexibly
-            if isinstance(options, dict):
-                opt_a = options.get("a") or options.get("A") or ""
-                opt_b = options.get("b") or options.get("B") or ""
-                opt_c = options.get("c") or options.get("C") or ""
-                opt_d = options.get("d") or options.get("D") or ""
-            else:
-                opt_a = opt_b = opt_c = opt_d = ""
-            
-            quiz_table_data.append(
-                {
-                    "MCQ": mcq,
-                    "Option A": opt_a,
-                    "Option B": opt_b,
-                    "Option C": opt_c,
-                    "Option D": opt_d,
-                    "Correct Answer": correct,
-                    "Hint": hint,
-                    "Explanation": explanation
-                }
-            )
-        
         if not quiz_table_data:
-            raise ValueError(f"No valid questions found in quiz data. Keys found: {list(quiz_dict.keys())}")
+            raise ValueError(f"No valid questions found in quiz data. Keys found: {list(parse_quiz(quiz_str).keys())}")
         
         return quiz_table_data
     except Exception as e:
@@ -100,4 +54,3 @@ def get_table_data(quiz_str):
         # Include a snippet of the raw data for debugging
         raw_preview = str(quiz_str)[:500] if quiz_str else "None"
         raise Exception(f"Error parsing quiz data: {e}\n\nRaw data preview:\n{raw_preview}")
-
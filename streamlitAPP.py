@@ -1,11 +1,10 @@
 import os
-import json
 import pandas as pd
 import traceback
 from dotenv import load_dotenv
 
-from src.mcqgenerator.mcqgen import generate_evaluate_chain
-from src.mcqgenerator.utils import read_file, get_table_data
+from src.mcqgenerator.app_cache import load_chains, load_response_json, render_debug_panel
+from src.mcqgenerator.utils import read_file_cached, get_table_data
 import streamlit as st
 from src.mcqgenerator.logger import logger
 
@@ -15,8 +14,7 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 
 # Join with filename
 json_path = os.path.join(script_dir, "response.json")
-with open(json_path, 'r') as f:
-    response_json = json.load(f)
+response_json = load_response_json(json_path)
 
 #Create Title
 st.title('MCQ Generator With Langchain and Groq')
@@ -46,9 +44,9 @@ with st.form("user_inputs"):
         with st.spinner("Generating MCQs..."):
             try:
                 #Read the file
-                text = read_file(text)
+                text = read_file_cached(text)
                 #Generate MCQs
-                result = generate_evaluate_chain.invoke({
+                result = load_chains().generate_evaluate_chain.invoke({
                 "text": text,
                 "number": mcq_count,
                 "subject": subject,
@@ -74,4 +72,6 @@ with st.form("user_inputs"):
                         else:
                             st.error("Error in the table data")
                 else:
-                    st.write(result)
\ No newline at end of file
+                    st.write(result)
+
+render_debug_panel()
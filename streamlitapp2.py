@@ -6,8 +6,8 @@ from dotenv import load_dotenv
 import streamlit as st
 
 # --- Import your custom modules ---
-from src.mcqgenerator.utils import read_file, get_table_data
-from src.mcqgenerator.mcqgen import generate_evaluate_chain
+from src.mcqgenerator.utils import read_file_cached, get_table_data
+from src.mcqgenerator.app_cache import load_chains, load_response_json, render_debug_panel
 from src.mcqgenerator.logger import logger
 
 # --- 1. Page Configuration (Must be the first Streamlit command) ---
@@ -24,8 +24,7 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 json_path = os.path.join(script_dir, "response.json")
 
 try:
-    with open(json_path, 'r') as f:
-        response_json = json.load(f)
+    response_json = load_response_json(json_path)
 except Exception as e:
     st.error(f"Error loading response.json: {e}")
     response_json = {} 
@@ -108,11 +107,11 @@ if submitted:
         with st.spinner("🧠 Analyzing document & generating questions..."):
             try:
                 # 1. Read the file
-                text = read_file(uploaded_file)
+                text = read_file_cached(uploaded_file)
                 
                 # 2. Invoke the Chain
                 # Note: We dump response_json to string to ensure safe passing
-                result = generate_evaluate_chain.invoke({
+                result = load_chains().generate_evaluate_chain.invoke({
                     "text": text,
                     "number": mcq_count,
                     "subject": subject,
@@ -166,4 +165,6 @@ if submitted:
                 st.error(f"An error occurred: {e}")
                 logger.error(f"Error: {e}")
     else:
-        st.warning("⚠️ Please fill in all fields and upload a file.")
\ No newline at end of file
+        st.warning("⚠️ Please fill in all fields and upload a file.")
+
+render_debug_panel()
@@ -0,0 +1,35 @@
+import tempfile
+import unittest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import ChatPromptTemplate
+
+from src.mcqgenerator.cache import CachedChain, ResponseCache
+from src.mcqgenerator.schema import parse_quiz
+
+
+class CachedChainTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(tempfile.mkdtemp())
+
+    def chain(self, *responses):
+        return CachedChain(ChatPromptTemplate.from_template("{text}"), FakeListChatModel(responses=list(responses)),
+                           self.cache, validate=parse_quiz)
+
+    def test_completions_that_fail_validation_are_not_cached(self):
+        chain = self.chain("Sorry, I cannot help with that.", '{"1": {"mcq": "Q?"}}')
+        self.assertEqual(chain.invoke({"text": "t"}), "Sorry, I cannot help with that.")
+        # asked again: the model is called instead of replaying the bad answer
+        self.assertEqual(chain.invoke({"text": "t"}), '{"1": {"mcq": "Q?"}}')
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_valid_completions_are_served_from_the_cache(self):
+        chain = self.chain('{"1": {"mcq": "Q?"}}', "not called")
+        chain.invoke({"text": "t"})
+        self.assertEqual(chain.invoke({"text": "t"}), '{"1": {"mcq": "Q?"}}')
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from src.mcqgenerator.backends import HedgedChatModel, LatencyStats
+from src.mcqgenerator.scheduler import RateLimitScheduler, ScheduledChatModel
+
+
+class SlowModel:
+    """Answers with its name after delay seconds; counts calls that ran to the end."""
+
+    def __init__(self, name, delay):
+        self.name = name
+        self.delay = delay
+        self.finished = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        time.sleep(self.delay)
+        self.finished += 1
+        return self.name
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        await asyncio.sleep(self.delay)
+        self.finished += 1
+        return self.name
+
+
+def hedged(primary, secondary, deadline=0.2, scheduler=None):
+    scheduler = scheduler or RateLimitScheduler(rpm=1_000_000, tpm=1_000_000_000, max_concurrency=1)
+    stats = LatencyStats({"default": deadline})
+    return HedgedChatModel(ScheduledChatModel(primary, scheduler), secondary, stats), scheduler, stats
+
+
+class HedgeTest(unittest.TestCase):
+
+    def test_slow_primary_is_hedged(self):
+        model, _, stats = hedged(SlowModel("primary", 1.0), SlowModel("secondary", 0.0))
+        self.assertEqual(model.invoke("prompt"), "secondary")
+        self.assertEqual(stats.stats()["default"]["hedge_wins"], 1)
+
+    def test_time_queued_for_rate_limits_does_not_count_as_latency(self):
+        model, scheduler, stats = hedged(SlowModel("primary", 0.05), SlowModel("secondary", 0.0))
+        # the only slot is taken: the primary waits 0.5s in the queue before it goes out
+        scheduler.acquire(10)
+        threading.Timer(0.5, scheduler.release, args=(10,)).start()
+        self.assertEqual(model.invoke("prompt"), "primary")
+        counts = stats.stats()["default"]
+        self.assertEqual(counts["hedged"], 0)
+        self.assertLess(counts["p95_s"], 0.4)
+
+    def test_async_loser_is_cancelled(self):
+        primary = SlowModel("primary", 0.5)
+        model, _, stats = hedged(primary, SlowModel("secondary", 0.0))
+
+        async def scenario():
+            self.assertEqual(await model.ainvoke("prompt"), "secondary")
+            await asyncio.sleep(0.7)
+
+        asyncio.run(scenario())
+        self.assertEqual(primary.finished, 0)
+        self.assertEqual(stats.stats()["default"]["hedge_wins"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
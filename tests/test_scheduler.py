@@ -0,0 +1,190 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from src.mcqgenerator.scheduler import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, RateLimitScheduler, ScheduledChatModel, record_headers,
+)
+
+
+def unlimited(max_concurrency=1):
+    # request and token budgets big enough that only concurrency holds calls back
+    return RateLimitScheduler(rpm=1_000_000, tpm=1_000_000_000, max_concurrency=max_concurrency)
+
+
+class CancellationTest(unittest.TestCase):
+
+    def test_cancelled_waiter_does_not_keep_a_slot(self):
+        scheduler = unlimited()
+
+        async def scenario():
+            scheduler.acquire(10)
+            waiter = asyncio.ensure_future(scheduler.aacquire(10))
+            await asyncio.sleep(0.05)
+            self.assertEqual(scheduler.stats()["queued"], 1)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            await asyncio.sleep(0.05)
+            self.assertEqual(scheduler.stats()["queued"], 0)
+            self.assertEqual(scheduler.stats()["in_flight"], 1)
+
+            scheduler.release(10)
+            # the slot is free again: the next caller must not hang
+            await asyncio.wait_for(scheduler.aacquire(10), timeout=1)
+            scheduler.release(10)
+
+        asyncio.run(scenario())
+        self.assertEqual(scheduler.stats()["in_flight"], 0)
+
+    def test_slot_taken_after_cancel_is_handed_back(self):
+        scheduler = unlimited()
+
+        async def scenario():
+            waiter = asyncio.ensure_future(scheduler.aacquire(10))
+            # cancelled while the thread is already taking the free slot
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            await asyncio.sleep(0.05)
+
+        asyncio.run(scenario())
+        self.assertEqual(scheduler.stats()["in_flight"], 0)
+        self.assertEqual(scheduler.stats()["queued"], 0)
+
+
+class PriorityTest(unittest.TestCase):
+
+    def test_interactive_calls_go_before_batch_calls_queued_earlier(self):
+        scheduler = unlimited()
+        scheduler.acquire(10)
+        order = []
+
+        def call(name, priority):
+            scheduler.acquire(10, priority)
+            order.append(name)
+            scheduler.release(10)
+
+        threads = []
+        for name, priority in (("batch-1", PRIORITY_BATCH), ("batch-2", PRIORITY_BATCH),
+                               ("interactive", PRIORITY_INTERACTIVE)):
+            threads.append(threading.Thread(target=call, args=(name, priority)))
+            threads[-1].start()
+            # each caller is queued before the next arrives
+            while scheduler.stats()["queued"] < len(threads):
+                time.sleep(0.005)
+
+        scheduler.release(10)
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(order, ["interactive", "batch-1", "batch-2"])
+
+
+class RateLimitError(Exception):
+    """Shaped like the groq client's 429 error."""
+
+    status_code = 429
+
+    def __init__(self, retry_after="0.01"):
+        super().__init__("rate limited")
+        self.response = type("Response", (), {"status_code": 429, "headers": {"Retry-After": retry_after}})()
+
+
+class FlakyModel:
+    """Fails with a 429 the first `failures` times, then answers."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RateLimitError()
+        return "ok"
+
+
+class AIMDTest(unittest.TestCase):
+
+    def test_a_429_halves_concurrency_and_pauses(self):
+        scheduler = unlimited(max_concurrency=8)
+        scheduler.acquire(10)
+        scheduler.release(10, headers={"retry-after": "0.2"}, rate_limited=True)
+        self.assertEqual(scheduler.concurrency, 4)
+        self.assertGreater(scheduler.paused_until, time.monotonic() + 0.1)
+        scheduler.acquire(10)
+        scheduler.release(10, rate_limited=True)
+        self.assertEqual(scheduler.concurrency, 2)
+        self.assertEqual(scheduler.stats()["rate_limited"], 2)
+
+    def test_concurrency_never_drops_below_the_minimum(self):
+        scheduler = unlimited(max_concurrency=2)
+        scheduler.paused_until = 0.0
+        for _ in range(3):
+            scheduler.acquire(10)
+            scheduler.release(10, headers={"retry-after": "0"}, rate_limited=True)
+            scheduler.paused_until = 0.0
+        self.assertEqual(scheduler.concurrency, scheduler.min_concurrency)
+
+    def test_clean_responses_raise_concurrency_one_at_a_time(self):
+        scheduler = unlimited(max_concurrency=8)
+        scheduler.acquire(10)
+        scheduler.release(10, rate_limited=True)
+        scheduler.paused_until = 0.0
+        for _ in range(5):
+            scheduler.acquire(10)
+            scheduler.release(10)
+        self.assertEqual(scheduler.concurrency, 5)
+
+    def test_scheduled_model_retries_after_a_429(self):
+        scheduler = unlimited(max_concurrency=8)
+        model = FlakyModel(failures=1)
+        self.assertEqual(ScheduledChatModel(model, scheduler).invoke("prompt"), "ok")
+        self.assertEqual(model.calls, 2)
+        self.assertEqual(scheduler.concurrency, 4)
+        self.assertEqual(scheduler.stats()["in_flight"], 0)
+
+
+class HeaderModel:
+    """Answers like a model whose HTTP client has record_headers as a response hook."""
+
+    max_tokens = 300
+
+    def __init__(self, headers):
+        self.headers = headers
+
+    def invoke(self, input, config=None, **kwargs):
+        record_headers(type("Response", (), {"headers": self.headers})())
+        return "ok"
+
+
+class HeadersTest(unittest.TestCase):
+
+    def test_success_headers_replace_the_bucket_levels(self):
+        scheduler = RateLimitScheduler(rpm=30, tpm=8000)
+        # an earlier call still in flight has 1000 tokens the server has not charged yet
+        scheduler.acquire(1000)
+        model = HeaderModel({"X-RateLimit-Remaining-Tokens": "5000", "X-RateLimit-Remaining-Requests": "20",
+                             "Content-Type": "application/json"})
+        ScheduledChatModel(model, scheduler).invoke("prompt")
+        self.assertAlmostEqual(scheduler.tokens.level, 4000, delta=5)
+        self.assertAlmostEqual(scheduler.requests.level, 20, delta=1)
+
+    def test_headers_can_give_back_more_than_was_reserved(self):
+        scheduler = RateLimitScheduler(rpm=30, tpm=8000)
+        scheduler.tokens.level = 400
+        ScheduledChatModel(HeaderModel({"x-ratelimit-remaining-tokens": "7500"}), scheduler).invoke("prompt")
+        self.assertAlmostEqual(scheduler.tokens.level, 7500, delta=5)
+
+    def test_reservation_is_the_prompt_plus_max_tokens(self):
+        model = ScheduledChatModel(HeaderModel({}), unlimited(), output_tokens=2000)
+        self.assertEqual(model._reserve("x" * 40, {}), 10 + 300)
+        self.assertEqual(model._reserve("x" * 40, {"max_tokens": 50}), 10 + 50)
+        self.assertEqual(ScheduledChatModel(FlakyModel(0), unlimited(), output_tokens=2000)._reserve("x" * 40, {}),
+                         10 + 2000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+
+from src.mcqgenerator.schema import Question
+
+
+def question(correct, options=("A protein", "A nucleic acid", "A lipid", "A sugar")):
+    return Question("What is DNA?", options, correct, "", "")
+
+
+class CorrectLetterTest(unittest.TestCase):
+
+    def test_option_text_wins_over_a_letter_prefix(self):
+        self.assertEqual(question("A nucleic acid").correct_letter(), "b")
+        self.assertEqual(question(" a NUCLEIC acid ").correct_letter(), "b")
+
+    def test_letters(self):
+        for correct in ("c", "C", "c)", "C.", "c: A lipid"):
+            self.assertEqual(question(correct).correct_letter(), "c", correct)
+        self.assertIsNone(question("e").correct_letter())
+        self.assertIsNone(question("").correct_letter())
+
+    def test_row_has_the_resolved_letter(self):
+        self.assertEqual(question("A nucleic acid").row()["Correct Answer"], "b")
+        self.assertEqual(question("D)").row()["Correct Answer"], "d")
+        self.assertEqual(question("none of these").row()["Correct Answer"], "none of these")
+
+
+if __name__ == "__main__":
+    unittest.main()
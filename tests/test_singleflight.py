@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from src.mcqgenerator.singleflight import SingleFlight
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+class FollowerTest(unittest.TestCase):
+
+    def test_followers_share_the_leaders_result(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            release.wait(2)
+            return "quiz"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flights.do("k", work))) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: flights.stats()["coalesced"] == 2)
+        release.set()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(results, ["quiz"] * 3)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.stats()["in_flight"], 0)
+
+    def test_followers_get_the_leaders_error(self):
+        flights = SingleFlight()
+        release = threading.Event()
+
+        def fail():
+            release.wait(2)
+            raise ValueError("rate limited")
+
+        errors = []
+
+        def call():
+            try:
+                flights.do("k", fail)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: flights.stats()["coalesced"] == 2)
+        release.set()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(flights.stats()["in_flight"], 0)
+
+    def test_a_follower_runs_the_call_again_when_the_leader_is_cancelled(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.2 if len(calls) == 1 else 0)
+            return f"run {len(calls)}"
+
+        async def scenario():
+            leader = asyncio.ensure_future(flights.ado("k", work))
+            await asyncio.sleep(0.02)
+            follower = asyncio.ensure_future(flights.ado("k", work))
+            await asyncio.sleep(0.02)
+            leader.cancel()
+            return await asyncio.wait_for(follower, 2)
+
+        self.assertEqual(asyncio.run(scenario()), "run 2")
+        self.assertEqual(flights.stats()["in_flight"], 0)
+
+
+class StreamTest(unittest.TestCase):
+
+    def test_a_follower_takes_over_when_the_leader_stops_reading(self):
+        flights = SingleFlight()
+        gate = threading.Event()
+        calls = []
+
+        def chunks():
+            calls.append(1)
+            yield "a"
+            gate.wait(2)
+            yield "b"
+            yield "c"
+
+        leader = flights.stream("k", chunks)
+        self.assertEqual(next(leader), "a")
+        received = []
+        follower = threading.Thread(target=lambda: received.extend(flights.stream("k", chunks)))
+        follower.start()
+        wait_for(lambda: received == ["a"])
+        # the /stream client disconnects
+        leader.close()
+        gate.set()
+        follower.join(2)
+        self.assertEqual(received, ["a", "b", "c"])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.stats()["in_flight"], 0)
+
+    def test_nothing_is_handed_over_without_followers(self):
+        flights = SingleFlight()
+        leader = flights.stream("k", lambda: iter("abc"))
+        self.assertEqual(next(leader), "a")
+        leader.close()
+        self.assertEqual(flights.stats()["in_flight"], 0)
+        self.assertEqual(list(flights.stream("k", lambda: iter("xyz"))), ["x", "y", "z"])
+
+    def test_an_async_follower_takes_over_when_the_leader_stops_reading(self):
+        flights = SingleFlight()
+
+        async def chunks():
+            for part in "abc":
+                await asyncio.sleep(0.02)
+                yield part
+
+        async def scenario():
+            leader = flights.astream("k", chunks)
+            first = await leader.__anext__()
+            received = []
+
+            async def follow():
+                async for part in flights.astream("k", chunks):
+                    received.append(part)
+
+            follower = asyncio.ensure_future(follow())
+            await asyncio.sleep(0.01)
+            await leader.aclose()
+            await asyncio.wait_for(follower, 2)
+            return first, received
+
+        first, received = asyncio.run(scenario())
+        self.assertEqual(first, "a")
+        self.assertEqual(received, ["a", "b", "c"])
+        self.assertEqual(flights.stats()["in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
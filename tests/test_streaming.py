@@ -0,0 +1,61 @@
+import json
+import unittest
+
+from src.mcqgenerator.streaming import IncrementalQuizParser
+
+QUIZ = {
+    "1": {"mcq": "What does \"DNA\" stand for?", "options": {"a": "Deoxyribonucleic acid", "b": "{braces}",
+                                                          "c": "a, b: c", "d": "back\\slash"},
+          "correct": "a", "hint": "", "explanation": ""},
+    "2": {"mcq": "Which organelle makes ATP?", "options": {"a": "Nucleus", "b": "Mitochondrion",
+                                                           "c": "Ribosome", "d": "Golgi"},
+          "correct": "b", "hint": "", "explanation": ""},
+}
+
+
+def feed_all(text, size):
+    parser = IncrementalQuizParser()
+    out = []
+    for i in range(0, len(text), size):
+        out.extend(parser.feed(text[i:i + size]))
+    return parser, out
+
+
+class IncrementalQuizParserTest(unittest.TestCase):
+
+    def test_questions_come_out_whatever_the_chunk_size(self):
+        text = json.dumps(QUIZ, indent=4)
+        for size in (1, 2, 3, 7, 64, len(text)):
+            parser, out = feed_all(text, size)
+            self.assertEqual(dict(out), QUIZ, f"chunk size {size}")
+            self.assertEqual(parser.emitted, 2)
+            self.assertEqual(parser.text, text)
+
+    def test_a_question_is_emitted_once_its_closing_brace_arrives(self):
+        text = json.dumps(QUIZ)
+        end = text.index(', "2"')
+        parser = IncrementalQuizParser()
+        self.assertEqual(parser.feed(text[:end - 1]), [])
+        self.assertEqual(parser.feed(text[end - 1:end]), [("1", QUIZ["1"])])
+
+    def test_code_fences_and_preamble_are_ignored(self):
+        text = "Here is your quiz:\n```json\n" + json.dumps(QUIZ, indent=2) + "\n```\n"
+        for size in (1, 5, len(text)):
+            _, out = feed_all(text, size)
+            self.assertEqual(dict(out), QUIZ, f"chunk size {size}")
+
+    def test_a_truncated_completion_keeps_its_complete_questions(self):
+        text = json.dumps(QUIZ)
+        _, out = feed_all(text[:text.index('"2"') + 30], 4)
+        self.assertEqual(out, [("1", QUIZ["1"])])
+
+    def test_an_escape_split_across_chunks(self):
+        text = json.dumps(QUIZ)
+        cut = text.index("\\\\") + 1
+        parser = IncrementalQuizParser()
+        out = parser.feed(text[:cut]) + parser.feed(text[cut:])
+        self.assertEqual(dict(out), QUIZ)
+
+
+if __name__ == "__main__":
+    unittest.main()